@@ -0,0 +1,398 @@
+"""
+Incrementally maintained analytics rollups.
+
+incident_rollups holds one row per (granularity, bucket, type, severity,
+status) with incident counts and the sums behind the average response and
+resolution times; incident_first_response holds each incident's first
+arrival; duration_sketches holds DDSketch bin counts of response and
+resolution times over power-of-two spans of hours, by type and/or severity,
+so percentiles over any window merge at most two spans per level. Triggers on
+incidents and incident_timeline (migrations 12 to 14) move an incident's
+contribution whenever it is written, so the analytics endpoints read a few
+rows per bucket instead of scanning and joining the raw tables.
+
+Usage:
+    python analytics_rollups.py --backfill   # rebuild the rollups from the raw tables
+    python analytics_rollups.py --check      # compare the rollups with the raw tables
+"""
+import calendar
+import math
+import sys
+from database import db_session
+from db_writer import db_writer
+from utils.sketch_utils import sketch_key_sql
+
+# Bucket start for each granularity, as a strftime format
+ROLLUP_GRANULARITIES = {
+    'minute': '%Y-%m-%d %H:%M:00',
+    'hour': '%Y-%m-%d %H:00:00',
+    'day': '%Y-%m-%d 00:00:00'
+}
+
+# Timeline events that count as the first response to an incident
+RESPONSE_EVENT_TYPES = ('personnel_arrived', 'status_update')
+RESPONSE_EVENTS_SQL = ', '.join(f"'{event_type}'" for event_type in RESPONSE_EVENT_TYPES)
+
+# What one incident adds to its rollup row; {i} is the incident, r its first response
+_IS_RESOLVED = "{i}.status = 'resolved' AND {i}.resolved_at IS NOT NULL"
+MEASURES = [
+    ('incidents', '1'),
+    ('resolved', _IS_RESOLVED),
+    ('resolution_minutes',
+     f'CASE WHEN {_IS_RESOLVED} THEN (julianday({{i}}.resolved_at) - julianday({{i}}.created_at)) * 1440 ELSE 0 END'),
+    ('responded', 'r.incident_id IS NOT NULL'),
+    ('response_minutes', 'COALESCE((julianday(r.first_response_at) - julianday({i}.created_at)) * 1440, 0)')
+]
+
+# Durations kept as sketches: (incident condition, minutes), same placeholders as MEASURES
+SKETCH_METRICS = {
+    'response': ('r.incident_id IS NOT NULL',
+                 '(julianday(r.first_response_at) - julianday({i}.created_at)) * 1440'),
+    'resolution': (_IS_RESOLVED,
+                   '(julianday({i}.resolved_at) - julianday({i}.created_at)) * 1440')
+}
+
+# Incident columns each metric reads; updates leaving them alone skip its sketches
+SKETCH_INPUTS = {
+    'response': ('type', 'severity', 'created_at'),
+    'resolution': ('type', 'severity', 'status', 'created_at', 'resolved_at')
+}
+
+# Level L sketches cover 2^L hours, starting at a multiple of 2^L hours since
+# the Unix epoch, so any window of whole hours is at most two spans per level
+# (plus whole top-level spans). A write touches one span per level; changing
+# the levels requires --backfill.
+SKETCH_LEVELS = 14  # Widest span 2^13 hours, about 341 days
+_SKETCH_LEVELS = '(' + ' UNION ALL '.join(f'SELECT {level} AS level' for level in range(SKETCH_LEVELS)) + ') l'
+
+# Sketches are kept by type and severity, by either one and across both
+# (the other column '*'), so every query reads the bins of one grouping
+ALL_GROUPS = '*'
+_SKETCH_GROUPINGS = '''(
+    SELECT 'type,severity' AS grouped_by, 1 AS by_type, 1 AS by_severity
+    UNION ALL SELECT 'type', 1, 0 UNION ALL SELECT 'severity', 0, 1 UNION ALL SELECT '', 0, 0
+) g'''
+
+# Float sums drift by rounding as contributions are added and removed
+CHECK_DECIMALS = 6
+
+
+def _bucket_sql(granularity, incident):
+    # Unparseable timestamps land in the '' bucket rather than failing the write
+    return f"COALESCE(strftime('{ROLLUP_GRANULARITIES[granularity]}', {incident}.created_at), '')"
+
+def rollup_delta_sql(granularity, sign, incident, source, where='true'):
+    """
+    Upsert adding (sign=1) or removing (sign=-1) incidents' contributions
+    `source` is a FROM clause binding `incident` and its first response as r
+    """
+    names = [name for name, _ in MEASURES]
+    values = [f'{sign} * ({expression.format(i=incident)})' for _, expression in MEASURES]
+    return f'''
+        INSERT INTO incident_rollups (granularity, bucket, type, severity, status, {', '.join(names)})
+        SELECT '{granularity}', {_bucket_sql(granularity, incident)},
+               {incident}.type, {incident}.severity, {incident}.status, {', '.join(values)}
+        FROM {source}
+        WHERE {where}
+        ON CONFLICT (granularity, bucket, type, severity, status) DO UPDATE SET
+            {', '.join(f'{name} = {name} + excluded.{name}' for name in names)}
+    '''
+
+def _grouping_sql(incident):
+    """Type and severity expressions for a row of _SKETCH_GROUPINGS"""
+    return (f"CASE WHEN g.by_type THEN {incident}.type ELSE '{ALL_GROUPS}' END",
+            f"CASE WHEN g.by_severity THEN {incident}.severity ELSE '{ALL_GROUPS}' END")
+
+def _hour_sql(incident):
+    """Hours since the Unix epoch of the incident's creation (NULL when unparseable)"""
+    return f"CAST(strftime('%s', {incident}.created_at) AS INTEGER) / 3600"
+
+def sketch_delta_sql(metric, sign, incident, source, where='true'):
+    """
+    Upsert adding or removing incidents' durations in the sketch bins of
+    their span at every level, per grouping: the same rows however old the
+    incident is
+    """
+    condition, minutes = SKETCH_METRICS[metric]
+    hour = _hour_sql(incident)
+    return f'''
+        INSERT INTO duration_sketches (metric, grouped_by, level, span, type, severity, sketch_key, count)
+        SELECT '{metric}', g.grouped_by, l.level, ({hour}) >> l.level, {', '.join(_grouping_sql(incident))},
+               {sketch_key_sql(minutes.format(i=incident))}, {sign}
+        FROM {source}
+        JOIN {_SKETCH_GROUPINGS}
+        JOIN {_SKETCH_LEVELS}
+        WHERE ({where}) AND {condition.format(i=incident)} AND {hour} IS NOT NULL
+        ON CONFLICT (metric, grouped_by, level, span, type, severity, sketch_key) DO UPDATE SET
+            count = count + excluded.count
+    '''
+
+def create_rollup_triggers(cursor):
+    """(Re)create the triggers that keep the rollups and sketches in step with the raw tables"""
+    def delta(sign, incident, source, where='true', updated=False):
+        statements = []
+        for granularity in ROLLUP_GRANULARITIES:
+            statements.append(rollup_delta_sql(granularity, sign, incident, source, where))
+        for metric in SKETCH_METRICS:
+            sketch_where = where
+            if updated:
+                sketch_where = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in SKETCH_INPUTS[metric])
+            statements.append(sketch_delta_sql(metric, sign, incident, source, sketch_where))
+        return ';\n'.join(statements) + ';'
+
+    drop_empty = '''
+        DELETE FROM incident_rollups WHERE incidents = 0;
+        DELETE FROM duration_sketches WHERE count = 0;
+    '''
+    new_incident = 'NEW', '(SELECT 1) LEFT JOIN incident_first_response r ON r.incident_id = NEW.id'
+    old_incident = 'OLD', '(SELECT 1) LEFT JOIN incident_first_response r ON r.incident_id = OLD.id'
+    stored_incident = 'i', 'incidents i LEFT JOIN incident_first_response r ON r.incident_id = i.id'
+
+    triggers = {
+        'incident_rollups_insert': f'''
+            AFTER INSERT ON incidents
+            BEGIN
+                {delta(1, *new_incident)}
+            END
+        ''',
+        'incident_rollups_update': f'''
+            AFTER UPDATE OF type, severity, status, created_at, resolved_at ON incidents
+            WHEN OLD.type IS NOT NEW.type OR OLD.severity IS NOT NEW.severity OR OLD.status IS NOT NEW.status
+              OR OLD.created_at IS NOT NEW.created_at OR OLD.resolved_at IS NOT NEW.resolved_at
+            BEGIN
+                {delta(-1, *old_incident, updated=True)}
+                {delta(1, *new_incident, updated=True)}
+                {drop_empty}
+            END
+        ''',
+        'incident_rollups_delete': f'''
+            AFTER DELETE ON incidents
+            BEGIN
+                {delta(-1, *old_incident)}
+                {drop_empty}
+                DELETE FROM incident_first_response WHERE incident_id = OLD.id;
+            END
+        ''',
+        # An earlier response event replaces the incident's first response
+        'incident_rollups_response': f'''
+            AFTER INSERT ON incident_timeline
+            WHEN NEW.event_type IN ({RESPONSE_EVENTS_SQL}) AND NOT EXISTS (
+                SELECT 1 FROM incident_first_response
+                WHERE incident_id = NEW.incident_id AND julianday(first_response_at) <= julianday(NEW.created_at)
+            )
+            BEGIN
+                {delta(-1, *stored_incident, 'i.id = NEW.incident_id')}
+                INSERT INTO incident_first_response (incident_id, first_response_at)
+                VALUES (NEW.incident_id, NEW.created_at)
+                ON CONFLICT (incident_id) DO UPDATE SET first_response_at = excluded.first_response_at;
+                {delta(1, *stored_incident, 'i.id = NEW.incident_id')}
+                {drop_empty}
+            END
+        ''',
+        'incident_rollups_response_delete': f'''
+            AFTER DELETE ON incident_timeline
+            WHEN OLD.event_type IN ({RESPONSE_EVENTS_SQL}) AND EXISTS (
+                SELECT 1 FROM incident_first_response
+                WHERE incident_id = OLD.incident_id AND first_response_at = OLD.created_at
+            )
+            BEGIN
+                {delta(-1, *stored_incident, 'i.id = OLD.incident_id')}
+                DELETE FROM incident_first_response WHERE incident_id = OLD.incident_id;
+                INSERT INTO incident_first_response (incident_id, first_response_at)
+                SELECT incident_id, created_at FROM incident_timeline
+                WHERE incident_id = OLD.incident_id AND event_type IN ({RESPONSE_EVENTS_SQL})
+                ORDER BY julianday(created_at) LIMIT 1;
+                {delta(1, *stored_incident, 'i.id = OLD.incident_id')}
+                {drop_empty}
+            END
+        '''
+    }
+    for name, body in triggers.items():
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'CREATE TRIGGER {name} {body}')
+
+def window_bounds(start, end):
+    """[start, end) widened to whole hours, as hours since the Unix epoch"""
+    start_hour = calendar.timegm(start.timetuple()) // 3600
+    end_hour = math.ceil((calendar.timegm(end.timetuple()) + end.microsecond / 1e6) / 3600)
+    return start_hour, end_hour
+
+def window_spans(start, end):
+    """
+    Cover [start, end) (naive UTC, widened to whole hours) with the fewest
+    sketch spans, at most two per level: [(level, span)]
+    """
+    hour, end_hour = window_bounds(start, end)
+    spans = []
+    while hour < end_hour:
+        level = SKETCH_LEVELS - 1
+        while level and (hour % (1 << level) or hour + (1 << level) > end_hour):
+            level -= 1
+        spans.append((level, hour >> level))
+        hour += 1 << level
+    return spans
+
+def sketch_window_sql(metric, start, end, incident_type=None, severity=None, group_by=None):
+    """
+    Query and parameters for (grp, sketch_key, count) of a metric over
+    window_spans(start, end), read from one grouping, so the rows read
+    depend on the number of levels rather than the window or incidents
+    `group_by` is 'type', 'severity' or None (grp is '')
+    """
+    grouped, filters, filter_params = [], '', []
+    for column, value in (('type', incident_type), ('severity', severity)):
+        if value is not None:
+            filters += f' AND {column} = ?'
+            filter_params.append(value)
+        if value is not None or column == group_by:
+            grouped.append(column)
+
+    # One primary key seek per span (an empty window matches nothing)
+    spans = window_spans(start, end) or [(0, None)]
+    params = []
+    for level, span in spans:
+        params += [level, span]
+    return f'''
+        SELECT {group_by or "''"} AS grp, sketch_key, SUM(count) AS count
+        FROM (VALUES {', '.join(['(?, ?)'] * len(spans))}) w
+        JOIN duration_sketches s ON s.metric = ? AND s.grouped_by = ? AND s.level = w.column1 AND s.span = w.column2
+        WHERE true{filters}
+        GROUP BY grp, sketch_key
+        HAVING SUM(count) != 0
+    ''', params + [metric, ','.join(grouped)] + filter_params
+
+def _expected_sketches_sql():
+    """Sketch rows recomputed from the raw tables"""
+    group_type, group_severity = _grouping_sql('i')
+    hour = _hour_sql('i')
+    selects = []
+    for metric, (condition, minutes) in SKETCH_METRICS.items():
+        selects.append(f'''
+            SELECT '{metric}', g.grouped_by, l.level, ({hour}) >> l.level AS span,
+                   {group_type} AS group_type, {group_severity} AS group_severity,
+                   {sketch_key_sql(minutes.format(i='i'))} AS sketch_key, COUNT(*)
+            FROM incidents i
+            LEFT JOIN incident_first_response r ON r.incident_id = i.id
+            JOIN {_SKETCH_GROUPINGS}
+            JOIN {_SKETCH_LEVELS}
+            WHERE {condition.format(i='i')} AND {hour} IS NOT NULL
+            GROUP BY g.grouped_by, l.level, span, group_type, group_severity, sketch_key
+        ''')
+    return ' UNION ALL '.join(selects)
+
+def _expected_rollups_sql(granularity, rounded=False):
+    """Rollup rows recomputed from the raw tables"""
+    sums = []
+    for name, expression in MEASURES:
+        total = f'SUM({expression.format(i="i")})'
+        sums.append(f'ROUND({total}, {CHECK_DECIMALS})' if rounded else total)
+    return f'''
+        SELECT '{granularity}', {_bucket_sql(granularity, 'i')} AS bucket,
+               i.type, i.severity, i.status, {', '.join(sums)}
+        FROM incidents i
+        LEFT JOIN incident_first_response r ON r.incident_id = i.id
+        GROUP BY bucket, i.type, i.severity, i.status
+    '''
+
+def _actual_rollups_sql(granularity):
+    columns = [f'ROUND({name}, {CHECK_DECIMALS})' for name, _ in MEASURES]
+    return f'''
+        SELECT granularity, bucket, type, severity, status, {', '.join(columns)}
+        FROM incident_rollups WHERE granularity = '{granularity}'
+    '''
+
+# SQLite takes the bare created_at column from the row holding the MIN()
+EXPECTED_FIRST_RESPONSE_SQL = f'''
+    SELECT incident_id, created_at
+    FROM (
+        SELECT incident_id, created_at, MIN(julianday(created_at))
+        FROM incident_timeline
+        WHERE event_type IN ({RESPONSE_EVENTS_SQL})
+        GROUP BY incident_id
+    )
+'''
+
+def rebuild_rollups(cursor):
+    """Recompute incident_first_response and incident_rollups from the raw tables"""
+    cursor.execute('DELETE FROM incident_first_response')
+    cursor.execute(f'INSERT INTO incident_first_response (incident_id, first_response_at) {EXPECTED_FIRST_RESPONSE_SQL}')
+
+    cursor.execute('DELETE FROM incident_rollups')
+    names = ', '.join(name for name, _ in MEASURES)
+    for granularity in ROLLUP_GRANULARITIES:
+        cursor.execute(f'''
+            INSERT INTO incident_rollups (granularity, bucket, type, severity, status, {names})
+            {_expected_rollups_sql(granularity)}
+        ''')
+
+    cursor.execute('SELECT COUNT(*) FROM incident_rollups')
+    rows = cursor.fetchone()[0]
+
+    # Present from migration 13 on
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'duration_sketches'")
+    if cursor.fetchone():
+        cursor.execute('DELETE FROM duration_sketches')
+        cursor.execute(f'''
+            INSERT INTO duration_sketches (metric, grouped_by, level, span, type, severity, sketch_key, count)
+            {_expected_sketches_sql()}
+        ''')
+        cursor.execute('SELECT COUNT(*) FROM duration_sketches')
+        rows += cursor.fetchone()[0]
+    return rows
+
+def backfill_rollups():
+    """Rebuild the rollups in one write, serialized with other writers"""
+    rows = db_writer.execute(rebuild_rollups)
+    print(f"📊 Rebuilt {rows} analytics rollup row(s)")
+    return rows
+
+def check_rollups():
+    """
+    Compare the rollups with the raw tables
+    Returns a list of mismatches (empty when consistent)
+    """
+    mismatches = []
+    with db_session() as conn:
+        cursor = conn.cursor()
+
+        for label, left, right in (
+            ('missing', EXPECTED_FIRST_RESPONSE_SQL, 'SELECT incident_id, first_response_at FROM incident_first_response'),
+            ('unexpected', 'SELECT incident_id, first_response_at FROM incident_first_response', EXPECTED_FIRST_RESPONSE_SQL)
+        ):
+            cursor.execute(f'{left} EXCEPT {right}')
+            mismatches.extend({'table': 'incident_first_response', 'problem': label, 'row': list(row)}
+                              for row in cursor.fetchall())
+
+        for granularity in ROLLUP_GRANULARITIES:
+            expected = _expected_rollups_sql(granularity, rounded=True)
+            actual = _actual_rollups_sql(granularity)
+            for label, left, right in (('missing', expected, actual), ('unexpected', actual, expected)):
+                cursor.execute(f'{left} EXCEPT {right}')
+                mismatches.extend({'table': 'incident_rollups', 'problem': label, 'row': list(row)}
+                                  for row in cursor.fetchall())
+
+        for table, expected, actual in (
+            ('duration_sketches', _expected_sketches_sql(),
+             'SELECT metric, grouped_by, level, span, type, severity, sketch_key, count FROM duration_sketches'),
+        ):
+            for label, left, right in (('missing', expected, actual), ('unexpected', actual, expected)):
+                cursor.execute(f'SELECT * FROM ({left}) EXCEPT SELECT * FROM ({right})')
+                mismatches.extend({'table': table, 'problem': label, 'row': list(row)}
+                                  for row in cursor.fetchall())
+
+    return mismatches
+
+
+if __name__ == '__main__':
+    if '--backfill' in sys.argv:
+        backfill_rollups()
+        db_writer.stop()
+
+    mismatches = check_rollups()
+    for mismatch in mismatches:
+        print(f"❌ {mismatch['table']}: {mismatch['problem']} row {mismatch['row']}")
+    if mismatches:
+        print(f"❌ {len(mismatches)} rollup row(s) disagree with the raw tables "
+              f"(python analytics_rollups.py --backfill rebuilds them)")
+        sys.exit(1)
+    print("✅ Analytics rollups match the raw tables")
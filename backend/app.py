@@ -1,20 +1,38 @@
-from flask import Flask, jsonify, send_from_directory, request
+from flask import Flask, jsonify, request
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 from config import Config
-from database import init_db, seed_sample_data, get_db_connection
+from database import init_db, seed_sample_data, get_pool, get_db_connection, db_session
+from db_writer import db_writer
+from verification_queue import verification_queue
+from location_store import location_store
+from cluster import WORKER_ID, worker_registry, startup_lock
+from socket_bus import message_queue_options
+from blob_store import collect_garbage, blob_stats
+from migrations import run_migrations
+from utils.sendfile_utils import send_upload
+from utils.thumbnail_utils import fetch_derivatives, ensure_derivatives
+from utils.result_cache_utils import analytics_cache
+from utils import json_utils
+from utils.subscription_utils import (
+    WORLD_ROOM, incident_room, incident_rooms, interest_kind, interest_rooms, personnel_rooms, tile_rooms
+)
 import os
+import posixpath
 
 # Initialize Flask app
 app = Flask(__name__)
+# Stored UTC timestamps leave as ISO 8601 with 'Z', in responses and socket events
+app.json = json_utils.UtcJSONProvider(app)
 app.config.from_object(Config)
 Config.init_app(app)
 
 # Enable CORS
 CORS(app, origins=Config.CORS_ORIGINS, supports_credentials=True)
 
-# Initialize SocketIO for WebSocket support
-socketio = SocketIO(app, cors_allowed_origins=Config.CORS_ORIGINS)
+# Initialize SocketIO for WebSocket support; with several workers, emits go
+# through the message queue to clients connected to any of them
+socketio = SocketIO(app, cors_allowed_origins=Config.CORS_ORIGINS, json=json_utils, **message_queue_options())
 
 # Import and register blueprints
 from routes.incidents import incidents_bp
@@ -27,6 +45,8 @@ from routes.auth import auth_bp
 from routes.resources import resources_bp
 from routes.sos_mesh import sos_mesh_bp
 from routes.sms import sms_bp
+from routes.uploads import uploads_bp, purge_expired_uploads
+from routes.sync import sync_bp
 
 app.register_blueprint(auth_bp, url_prefix='/api')
 app.register_blueprint(incidents_bp, url_prefix='/api')
@@ -38,6 +58,17 @@ app.register_blueprint(notifications_bp, url_prefix='/api')
 app.register_blueprint(resources_bp, url_prefix='/api')
 app.register_blueprint(sos_mesh_bp, url_prefix='/api')
 app.register_blueprint(sms_bp, url_prefix='/api')
+app.register_blueprint(uploads_bp, url_prefix='/api')
+app.register_blueprint(sync_bp, url_prefix='/api')
+
+# Triggers count writes to what the analytics read (migration 17); after a
+# write request the next dashboard read checks them instead of waiting for
+# ANALYTICS_CACHE_SYNC_SECONDS, so a location ping recomputes nothing
+@app.after_request
+def recheck_analytics(response):
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.status_code < 400:
+        analytics_cache.recheck()
+    return response
 
 
 # Root endpoint
@@ -56,6 +87,7 @@ def index():
             'notifications': '/api/notifications',
             'sosmesh': '/api/sosmesh',
             'sms_webhook': '/api/sms/webhook',
+            'sync': '/api/sync',
             'websocket': 'ws://localhost:5000'
         }
     })
@@ -63,23 +95,61 @@ def index():
 # Health check endpoint
 @app.route('/health')
 def health():
-    return jsonify({'status': 'healthy', 'database': 'connected'})
+    return jsonify({
+        'status': 'healthy',
+        'database': 'connected',
+        'db_pool': get_pool().stats(),
+        'db_writer': db_writer.metrics(),
+        'blobs': blob_stats(),
+        'analytics_cache': analytics_cache.metrics(),
+        'cluster': worker_registry.stats()
+    })
+
+# Serve attachment thumbnails (video poster frames for videos)
+@app.route('/uploads/<int:attachment_id>/thumb/<size>')
+def serve_thumbnail(attachment_id, size):
+    if size not in Config.THUMBNAIL_SIZES:
+        return jsonify({'success': False, 'error': f'Unknown thumbnail size: {size}'}), 404
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT filepath, file_type FROM attachments WHERE id = ?', (attachment_id,))
+    attachment = cursor.fetchone()
+    derivatives = fetch_derivatives(cursor, attachment_id) if attachment else {}
+    conn.close()
+
+    if not attachment:
+        return jsonify({'success': False, 'error': 'Attachment not found'}), 404
+
+    # Not generated yet (or uploaded before thumbnails existed): build it now
+    if size not in derivatives:
+        derivatives = ensure_derivatives(attachment_id, attachment['filepath'], attachment['file_type'])
+    if size not in derivatives:
+        return jsonify({'success': False, 'error': 'No thumbnail available for this attachment'}), 404
+
+    derivative = derivatives[size]
+    return send_upload(
+        os.path.relpath(derivative['filepath'], 'uploads'),
+        mimetype=derivative['mime_type'],
+        immutable=True
+    )
 
 # Serve uploaded files
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename):
-    return send_from_directory(Config.UPLOAD_FOLDER, filename)
+    # Partial uploads and blob store temp files are never served
+    if posixpath.normpath(filename).startswith(('blobs/tmp/', 'resumable/')):
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    return send_upload(filename)
 
 # ==================== WebSocket Events ====================
 
-# Track connected clients
-connected_clients = {}
-
 @socketio.on('connect')
 def handle_connect(auth=None):
     """Handle client connection"""
     from flask import request as flask_request
     sid = flask_request.sid if hasattr(flask_request, 'sid') else 'unknown'
+    worker_registry.client_connected(sid)
     print(f'Client connected: {sid}')
     emit('connection_established', {
         'message': 'Connected to Crisis Management Server',
@@ -91,8 +161,7 @@ def handle_disconnect():
     """Handle client disconnection"""
     from flask import request as flask_request
     sid = flask_request.sid if hasattr(flask_request, 'sid') else 'unknown'
-    if sid in connected_clients:
-        del connected_clients[sid]
+    worker_registry.client_disconnected(sid)
     print(f'Client disconnected: {sid}')
 
 @socketio.on('join_incident')
@@ -100,7 +169,7 @@ def handle_join_incident(data):
     """Join incident-specific room for updates"""
     incident_id = data.get('incident_id')
     if incident_id:
-        room = f'incident_{incident_id}'
+        room = incident_room(incident_id)
         join_room(room)
         emit('joined_incident', {
             'incident_id': incident_id,
@@ -113,54 +182,49 @@ def handle_leave_incident(data):
     """Leave incident-specific room"""
     incident_id = data.get('incident_id')
     if incident_id:
-        room = f'incident_{incident_id}'
+        room = incident_room(incident_id)
         leave_room(room)
         emit('left_incident', {
             'incident_id': incident_id,
             'message': f'Left incident {incident_id} updates'
         })
 
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Replace the client's map viewport, incident or role subscriptions"""
+    try:
+        wanted = interest_rooms(data or {})
+    except ValueError as e:
+        emit('subscription_rejected', {'error': str(e)})
+        return
+    
+    # Each kind of interest in the request replaces that kind only
+    for room in rooms():
+        kind = interest_kind(room)
+        if kind in wanted and room not in wanted[kind]:
+            leave_room(room)
+    for kind_rooms in wanted.values():
+        for room in kind_rooms:
+            join_room(room)
+    
+    emit('subscribed', {'rooms': sorted(room for room in rooms() if interest_kind(room))})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data=None):
+    """Drop every viewport, incident and role subscription"""
+    for room in rooms():
+        if interest_kind(room):
+            leave_room(room)
+    emit('subscribed', {'rooms': []})
+
 @socketio.on('location_update')
 def handle_location_update(data):
     """Handle real-time location updates from personnel"""
-    personnel_id = data.get('personnel_id')
-    lat = data.get('lat')
-    lng = data.get('lng')
-    
-    if personnel_id and lat and lng:
-        # Update database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE personnel
-            SET lat = ?, lng = ?, updated_at = datetime('now')
-            WHERE id = ?
-        ''', (lat, lng, personnel_id))
-        
-        # Get personnel info
-        cursor.execute('SELECT * FROM personnel WHERE id = ?', (personnel_id,))
-        person = dict(cursor.fetchone())
-        
-        conn.commit()
-        conn.close()
-        
-        # Broadcast to all clients
-        socketio.emit('personnel_location_updated', {
-            'personnel_id': personnel_id,
-            'name': person['name'],
-            'location': {'lat': lat, 'lng': lng},
-            'status': person['status']
-        })
-        
-        # If assigned to incident, broadcast to incident room
-        if person['assigned_incident_id']:
-            socketio.emit('personnel_location_updated', {
-                'personnel_id': personnel_id,
-                'name': person['name'],
-                'location': {'lat': lat, 'lng': lng},
-                'status': person['status']
-            }, room=f'incident_{person["assigned_incident_id"]}')
+    # Only the latest position is kept; it is broadcast and saved on the store's ticks
+    try:
+        location_store.update(data.get('personnel_id'), data.get('lat'), data.get('lng'))
+    except ValueError as e:
+        emit('location_update_rejected', {'error': str(e)})
 
 @socketio.on('incident_update')
 def handle_incident_update(data):
@@ -170,21 +234,16 @@ def handle_incident_update(data):
     update_data = data.get('data', {})
     
     if incident_id:
-        # Broadcast to incident room
-        socketio.emit('incident_updated', {
-            'incident_id': incident_id,
-            'type': update_type,
-            'data': update_data,
-            'timestamp': data.get('timestamp')
-        }, room=f'incident_{incident_id}')
+        with db_session() as conn:
+            incident = conn.execute('SELECT id, lat, lng FROM incidents WHERE id = ?', (incident_id,)).fetchone()
         
-        # Also broadcast to all clients for dashboard
-        socketio.emit('incident_updated', {
+        # Once to the incident room and to maps showing the incident
+        broadcast_event('incident_updated', {
             'incident_id': incident_id,
             'type': update_type,
             'data': update_data,
             'timestamp': data.get('timestamp')
-        })
+        }, room=incident_rooms(incident) if incident else [incident_room(incident_id)])
 
 @socketio.on('new_message')
 def handle_new_message(data):
@@ -195,18 +254,11 @@ def handle_new_message(data):
     
     if incident_id and message:
         # Save to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        comm_id = db_writer.execute('''
             INSERT INTO communications (incident_id, sender_name, message, type)
             VALUES (?, ?, ?, ?)
         ''', (incident_id, sender_name, message, 'text'))
         
-        comm_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
         # Broadcast to incident room
         socketio.emit('message_received', {
             'comm_id': comm_id,
@@ -214,7 +266,7 @@ def handle_new_message(data):
             'sender_name': sender_name,
             'message': message,
             'timestamp': data.get('timestamp')
-        }, room=f'incident_{incident_id}')
+        }, room=incident_room(incident_id))
 
 @socketio.on('status_update')
 def handle_status_update(data):
@@ -223,29 +275,26 @@ def handle_status_update(data):
     status = data.get('status')
     
     if personnel_id and status:
-        # Update database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE personnel
-            SET status = ?, updated_at = datetime('now')
-            WHERE id = ?
-        ''', (status, personnel_id))
+        # Update database through the single writer
+        def save_status(cursor):
+            cursor.execute('''
+                UPDATE personnel
+                SET status = ?, updated_at = datetime('now')
+                WHERE id = ?
+            ''', (status, personnel_id))
+            
+            cursor.execute('SELECT * FROM personnel WHERE id = ?', (personnel_id,))
+            return dict(cursor.fetchone())
         
-        cursor.execute('SELECT * FROM personnel WHERE id = ?', (personnel_id,))
-        person = dict(cursor.fetchone())
+        person = db_writer.execute(save_status)
+        analytics_cache.recheck()
         
-        conn.commit()
-        conn.close()
-        
-        # Broadcast to all clients
-        socketio.emit('personnel_status_updated', {
+        broadcast_event('personnel_status_updated', {
             'personnel_id': personnel_id,
             'name': person['name'],
             'status': status,
             'assigned_incident_id': person['assigned_incident_id']
-        })
+        }, room=personnel_rooms(person))
 
 @socketio.on('geofence_breach')
 def handle_geofence_breach(data):
@@ -254,14 +303,24 @@ def handle_geofence_breach(data):
     personnel_id = data.get('personnel_id')
     location = data.get('location')
     
-    # Broadcast critical alert
-    socketio.emit('geofence_alert', {
+    # Maps showing the breach, plus the person's role and incident
+    room = []
+    if isinstance(location, dict) and location.get('lat') is not None and location.get('lng') is not None:
+        room = tile_rooms(location['lat'], location['lng'])
+    if personnel_id:
+        with db_session() as conn:
+            person = conn.execute('SELECT * FROM personnel WHERE id = ?', (personnel_id,)).fetchone()
+        if person:
+            room += [r for r in personnel_rooms(person) if r not in room]
+    
+    # Critical alert
+    broadcast_event('geofence_alert', {
         'zone_id': zone_id,
         'personnel_id': personnel_id,
         'location': location,
         'alert_type': 'breach',
         'priority': 'critical'
-    })
+    }, room=room or [WORLD_ROOM])
 
 @socketio.on('broadcast_message')
 def handle_broadcast_message(data):
@@ -274,22 +333,19 @@ def handle_broadcast_message(data):
     
     if message:
         # Save to database with incident_id = NULL for broadcast messages
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO communications (incident_id, sender_name, message, type)
-            VALUES (?, ?, ?, ?)
-        ''', (None, sender_name, message, 'broadcast'))
-        
-        comm_id = cursor.lastrowid
+        def save_broadcast(cursor):
+            cursor.execute('''
+                INSERT INTO communications (incident_id, sender_name, message, type)
+                VALUES (?, ?, ?, ?)
+            ''', (None, sender_name, message, 'broadcast'))
+            
+            comm_id = cursor.lastrowid
+            
+            # Get the created timestamp from database
+            cursor.execute('SELECT created_at FROM communications WHERE id = ?', (comm_id,))
+            return comm_id, cursor.fetchone()[0]
         
-        # Get the created timestamp from database
-        cursor.execute('SELECT created_at FROM communications WHERE id = ?', (comm_id,))
-        created_at = cursor.fetchone()[0]
-        
-        conn.commit()
-        conn.close()
+        comm_id, created_at = db_writer.execute(save_broadcast)
         
         # Broadcast to ALL connected clients
         socketio.emit('broadcast_received', {
@@ -304,14 +360,18 @@ def handle_broadcast_message(data):
 
 # Helper function to broadcast from routes
 def broadcast_event(event_name, data, room=None):
-    """Broadcast event to all clients or specific room"""
-    if room:
-        socketio.emit(event_name, data, room=room)
-    else:
+    """
+    Broadcast event to all clients, a room or a list of rooms
+    A client in several of the rooms receives it once; an empty list reaches nobody
+    """
+    if room is None:
         socketio.emit(event_name, data)
+    elif room:
+        socketio.emit(event_name, data, to=room)
 
 # Make broadcast function available to routes
 app.broadcast_event = broadcast_event
+location_store.broadcast = broadcast_event
 
 # ==================== Initialize Database ====================
 
@@ -319,30 +379,53 @@ def initialize_app():
     """Initialize application on startup"""
     print("🚀 Initializing Crisis Management Backend...")
     
-    # Check if database exists
-    db_exists = os.path.exists(Config.DATABASE_PATH)
+    # Workers starting together take turns creating or migrating the database
+    with startup_lock():
+        db_exists = os.path.exists(Config.DATABASE_PATH)
+        
+        if not db_exists:
+            print("📦 Creating database...")
+            init_db()
+            seed_sample_data()
+        else:
+            print("✅ Database already exists")
+            # Apply any pending schema migrations
+            run_migrations()
+    
+    # Join the other workers; reaps dead ones and re-queues their jobs
+    worker_registry.start()
     
-    if not db_exists:
-        print("📦 Creating database...")
-        init_db()
-        seed_sample_data()
-    else:
-        print("✅ Database already exists")
+    # Resume AI verification jobs left over from the last run
+    verification_queue.start()
+    
+    # Drop uploads no attachment references any more, and abandoned resumable uploads
+    collect_garbage()
+    purge_expired_uploads()
     
     print(f"📁 Upload folder: {Config.UPLOAD_FOLDER}")
     print(f"🌐 CORS enabled for: {Config.CORS_ORIGINS}")
+    print(f"🧩 Worker {WORKER_ID}, message queue: {Config.SOCKETIO_MESSAGE_QUEUE or 'none'}")
     print("✅ Backend initialized successfully!")
 
+def shutdown_app():
+    """Write pending work and leave the cluster before the process exits"""
+    location_store.stop()
+    verification_queue.stop(timeout=Config.SERVER_DRAIN_SECONDS)
+    worker_registry.stop()
+    db_writer.stop()
+    print("👋 Backend stopped")
+
 if __name__ == '__main__':
     initialize_app()
+    port = Config.PORT
     
     print("\n" + "="*50)
     print("🚀 Starting Crisis Management Backend Server")
     print("="*50)
-    print(f"📡 HTTP Server: http://localhost:5000")
-    print(f"🔌 WebSocket Server: ws://localhost:5000")
-    print(f"📊 API Endpoints: http://localhost:5000/api")
+    print(f"📡 HTTP Server: http://localhost:{port}")
+    print(f"🔌 WebSocket Server: ws://localhost:{port}")
+    print(f"📊 API Endpoints: http://localhost:{port}/api")
     print("="*50 + "\n")
     
-    # Run with SocketIO
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True, allow_unsafe_werkzeug=True)
+    # Development server with the reloader; use serve.py in production
+    socketio.run(app, host='0.0.0.0', port=port, debug=True, allow_unsafe_werkzeug=True)
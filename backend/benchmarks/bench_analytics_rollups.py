@@ -0,0 +1,155 @@
+"""
+Benchmark: incident statistics from rollups vs. the raw tables.
+
+Seeds a month of incidents with timeline events, then times
+get_incident_statistics (hourly rollups) against the queries it replaced,
+which scanned the window and ran a correlated MIN(created_at) subquery per
+timeline row. Also measures what the rollup triggers add to each write and
+checks that both paths report the same numbers.
+
+Run from the backend directory:
+    python -m benchmarks.bench_analytics_rollups
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from config import Config
+
+Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench_rollups.db')
+
+import database
+from analytics_rollups import check_rollups
+from utils.analytics_utils import get_incident_statistics
+
+INCIDENTS = 20000
+EVENTS_PER_INCIDENT = 4
+WINDOW_DAYS = 30
+RUNS = 5
+
+TYPES = ['fire', 'flood', 'earthquake', 'accident', 'medical']
+SEVERITIES = ['low', 'medium', 'high', 'critical']
+STATUSES = ['active', 'resolved', 'pending']
+EVENT_TYPES = ['personnel_arrived', 'status_update', 'incident_updated', 'personnel_assigned']
+
+def seed(conn, count, offset=0):
+    """
+    Insert `count` incidents spread over the window, each with timeline events
+    Event times are distinct per incident: the old query counted ties twice
+    """
+    rng = random.Random(offset)
+    cursor = conn.cursor()
+    # Reported in time order, as they are in production
+    ages = sorted((rng.randrange(WINDOW_DAYS * 24 * 60) for _ in range(count)), reverse=True)
+    for i, age_minutes in enumerate(ages):
+        status = rng.choice(STATUSES)
+        cursor.execute('''
+            INSERT INTO incidents (title, type, severity, status, lat, lng, created_at, resolved_at)
+            VALUES (?, ?, ?, ?, 19.0, 72.8, datetime('now', ?),
+                    CASE WHEN ? = 'resolved' THEN datetime('now', ?) END)
+        ''', (f'Incident {offset + i}', rng.choice(TYPES), rng.choice(SEVERITIES), status,
+              f'-{age_minutes} minutes', status, f'-{age_minutes // 2} minutes'))
+        incident_id = cursor.lastrowid
+        cursor.executemany('''
+            INSERT INTO incident_timeline (incident_id, event_type, description, created_at)
+            VALUES (?, ?, 'event', datetime('now', ?, ?))
+        ''', [(incident_id, rng.choice(EVENT_TYPES), f'-{age_minutes} minutes', f'+{seconds} seconds')
+              for seconds in rng.sample(range(60, 7200), EVENTS_PER_INCIDENT)])
+    conn.commit()
+
+def raw_statistics(conn):
+    """The statements get_incident_statistics ran before the rollups"""
+    cursor = conn.cursor()
+    cutoff = f'-{WINDOW_DAYS} days'
+    cursor.execute('''
+        SELECT COUNT(*) as total,
+               SUM(CASE WHEN status = 'active' THEN 1 ELSE 0 END) as active,
+               SUM(CASE WHEN status = 'resolved' THEN 1 ELSE 0 END) as resolved,
+               SUM(CASE WHEN severity = 'critical' THEN 1 ELSE 0 END) as critical
+        FROM incidents WHERE created_at >= datetime('now', ?)
+    ''', (cutoff,))
+    totals = dict(cursor.fetchone())
+    cursor.execute('''
+        SELECT type, COUNT(*) as count FROM incidents
+        WHERE created_at >= datetime('now', ?) GROUP BY type ORDER BY count DESC
+    ''', (cutoff,))
+    cursor.fetchall()
+    cursor.execute('''
+        SELECT severity, COUNT(*) as count FROM incidents
+        WHERE created_at >= datetime('now', ?) GROUP BY severity
+    ''', (cutoff,))
+    cursor.fetchall()
+    cursor.execute('''
+        SELECT AVG((julianday(t.created_at) - julianday(i.created_at)) * 24 * 60) as avg_response_time
+        FROM incidents i
+        JOIN incident_timeline t ON i.id = t.incident_id
+        WHERE i.created_at >= datetime('now', ?)
+        AND t.event_type IN ('personnel_arrived', 'status_update')
+        AND t.created_at = (
+            SELECT MIN(created_at) FROM incident_timeline
+            WHERE incident_id = i.id
+            AND event_type IN ('personnel_arrived', 'status_update')
+        )
+    ''', (cutoff,))
+    avg_response = cursor.fetchone()['avg_response_time']
+    cursor.execute('''
+        SELECT AVG((julianday(resolved_at) - julianday(created_at)) * 24 * 60) as avg_resolution_time
+        FROM incidents
+        WHERE created_at >= datetime('now', ?) AND status = 'resolved' AND resolved_at IS NOT NULL
+    ''', (cutoff,))
+    cursor.fetchone()
+    return totals, round(avg_response, 2)
+
+def best_ms(func):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+def main():
+    database.init_db()
+    conn = database.get_db_connection()
+
+    # Triggers on vs. off for the same rows
+    start = time.perf_counter()
+    seed(conn, INCIDENTS // 2)
+    with_triggers_s = time.perf_counter() - start
+
+    triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'incident_rollups%'").fetchall()
+    for trigger in triggers:
+        conn.execute(f"DROP TRIGGER {trigger['name']}")
+    start = time.perf_counter()
+    seed(conn, INCIDENTS // 2, offset=INCIDENTS)
+    without_triggers_s = time.perf_counter() - start
+    conn.execute('DELETE FROM incident_timeline WHERE incident_id > ?', (INCIDENTS // 2,))
+    conn.execute('DELETE FROM incidents WHERE id > ?', (INCIDENTS // 2,))
+    for trigger in triggers:
+        conn.execute(trigger['sql'])
+    seed(conn, INCIDENTS // 2, offset=INCIDENTS)
+    conn.execute('ANALYZE')
+
+    raw_ms, (raw_totals, raw_response) = best_ms(lambda: raw_statistics(conn))
+    rollup_ms, stats = best_ms(lambda: get_incident_statistics(WINDOW_DAYS))
+    rollup_rows = conn.execute('SELECT COUNT(*) FROM incident_rollups').fetchone()[0]
+    conn.close()
+
+    per_write = (with_triggers_s - without_triggers_s) / (INCIDENTS // 2 * (1 + EVENTS_PER_INCIDENT)) * 1e6
+    print(f'{INCIDENTS} incidents, {INCIDENTS * EVENTS_PER_INCIDENT} timeline events, {rollup_rows} rollup rows')
+    print(f'Statistics: raw tables {raw_ms:.1f} ms, rollups {rollup_ms:.1f} ms ({raw_ms / rollup_ms:.0f}x faster)')
+    print(f'Trigger cost: {per_write:.1f} µs per incident/timeline write')
+
+    mismatches = check_rollups()
+    same = (stats['incident_stats']['total'] == raw_totals['total']
+            and stats['incident_stats']['critical'] == raw_totals['critical']
+            and abs(stats['avg_response_time_minutes'] - raw_response) < 0.01)
+    if mismatches or not same:
+        print(f'❌ Rollups disagree with the raw tables ({len(mismatches)} row(s))')
+        sys.exit(1)
+    print('✅ Rollups match the raw tables')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: content-addressed upload store.
+
+Uploads the same evidence files to several incidents, the way a photo
+forwarded between responders arrives again and again, and compares the bytes
+on disk with the bytes uploaded. Also times first uploads against repeats,
+which only hash the stream and skip the write.
+
+Run from the backend directory:
+    python -m benchmarks.bench_blob_store
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+from config import Config
+
+TEMP_DIR = tempfile.mkdtemp()
+Config.DATABASE_PATH = os.path.join(TEMP_DIR, 'bench_blobs.db')
+Config.UPLOAD_FOLDER = os.path.join(TEMP_DIR, 'uploads')
+
+import database
+from app import app
+from blob_store import blob_stats
+from utils.ai_utils import FakeAIHandler
+from verification_queue import verification_queue
+
+DISTINCT_FILES = 5
+FILE_SIZE = 8 * 1024 * 1024  # Typical phone video clip
+INCIDENTS = 10  # Every file is uploaded to every incident
+
+def disk_usage(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+def main():
+    database.init_db()
+    verification_queue.handler = FakeAIHandler(latency_ms=0)
+
+    client = app.test_client()
+    for i in range(INCIDENTS):
+        client.post('/api/incidents', json={
+            'title': f'Incident {i}', 'type': 'flood', 'severity': 'high',
+            'lat': 19.0 + i * 0.1, 'lng': 72.8 + i * 0.1
+        })
+    files = [os.urandom(FILE_SIZE) for _ in range(DISTINCT_FILES)]
+
+    first_s, repeat_s = [], []
+    uploaded_bytes = 0
+    for incident_id in range(1, INCIDENTS + 1):
+        for i, data in enumerate(files):
+            start = time.perf_counter()
+            response = client.post(f'/api/incidents/{incident_id}/upload', data={
+                'file': (io.BytesIO(data), f'clip_{i}.mp4')
+            }, content_type='multipart/form-data')
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 201
+            (repeat_s if response.get_json()['file_info']['deduplicated'] else first_s).append(elapsed)
+            uploaded_bytes += len(data)
+    verification_queue.stop()
+
+    stored_bytes = disk_usage(Config.UPLOAD_FOLDER)
+    stats = blob_stats()
+    print(f'Uploads: {INCIDENTS * DISTINCT_FILES} x {FILE_SIZE // 1024 // 1024} MB '
+          f'({DISTINCT_FILES} distinct files, each sent to {INCIDENTS} incidents)')
+    print(f'Disk: {uploaded_bytes / 1024 / 1024:.0f} MB uploaded, {stored_bytes / 1024 / 1024:.0f} MB stored '
+          f'({uploaded_bytes / stored_bytes:.0f}x less)')
+    print(f"Blobs: {stats['blobs']}, {stats['saved_bytes'] / 1024 / 1024:.0f} MB saved by deduplication")
+    print(f'Upload time: first copy {sum(first_s) / len(first_s) * 1000:.1f} ms, '
+          f'repeat {sum(repeat_s) / len(repeat_s) * 1000:.1f} ms')
+
+    if stats['blobs'] != DISTINCT_FILES or stored_bytes > DISTINCT_FILES * FILE_SIZE * 1.01:
+        print('❌ Identical uploads were stored more than once')
+        sys.exit(1)
+    print('✅ Each distinct file is stored once')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: GET /api/analytics/dashboard with many dashboards open.
+
+Every open dashboard polls the endpoint. Simulates DASHBOARDS clients
+polling at once while incidents keep being reported, and compares how many
+times the analytics were computed with how many requests were answered, and
+the request latency against computing the analytics on every request.
+
+Run from the backend directory:
+    python -m benchmarks.bench_dashboard_cache
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from config import Config
+
+Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench_dashboard.db')
+Config.UPLOAD_FOLDER = os.path.join(tempfile.mkdtemp(), 'uploads')
+
+import database
+from app import app
+from utils.analytics_utils import _compute_dashboard_analytics
+from utils.result_cache_utils import analytics_cache
+
+DASHBOARDS = 50
+POLLS_PER_DASHBOARD = 20
+POLL_INTERVAL_SECONDS = 0.02  # Compressed from the dashboards' 60 s
+WRITES = 10  # Incident reports spread over the run
+SEED_INCIDENTS = 5000
+
+def seed():
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO incidents (title, type, severity, status, lat, lng, created_at)
+        VALUES (?, 'flood', 'high', 'active', 19.0, 72.8, datetime('now', ?))
+    ''', [(f'Flood {i}', f'-{i} minutes') for i in range(SEED_INCIDENTS)])
+    conn.executemany('''
+        INSERT INTO personnel (name, role, status) VALUES (?, 'rescuer', 'available')
+    ''', [(f'Rescuer {i}',) for i in range(500)])
+    conn.executemany('''
+        INSERT INTO resources (name, type, status) VALUES (?, 'boat', 'available')
+    ''', [(f'Boat {i}',) for i in range(500)])
+    conn.commit()
+    conn.close()
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    database.init_db()
+    seed()
+
+    start = time.perf_counter()
+    for _ in range(5):
+        _compute_dashboard_analytics()
+    uncached_ms = (time.perf_counter() - start) / 5 * 1000
+
+    latencies = []
+    latencies_lock = threading.Lock()
+    barrier = threading.Barrier(DASHBOARDS + 1)
+
+    def dashboard():
+        client = app.test_client()
+        barrier.wait()
+        for _ in range(POLLS_PER_DASHBOARD):
+            started = time.perf_counter()
+            response = client.get('/api/analytics/dashboard')
+            elapsed = (time.perf_counter() - started) * 1000
+            assert response.status_code == 200
+            with latencies_lock:
+                latencies.append(elapsed)
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+    def reporter():
+        client = app.test_client()
+        barrier.wait()
+        for i in range(WRITES):
+            time.sleep(POLL_INTERVAL_SECONDS * POLLS_PER_DASHBOARD / WRITES)
+            client.post('/api/incidents', json={
+                'title': f'New report {i}', 'type': 'fire', 'severity': 'critical',
+                'lat': 21.0 + i, 'lng': 75.0 + i
+            })
+
+    threads = [threading.Thread(target=dashboard) for _ in range(DASHBOARDS)]
+    threads.append(threading.Thread(target=reporter))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    metrics = analytics_cache.metrics()
+    requests = DASHBOARDS * POLLS_PER_DASHBOARD
+    print(f'{DASHBOARDS} dashboards x {POLLS_PER_DASHBOARD} polls with {WRITES} incident reports, '
+          f'{SEED_INCIDENTS} incidents')
+    print(f"Computations: {metrics['computes']} for {requests} requests (without the cache: {requests})")
+    print(f"Hit ratio {metrics['hit_ratio']:.1%} ({metrics['stale_hits']} stale), "
+          f"{metrics['coalesced']} misses coalesced, {metrics['invalidations']} invalidations")
+    print(f'Latency: uncached compute {uncached_ms:.1f} ms, cached request '
+          f'p50 {percentile(latencies, 0.5):.2f} ms, p99 {percentile(latencies, 0.99):.1f} ms')
+
+    # Every write invalidates at most one computation; single-flight keeps it that way
+    if metrics['computes'] > WRITES + 3:
+        print('❌ Concurrent requests recomputed the analytics')
+        sys.exit(1)
+    # The response reflects the last report once the dashboard polls again
+    total = app.test_client().get('/api/analytics/dashboard').get_json()['analytics']['incidents']['incident_stats']['total']
+    if total != SEED_INCIDENTS + WRITES:
+        print(f'❌ Dashboard missed writes ({total} incidents)')
+        sys.exit(1)
+    print('✅ Dashboards share one computation per change')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark: bytes a dashboard downloads to catch up, full reload vs. delta sync.
+
+Before GET /api/sync the dashboard refetched GET /api/incidents (with nested
+responders, resources and attachments), /api/personnel and /api/resources
+after every change and reconnect. Seeds INCIDENTS incidents with responders,
+resources and attachments, takes a sync cursor, then replays scenarios from
+one status change to a reconnect after a minute of activity. Reports bytes
+and time for the full reload and for the delta, checks that applying the
+deltas reproduces the full state, and reports what the change_log triggers
+add to a batched location flush.
+
+Run from the backend directory:
+    python -m benchmarks.bench_delta_sync
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from config import Config
+
+Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench_sync.db')
+Config.UPLOAD_FOLDER = os.path.join(tempfile.mkdtemp(), 'uploads')
+
+import database
+from app import app
+from location_store import location_store
+from routes.sync import SYNC_ENTITIES
+
+INCIDENTS = 500
+RESPONDERS_PER_INCIDENT = 2
+ATTACHMENTS_PER_INCIDENT = 2
+FLUSH_ROWS = 1000
+FLUSH_ROUNDS = 20
+
+client = app.test_client()
+
+def seed():
+    rng = random.Random(5)
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    for i in range(INCIDENTS):
+        cursor.execute('''
+            INSERT INTO incidents (title, description, type, severity, status, lat, lng, location_name)
+            VALUES (?, 'Water level rising, residents on rooftops', 'flood', 'high', 'active', ?, ?, 'Riverside')
+        ''', (f'Flood {i}', 19.0 + rng.random(), 72.8 + rng.random()))
+        incident_id = cursor.lastrowid
+        cursor.executemany('''
+            INSERT INTO personnel (name, role, status, lat, lng, assigned_incident_id)
+            VALUES (?, 'Rescuer', 'on-scene', ?, ?, ?)
+        ''', [(f'Rescuer {i}-{n}', 19.0 + rng.random(), 72.8 + rng.random(), incident_id)
+              for n in range(RESPONDERS_PER_INCIDENT)])
+        cursor.execute('''
+            INSERT INTO resources (name, type, status, assigned_incident_id)
+            VALUES (?, 'boat', 'deployed', ?)
+        ''', (f'Boat {i}', incident_id))
+        cursor.executemany('''
+            INSERT INTO attachments (incident_id, filename, filepath, file_type, file_size)
+            VALUES (?, ?, ?, 'image', 1024)
+        ''', [(incident_id, f'photo_{n}.jpg', f'uploads/incident_{incident_id}/photo_{n}.jpg')
+              for n in range(ATTACHMENTS_PER_INCIDENT)])
+    conn.commit()
+    conn.close()
+
+def timed_get(path):
+    start = time.perf_counter()
+    response = client.get(path)
+    return response, len(response.data), (time.perf_counter() - start) * 1000
+
+def full_reload():
+    """What the dashboard fetched before; returns bytes and ms"""
+    size = elapsed = 0
+    for path in ('/api/incidents', '/api/personnel', '/api/resources'):
+        _, nbytes, ms = timed_get(path)
+        size += nbytes
+        elapsed += ms
+    return size, elapsed
+
+def pull(state, cursor):
+    """Apply every change since cursor to state; returns the new cursor, bytes and ms"""
+    size = elapsed = 0
+    while True:
+        response, nbytes, ms = timed_get(f'/api/sync?since={cursor}')
+        size += nbytes
+        elapsed += ms
+        data = response.get_json()
+        for entity in SYNC_ENTITIES:
+            for row in data[entity]:
+                state[entity][row['id']] = row
+            for entity_id in data['deleted'][entity]:
+                state[entity].pop(entity_id, None)
+        cursor = data['cursor']
+        if not data['has_more']:
+            return cursor, size, elapsed
+
+def database_state():
+    conn = database.get_db_connection()
+    state = {entity: {row['id']: dict(row) for row in conn.execute(f'SELECT * FROM {entity}')}
+             for entity in SYNC_ENTITIES}
+    conn.close()
+    return state
+
+def same_rows(synced, stored):
+    return all(
+        synced[entity].keys() == stored[entity].keys()
+        and all(all(synced[entity][i][column] == value for column, value in row.items())
+                for i, row in stored[entity].items())
+        for entity in SYNC_ENTITIES
+    )
+
+def status_change(rng):
+    client.put(f'/api/personnel/{rng.randrange(1, INCIDENTS * RESPONDERS_PER_INCIDENT + 1)}/status',
+               json={'status': 'responding'})
+
+def new_report(rng):
+    client.post('/api/incidents', json={'title': 'Roof collapse', 'type': 'collapse', 'severity': 'critical',
+                                        'lat': 19.0 + rng.random(), 'lng': 72.8 + rng.random()})
+
+def minute_of_activity(rng):
+    """100 responders moving, 20 status changes and 5 new reports"""
+    for personnel_id in rng.sample(range(1, INCIDENTS * RESPONDERS_PER_INCIDENT + 1), 100):
+        location_store.update(personnel_id, 19.0 + rng.random(), 72.8 + rng.random())
+    location_store.flush()
+    for _ in range(20):
+        status_change(rng)
+    for _ in range(5):
+        new_report(rng)
+
+SCENARIOS = [
+    ('1 status change', status_change),
+    ('1 new report', new_report),
+    ('Reconnect after 1 min', minute_of_activity),
+]
+
+def flush_ms(conn, rng):
+    """Median time to write FLUSH_ROWS positions in one batch, as location_store does"""
+    timings = []
+    for _ in range(FLUSH_ROUNDS):
+        rows = [(19.0 + rng.random(), 72.8 + rng.random(), personnel_id) for personnel_id in range(1, FLUSH_ROWS + 1)]
+        start = time.perf_counter()
+        conn.executemany("UPDATE personnel SET lat = ?, lng = ?, updated_at = datetime('now') WHERE id = ?", rows)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+def trigger_overhead():
+    rng = random.Random(9)
+    conn = database.get_db_connection()
+    conn.execute('BEGIN')
+    with_triggers = flush_ms(conn, rng)
+    conn.execute('DROP TRIGGER personnel_change_log_update')
+    without = flush_ms(conn, rng)
+    conn.rollback()  # Undoes the writes and restores the trigger
+    conn.close()
+    print(f'Location flush of {FLUSH_ROWS} rows: {with_triggers:.1f} ms with change_log triggers, '
+          f'{without:.1f} ms without')
+
+def main():
+    database.init_db()
+    seed()
+    rng = random.Random(7)
+    state = {entity: {} for entity in SYNC_ENTITIES}
+    cursor, size, ms = pull(state, 0)
+    print(f'{INCIDENTS} incidents, {INCIDENTS * RESPONDERS_PER_INCIDENT} responders, '
+          f'{INCIDENTS * ATTACHMENTS_PER_INCIDENT} attachments; first sync {size / 1024:.0f} KiB in {ms:.0f} ms')
+    print(f"{'scenario':<22} {'full reload':>16} {'delta sync':>16}")
+
+    failed = False
+    for name, scenario in SCENARIOS:
+        scenario(rng)
+        full_bytes, full_ms = full_reload()
+        cursor, delta_bytes, delta_ms = pull(state, cursor)
+        print(f'{name:<22} {full_bytes / 1024:>9.0f} KiB {full_ms:>3.0f} ms '
+              f'{delta_bytes / 1024:>9.1f} KiB {delta_ms:>3.0f} ms   ({full_bytes / delta_bytes:.0f}x fewer bytes)')
+        if not same_rows(state, database_state()):
+            print(f'❌ Applying the deltas after "{name}" does not reproduce the database')
+            failed = True
+
+    trigger_overhead()
+    if failed:
+        sys.exit(1)
+    print('✅ Deltas reproduce the full state after every scenario')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark: response time percentiles from stored sketches vs. exact.
+
+Seeds three months of incidents with long-tailed (log-normal) response and
+resolution times, then asks for p50/p90/p99 over random windows, overall,
+for one type and per type. Each answer is checked against the exact
+percentile computed by sorting the raw durations of the same window, and
+timed against that exact computation and LATENCY_BUDGET_MS. Also times
+status changes of the oldest and newest incidents, which must cost the same.
+
+Run from the backend directory:
+    python -m benchmarks.bench_duration_sketch
+"""
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import Config
+
+Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench_sketch.db')
+
+import database
+from analytics_rollups import check_rollups, window_bounds
+from utils.analytics_utils import get_duration_distribution
+from utils.sketch_utils import MIN_SKETCH_VALUE, SKETCH_RELATIVE_ACCURACY
+
+INCIDENTS = 30000
+DAYS = 90
+WINDOWS = 200
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+TYPES = ['fire', 'flood', 'earthquake', 'accident', 'medical']
+# Median read latency allowed per query kind (ms); a window reads at most two spans per level
+LATENCY_BUDGET_MS = {'overall': 3.0, 'one type': 3.0, 'per type': 12.0}
+
+def seed(conn):
+    rng = random.Random(7)
+    ages = sorted((rng.randrange(DAYS * 24 * 60) for _ in range(INCIDENTS)), reverse=True)
+    cursor = conn.cursor()
+    for i, age_minutes in enumerate(ages):
+        if i % 50 == 0:
+            age_minutes = rng.randrange(age_minutes, DAYS * 24 * 60)  # Reported late
+        response = rng.lognormvariate(math.log(12), 0.9)  # Median 12 minutes, long tail
+        resolved = rng.random() < 0.6
+        age = f'-{age_minutes} minutes'
+        cursor.execute('''
+            INSERT INTO incidents (title, type, severity, status, lat, lng, created_at, resolved_at)
+            VALUES (?, ?, ?, ?, 19.0, 72.8, datetime('now', ?), CASE WHEN ? THEN datetime('now', ?, ?) END)
+        ''', (f'Incident {i}', rng.choice(TYPES), rng.choice(['low', 'high', 'critical']),
+              'resolved' if resolved else 'active', age, resolved, age,
+              f'+{rng.lognormvariate(math.log(240), 1.0):.3f} minutes'))
+        cursor.execute('''
+            INSERT INTO incident_timeline (incident_id, event_type, description, created_at)
+            VALUES (?, 'personnel_arrived', 'arrived', datetime('now', ?, ?))
+        ''', (cursor.lastrowid, age, f'+{response:.4f} minutes'))
+    conn.commit()
+
+def exact_percentiles(conn, start, end, incident_type=None, group_by=None):
+    """Sort every response time in the window (the rounding window_bounds applies)"""
+    lower, upper = (datetime.fromtimestamp(hour * 3600, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                    for hour in window_bounds(start, end))
+    rows = conn.execute('''
+        SELECT i.type, (julianday(MIN(t.created_at)) - julianday(i.created_at)) * 1440 AS minutes
+        FROM incidents i
+        JOIN incident_timeline t ON t.incident_id = i.id AND t.event_type IN ('personnel_arrived', 'status_update')
+        WHERE i.created_at >= ? AND i.created_at < ? AND i.type = COALESCE(?, i.type)
+        GROUP BY i.id
+    ''', (lower, upper, incident_type)).fetchall()
+    groups = {}
+    for row in rows:
+        groups.setdefault(row['type'] if group_by else None, []).append(row['minutes'])
+    percentiles = {}
+    for group, values in groups.items():
+        values.sort()
+        percentiles[group] = {name: values[math.floor(q * (len(values) - 1))] for name, q in QUANTILES.items()}
+    return percentiles
+
+def time_status_changes(conn, incident_id, repeats=50):
+    """Median ms to flip an incident's status, sketches updated by the triggers"""
+    timings = []
+    for n in range(repeats):
+        started = time.perf_counter()
+        conn.execute('UPDATE incidents SET status = ? WHERE id = ?', ('active' if n % 2 else 'responding', incident_id))
+        conn.commit()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def relative_error(estimate, exact):
+    """Error relative to the exact value, not counting the rounding to 0.01 minutes"""
+    if exact <= MIN_SKETCH_VALUE:
+        return 0.0 if estimate == 0 else 1.0
+    return max(0.0, abs(estimate - exact) - 0.005) / exact
+
+def main():
+    database.init_db()
+    conn = database.get_db_connection()
+    start = time.perf_counter()
+    seed(conn)
+    print(f'Seeded {INCIDENTS} incidents over {DAYS} days in {time.perf_counter() - start:.1f} s')
+    # Incidents arrive out of order, landing in spans before and between existing ones
+    if check_rollups():
+        print('❌ Trigger-maintained sketches disagree with the raw tables')
+        sys.exit(1)
+
+    oldest, newest = conn.execute('''
+        SELECT (SELECT id FROM incidents ORDER BY created_at LIMIT 1),
+               (SELECT id FROM incidents ORDER BY created_at DESC LIMIT 1)
+    ''').fetchone()
+    oldest_ms, newest_ms = time_status_changes(conn, oldest), time_status_changes(conn, newest)
+    print(f'Status change: oldest incident {oldest_ms:.2f} ms, newest {newest_ms:.2f} ms')
+
+    rng = random.Random(11)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    sketch_ms, exact_ms, worst = {}, [], 0.0
+    for _ in range(WINDOWS):
+        window_start = now - timedelta(minutes=rng.randrange(DAYS * 24 * 60))
+        window_end = min(now, window_start + timedelta(minutes=rng.randrange(60, DAYS * 24 * 60)))
+
+        query, incident_type, group_by = rng.choice([
+            ('overall', None, None), ('one type', rng.choice(TYPES), None), ('per type', None, 'type')
+        ])
+
+        started = time.perf_counter()
+        distribution = get_duration_distribution('response', start=window_start, end=window_end,
+                                                 incident_type=incident_type, group_by=group_by)
+        sketch_ms.setdefault(query, []).append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        exact = exact_percentiles(conn, window_start, window_end, incident_type, group_by)
+        exact_ms.append((time.perf_counter() - started) * 1000)
+
+        for group, percentiles in exact.items():
+            summary = distribution['groups'][group] if group_by else distribution['overall']
+            for name, value in percentiles.items():
+                worst = max(worst, relative_error(summary[name], value))
+    conn.close()
+
+    exact_ms.sort()
+    print(f'{WINDOWS} random windows (1 hour to {DAYS} days)')
+    for query, timings in sketch_ms.items():
+        timings.sort()
+        print(f'Sketch, {query}: median {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms')
+    print(f'Exact sort: median {exact_ms[len(exact_ms) // 2]:.2f} ms, max {exact_ms[-1]:.2f} ms')
+    print(f'Worst relative error of p50/p90/p99: {worst:.3%} (bound {SKETCH_RELATIVE_ACCURACY:.0%})')
+
+    if worst > SKETCH_RELATIVE_ACCURACY:
+        print('❌ Sketch percentiles exceed the accuracy bound')
+        sys.exit(1)
+    print('✅ Sketch percentiles are within the accuracy bound')
+
+    slow = [query for query, timings in sketch_ms.items()
+            if timings[len(timings) // 2] > LATENCY_BUDGET_MS[query]]
+    if slow:
+        print(f'❌ Sketch reads exceed the latency budget: {", ".join(slow)}')
+        sys.exit(1)
+    print('✅ Sketch reads are within the latency budget')
+
+if __name__ == '__main__':
+    main()
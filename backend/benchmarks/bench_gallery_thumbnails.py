@@ -0,0 +1,109 @@
+"""
+Benchmark: bytes moved to draw the Evidence Gallery.
+
+Uploads GALLERY_SIZE 12 MP photos, then loads the gallery the way the
+dashboard does: GET /api/attachments followed by one image request per item.
+Compares fetching every original (previous grid) with fetching the
+medium thumbnail, and checks that thumbnails are served with long-lived
+cache headers and revalidate with 304.
+
+Run from the backend directory:
+    python -m benchmarks.bench_gallery_thumbnails
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+from config import Config
+
+TEMP_DIR = tempfile.mkdtemp()
+Config.DATABASE_PATH = os.path.join(TEMP_DIR, 'bench_gallery.db')
+Config.UPLOAD_FOLDER = os.path.join(TEMP_DIR, 'uploads')
+
+from PIL import Image
+
+import database
+from app import app
+from utils.ai_utils import FakeAIHandler
+from verification_queue import verification_queue
+
+GALLERY_SIZE = 100
+DISTINCT_PHOTOS = 10  # Each photo is uploaded GALLERY_SIZE / DISTINCT_PHOTOS times
+PHOTO_SIZE = (4032, 3024)
+GRID_SIZE = 'medium'
+
+def sample_photo(seed):
+    """Gradients plus sensor-like noise, encoded like a phone camera would"""
+    red = Image.linear_gradient('L').resize(PHOTO_SIZE).rotate(seed * 30)
+    green = Image.radial_gradient('L').resize(PHOTO_SIZE)
+    blue = Image.effect_noise(PHOTO_SIZE, 20 + seed * 3)
+    buffer = io.BytesIO()
+    Image.merge('RGB', (red, green, blue)).save(buffer, 'JPEG', quality=92)
+    return buffer.getvalue()
+
+def main():
+    database.init_db()
+    verification_queue.handler = FakeAIHandler(latency_ms=0)
+
+    client = app.test_client()
+    client.post('/api/incidents', json={
+        'title': 'Bridge collapse', 'type': 'infrastructure', 'severity': 'critical', 'lat': 19.07, 'lng': 72.87
+    })
+
+    print(f'Uploading {GALLERY_SIZE} photos of {PHOTO_SIZE[0]}x{PHOTO_SIZE[1]}...')
+    photos = [sample_photo(seed) for seed in range(DISTINCT_PHOTOS)]
+    start = time.perf_counter()
+    for i in range(GALLERY_SIZE):
+        response = client.post('/api/incidents/1/upload', data={
+            'file': (io.BytesIO(photos[i % DISTINCT_PHOTOS]), f'photo_{i}.jpg')
+        }, content_type='multipart/form-data')
+        assert response.status_code == 201
+    upload_s = time.perf_counter() - start
+
+    # Let background generation finish so the grid measures serving, not generating
+    start = time.perf_counter()
+    while True:
+        conn = database.get_db_connection()
+        generated = conn.execute('SELECT COUNT(DISTINCT attachment_id) FROM attachment_derivatives').fetchone()[0]
+        conn.close()
+        if generated == GALLERY_SIZE:
+            break
+        time.sleep(0.1)
+    generate_s = time.perf_counter() - start
+    verification_queue.stop()
+
+    attachments = client.get(f'/api/attachments?limit={GALLERY_SIZE}').get_json()['attachments']
+
+    start = time.perf_counter()
+    original_bytes = sum(len(client.get(f"/{a['filepath']}").data) for a in attachments)
+    original_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    thumbnail_bytes = 0
+    for attachment in attachments:
+        response = client.get(attachment['thumbnails'][GRID_SIZE])
+        assert response.status_code == 200
+        thumbnail_bytes += len(response.data)
+    thumbnail_s = time.perf_counter() - start
+
+    revalidated = client.get(attachments[-1]['thumbnails'][GRID_SIZE],
+                             headers={'If-None-Match': response.headers['ETag']})
+
+    print(f'Uploads: {upload_s:.1f}s, background thumbnails ready {generate_s:.1f}s later')
+    print(f'Gallery of {len(attachments)}: originals {original_bytes / 1024 / 1024:.1f} MB in {original_s * 1000:.0f} ms, '
+          f'{GRID_SIZE} thumbnails {thumbnail_bytes / 1024:.0f} KB in {thumbnail_s * 1000:.0f} ms '
+          f'({original_bytes / thumbnail_bytes:.0f}x fewer bytes)')
+    print(f"Cache-Control: {response.headers['Cache-Control']}; revalidation status {revalidated.status_code}")
+
+    if 'immutable' not in response.headers['Cache-Control'] or revalidated.status_code != 304:
+        print('❌ Thumbnails are not cacheable')
+        sys.exit(1)
+    if thumbnail_bytes * 100 > original_bytes:
+        print('❌ Thumbnails are not two orders of magnitude smaller')
+        sys.exit(1)
+    print('✅ Gallery moves kilobytes instead of megabytes')
+
+if __name__ == '__main__':
+    main()
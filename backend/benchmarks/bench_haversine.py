@@ -0,0 +1,73 @@
+"""
+Benchmark: scalar vs vectorized haversine distances.
+
+Compares a Python loop over geo_utils.calculate_distance with the batch
+geo_utils.distances_from (one-to-many) and distance_matrix (many-to-many),
+and checks that both paths agree.
+
+Run from the backend directory:
+    python -m benchmarks.bench_haversine
+"""
+import random
+import sys
+import time
+
+from utils import geo_utils
+from utils.geo_utils import calculate_distance, distances_from, distance_matrix
+
+POINT_COUNTS = [1_000, 100_000, 1_000_000]
+MATRIX_SIZE = 1_000
+
+ORIGIN = (19.0760, 72.8777)
+
+def random_points(count):
+    lats = [random.uniform(18.5, 19.5) for _ in range(count)]
+    lngs = [random.uniform(72.5, 73.5) for _ in range(count)]
+    return lats, lngs
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    if geo_utils.np is None:
+        print('❌ NumPy is not installed; nothing to compare against the scalar path')
+        sys.exit(1)
+
+    random.seed(42)
+    lat, lng = ORIGIN
+
+    print('One-to-many')
+    print(f"{'points':>10} {'scalar ms':>11} {'vector ms':>11} {'speedup':>9} {'max diff m':>11}")
+    for count in POINT_COUNTS:
+        lats, lngs = random_points(count)
+        scalar, scalar_s = timed(lambda: [calculate_distance(lat, lng, a, b) for a, b in zip(lats, lngs)])
+        vector, vector_s = timed(lambda: distances_from(lat, lng, lats, lngs))
+
+        max_diff = max(abs(a - b) for a, b in zip(scalar, vector))
+        print(f'{count:>10} {scalar_s * 1000:>11.1f} {vector_s * 1000:>11.1f} '
+              f'{scalar_s / vector_s:>8.1f}x {max_diff:>11.2e}')
+        if max_diff > 1e-6:
+            print('❌ Vectorized distances disagree with calculate_distance')
+            sys.exit(1)
+
+    print(f'\nMany-to-many ({MATRIX_SIZE} x {MATRIX_SIZE})')
+    lats1, lngs1 = random_points(MATRIX_SIZE)
+    lats2, lngs2 = random_points(MATRIX_SIZE)
+    scalar, scalar_s = timed(lambda: [
+        [calculate_distance(a, b, c, d) for c, d in zip(lats2, lngs2)]
+        for a, b in zip(lats1, lngs1)
+    ])
+    matrix, vector_s = timed(lambda: distance_matrix(lats1, lngs1, lats2, lngs2))
+    max_diff = max(abs(a - b) for row, vrow in zip(scalar, matrix) for a, b in zip(row, vrow))
+    print(f'scalar {scalar_s * 1000:.1f} ms, vector {vector_s * 1000:.1f} ms, '
+          f'{scalar_s / vector_s:.1f}x, max diff {max_diff:.2e} m')
+    if max_diff > 1e-6:
+        print('❌ Distance matrix disagrees with calculate_distance')
+        sys.exit(1)
+
+    print('✅ Vectorized distances match the scalar implementation')
+
+if __name__ == '__main__':
+    main()
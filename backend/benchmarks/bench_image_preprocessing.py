@@ -0,0 +1,101 @@
+"""
+Benchmark: model input preparation for AI photo verification.
+
+Builds a corpus of synthetic 12 MP phone-style JPEGs (half of them with an
+EXIF rotation) and compares what used to be sent to the model, the full
+upload decoded and re-encoded at full resolution by the model client, with
+the cached bounded-resolution derivative from
+utils.image_utils.prepare_inference_image.
+
+Run from the backend directory:
+    python -m benchmarks.bench_image_preprocessing
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+from config import Config
+from utils.image_utils import prepare_inference_image
+
+CORPUS_SIZE = 8
+PHOTO_SIZE = (4032, 3024)  # 12 MP
+EXIF_ORIENTATION = 0x0112
+ROTATE_90_CW = 6
+
+def synthetic_photo(path, seed, rotated):
+    """Gradients plus sensor-like noise, saved like a phone camera would"""
+    width, height = PHOTO_SIZE
+    red = Image.linear_gradient('L').resize(PHOTO_SIZE)
+    green = Image.radial_gradient('L').resize(PHOTO_SIZE).rotate(seed * 40)
+    blue = Image.effect_noise(PHOTO_SIZE, 30 + seed * 5)
+    img = Image.merge('RGB', (red, green, blue))
+
+    exif = Image.Exif()
+    if rotated:
+        exif[EXIF_ORIENTATION] = ROTATE_90_CW
+    img.save(path, 'JPEG', quality=92, exif=exif)
+
+def main():
+    corpus_dir = tempfile.mkdtemp()
+    photos = []
+    print(f'Generating {CORPUS_SIZE} synthetic {PHOTO_SIZE[0]}x{PHOTO_SIZE[1]} photos...')
+    for i in range(CORPUS_SIZE):
+        path = os.path.join(corpus_dir, f'photo_{i}.jpg')
+        synthetic_photo(path, i, rotated=i % 2 == 1)
+        photos.append((path, i % 2 == 1))
+
+    print(f"\n{'photo':>8} {'upload KB':>10} {'model KB':>9} {'full res ms':>15} "
+          f"{'prepare ms':>11} {'cached ms':>10} {'size':>10}")
+    totals = {'original': 0, 'derivative': 0, 'full': 0.0, 'prepare': 0.0, 'cached': 0.0}
+    for path, rotated in photos:
+        # Previous pipeline: full-resolution decode, serialized again by the model client
+        start = time.perf_counter()
+        with Image.open(path) as img:
+            img.save(io.BytesIO(), 'JPEG')
+        full_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        derivative, _ = prepare_inference_image(path)
+        prepare_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        prepare_inference_image(path)
+        cached_s = time.perf_counter() - start
+
+        with Image.open(derivative) as small:
+            size = small.size
+        if max(size) > Config.AI_IMAGE_MAX_SIDE or (size[0] < size[1]) != rotated:
+            print(f'❌ {os.path.basename(path)}: unexpected derivative size {size}')
+            sys.exit(1)
+
+        original_bytes = os.path.getsize(path)
+        derivative_bytes = os.path.getsize(derivative)
+        totals['original'] += original_bytes
+        totals['derivative'] += derivative_bytes
+        totals['full'] += full_s
+        totals['prepare'] += prepare_s
+        totals['cached'] += cached_s
+        print(f'{os.path.basename(path)[6:-4]:>8} {original_bytes / 1024:>10.0f} {derivative_bytes / 1024:>9.0f} '
+              f'{full_s * 1000:>15.1f} {prepare_s * 1000:>11.1f} {cached_s * 1000:>10.2f} '
+              f'{size[0]:>5}x{size[1]:<4}')
+
+    byte_ratio = totals['original'] / totals['derivative']
+    pixel_ratio = (PHOTO_SIZE[0] * PHOTO_SIZE[1]) / (Config.AI_IMAGE_MAX_SIDE * Config.AI_IMAGE_MAX_SIDE * 3 / 4)
+    print(f"\nBytes sent to the model: {totals['original'] / 1024 / 1024:.1f} MB -> "
+          f"{totals['derivative'] / 1024 / 1024:.2f} MB ({byte_ratio:.0f}x smaller)")
+    print(f"Pixels per image: {pixel_ratio:.0f}x fewer")
+    print(f"Per image: full resolution {totals['full'] / CORPUS_SIZE * 1000:.0f} ms, "
+          f"prepare {totals['prepare'] / CORPUS_SIZE * 1000:.0f} ms (draft mode), "
+          f"cached {totals['cached'] / CORPUS_SIZE * 1000:.2f} ms")
+
+    if byte_ratio < 10:
+        print('❌ Derivatives are not an order of magnitude smaller')
+        sys.exit(1)
+    print('✅ Derivatives are bounded, upright and an order of magnitude smaller')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: SQL statements issued by GET /api/incidents as the incident count grows.
+
+With batched hydration the statement count must stay constant, while the old
+per-incident lookups grew by three queries per incident.
+
+Run from the backend directory:
+    python -m benchmarks.bench_incident_hydration
+"""
+import os
+import sys
+import tempfile
+import time
+
+from config import Config
+
+Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench_hydration.db')
+
+import database
+from app import app
+import routes.incidents as incidents_routes
+
+INCIDENT_COUNTS = [10, 100, 1000, 2000]
+
+executed = []
+
+def traced_connection():
+    """Database connection that records every statement it executes"""
+    conn = database.get_db_connection()
+    conn.set_trace_callback(executed.append)
+    return conn
+
+def seed(total):
+    """Grow the incidents table to `total` rows with children on each"""
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM incidents')
+    existing = cursor.fetchone()[0]
+
+    for i in range(existing, total):
+        cursor.execute('''
+            INSERT INTO incidents (title, type, severity, status, lat, lng)
+            VALUES (?, 'flood', 'high', 'active', ?, ?)
+        ''', (f'Flood {i}', 19.0 + i * 0.001, 72.8 + i * 0.001))
+        incident_id = cursor.lastrowid
+        cursor.executemany('''
+            INSERT INTO personnel (name, role, status, assigned_incident_id)
+            VALUES (?, 'rescuer', 'on-scene', ?)
+        ''', [(f'Rescuer {i}-{n}', incident_id) for n in range(2)])
+        cursor.execute('''
+            INSERT INTO resources (name, type, status, assigned_incident_id)
+            VALUES (?, 'boat', 'deployed', ?)
+        ''', (f'Boat {i}', incident_id))
+        cursor.executemany('''
+            INSERT INTO attachments (incident_id, filename, filepath, file_type, file_size)
+            VALUES (?, ?, ?, 'image', 1024)
+        ''', [(incident_id, f'photo_{n}.jpg', f'uploads/incident_{incident_id}/photo_{n}.jpg') for n in range(2)])
+
+    conn.commit()
+    conn.close()
+
+def main():
+    database.init_db()
+    incidents_routes.get_db_connection = traced_connection
+    client = app.test_client()
+
+    print(f"{'incidents':>10} {'statements':>11} {'ms':>9}")
+    counts = []
+    for total in INCIDENT_COUNTS:
+        seed(total)
+        executed.clear()
+
+        start = time.perf_counter()
+        response = client.get('/api/incidents')
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        assert response.get_json()['count'] == total
+        statements = [s for s in executed if not s.startswith('PRAGMA')]
+        counts.append(len(statements))
+        print(f'{total:>10} {len(statements):>11} {elapsed_ms:>9.1f}')
+
+    if len(set(counts)) != 1:
+        print('❌ Statement count grows with the number of incidents')
+        sys.exit(1)
+    print('✅ Statement count is constant')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: drawing an incident trend chart.
+
+Before /api/analytics/timeseries the dashboard pulled GET /api/incidents
+and bucketed the incidents itself. Seeds three months of incidents and
+compares, for a 24-hour chart by the minute and a 90-day chart by the hour,
+the bytes sent and the request time of both ways, and checks that both
+count the same incidents per bucket.
+
+Run from the backend directory:
+    python -m benchmarks.bench_incident_timeseries
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from config import Config
+
+Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench_timeseries.db')
+Config.UPLOAD_FOLDER = os.path.join(tempfile.mkdtemp(), 'uploads')
+
+import database
+from app import app
+
+INCIDENTS = 20000
+DAYS = 90
+CHARTS = [('1m', 1), ('1h', DAYS)]
+TYPES = ['fire', 'flood', 'earthquake', 'accident', 'medical']
+
+def seed():
+    rng = random.Random(5)
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO incidents (title, type, severity, status, description, lat, lng, created_at)
+        VALUES (?, ?, ?, 'active', ?, 19.0, 72.8, datetime('now', ?))
+    ''', [(f'Incident {i}', rng.choice(TYPES), rng.choice(['low', 'high', 'critical']),
+           'Reported by a field responder', f'-{rng.randrange(DAYS * 24 * 60)} minutes')
+          for i in range(INCIDENTS)])
+    conn.commit()
+    conn.close()
+
+def timed_get(client, url):
+    started = time.perf_counter()
+    response = client.get(url)
+    elapsed = (time.perf_counter() - started) * 1000
+    assert response.status_code == 200, response.status_code
+    return response, elapsed
+
+def client_side_buckets(incidents, first, width, points):
+    """What the dashboard did with the full incident list"""
+    counts = [0] * points
+    for incident in incidents:
+        created = datetime.strptime(incident['created_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+        slot = (int(created.timestamp()) - first) // width
+        if 0 <= slot < points:
+            counts[slot] += 1
+    return counts
+
+def main():
+    database.init_db()
+    seed()
+    client = app.test_client()
+
+    failed = False
+    for bucket, days in CHARTS:
+        response, series_ms = timed_get(client, f'/api/analytics/timeseries?bucket={bucket}&days={days}')
+        timeseries = response.get_json()['timeseries']
+        series_bytes = len(response.data)
+
+        response, list_ms = timed_get(client, '/api/incidents')
+        list_bytes = len(response.data)
+        started = time.perf_counter()
+        expected = client_side_buckets(response.get_json()['incidents'], timeseries['timestamps'][0],
+                                       timeseries['bucket_seconds'], len(timeseries['timestamps']))
+        list_ms += (time.perf_counter() - started) * 1000
+
+        print(f"{days}-day chart by {bucket} ({len(timeseries['timestamps'])} points of {timeseries['bucket']}):")
+        print(f'  /api/incidents + client bucketing: {list_bytes / 1024:.0f} KiB, {list_ms:.0f} ms')
+        print(f'  /api/analytics/timeseries:         {series_bytes / 1024:.1f} KiB, {series_ms:.1f} ms')
+        if timeseries['series']['all'] != expected:
+            print('  ❌ Bucket counts differ from the incident list')
+            failed = True
+
+    if failed:
+        sys.exit(1)
+    print('✅ Trend charts match the incident list')
+
+if __name__ == '__main__':
+    main()
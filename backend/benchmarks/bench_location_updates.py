@@ -0,0 +1,151 @@
+"""
+Benchmark: sustainable rate of responder location pings.
+
+Before location_store.py every location_update ping committed an UPDATE,
+read the person back and emitted two events. Seeds RESPONDERS personnel,
+then has SENDERS threads ping as fast as the server takes them for
+DURATION_SECONDS through the old per-ping path and through the current
+location_update handler, and reports pings per second, commits, rows
+written and events emitted for each. Checks that the database ends up with
+every responder's last position and that the store keeps up with
+RESPONDERS pinging every PING_INTERVAL_SECONDS.
+
+Run from the backend directory:
+    python -m benchmarks.bench_location_updates
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from config import Config
+
+Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench_locations.db')
+Config.UPLOAD_FOLDER = os.path.join(tempfile.mkdtemp(), 'uploads')
+
+import database
+import app as app_module
+from db_writer import db_writer
+from location_store import location_store
+
+RESPONDERS = 1000
+PING_INTERVAL_SECONDS = 2
+SENDERS = 16
+DURATION_SECONDS = 5
+
+emitted = []
+
+def counting_broadcast(event_name, data, room=None):
+    emitted.append(event_name)
+    app_module.broadcast_event(event_name, data, room=room)
+
+def per_ping_commit(data):
+    """The location_update handler before the location store"""
+    personnel_id, lat, lng = data['personnel_id'], data['lat'], data['lng']
+
+    def save_location(cursor):
+        cursor.execute('''
+            UPDATE personnel
+            SET lat = ?, lng = ?, updated_at = datetime('now')
+            WHERE id = ?
+        ''', (lat, lng, personnel_id))
+        cursor.execute('SELECT * FROM personnel WHERE id = ?', (personnel_id,))
+        return dict(cursor.fetchone())
+
+    person = db_writer.execute(save_location)
+    update = {
+        'personnel_id': personnel_id,
+        'name': person['name'],
+        'location': {'lat': lat, 'lng': lng},
+        'status': person['status']
+    }
+    counting_broadcast('personnel_location_updated', update)
+    if person['assigned_incident_id']:
+        counting_broadcast('personnel_location_updated', update, room=f'incident_{person["assigned_incident_id"]}')
+
+def seed():
+    rng = random.Random(3)
+    conn = database.get_db_connection()
+    conn.execute('''
+        INSERT INTO incidents (title, type, severity, status, lat, lng)
+        VALUES ('Warehouse fire', 'fire', 'high', 'active', 19.07, 72.87)
+    ''')
+    conn.executemany('''
+        INSERT INTO personnel (name, role, status, lat, lng, assigned_incident_id)
+        VALUES (?, 'Responder', 'on-duty', 19.0, 72.8, ?)
+    ''', [(f'Responder {i}', 1 if rng.random() < 0.2 else None) for i in range(RESPONDERS)])
+    conn.commit()
+    conn.close()
+
+def ping_load(handler):
+    """SENDERS threads pinging their own slice of responders; returns pings/s and last positions"""
+    counts = [0] * SENDERS
+    last = {}
+    deadline = time.perf_counter() + DURATION_SECONDS
+
+    def sender(index):
+        rng = random.Random(index)
+        ids = range(index + 1, RESPONDERS + 1, SENDERS)
+        while time.perf_counter() < deadline:
+            personnel_id = rng.choice(ids)
+            data = {'personnel_id': personnel_id,
+                    'lat': round(19.0 + rng.random() / 10, 6), 'lng': round(72.8 + rng.random() / 10, 6)}
+            handler(data)
+            last[personnel_id] = (data['lat'], data['lng'])
+            counts[index] += 1
+
+    threads = [threading.Thread(target=sender, args=(i,)) for i in range(SENDERS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start), last
+
+def run(name, handler, finish=None):
+    emitted.clear()
+    commits = db_writer.metrics()['batches']
+    rate, last = ping_load(handler)
+    if finish:
+        finish()
+    commits = db_writer.metrics()['batches'] - commits
+    print(f'{name:<16}: {rate:,.0f} pings/s, {commits:,} commits, {len(emitted):,} events emitted')
+    return rate, last
+
+def stored_positions():
+    conn = database.get_db_connection()
+    rows = conn.execute('SELECT id, lat, lng FROM personnel').fetchall()
+    conn.close()
+    return {row['id']: (row['lat'], row['lng']) for row in rows}
+
+def main():
+    database.init_db()
+    seed()
+    location_store.broadcast = counting_broadcast
+    needed = RESPONDERS / PING_INTERVAL_SECONDS
+    print(f'{RESPONDERS} responders pinging every {PING_INTERVAL_SECONDS} s need {needed:,.0f} pings/s '
+          f'({SENDERS} senders, {DURATION_SECONDS} s each)')
+
+    before, _ = run('Commit per ping', per_ping_commit)
+    rows_written = location_store.metrics()['rows_written']
+    after, last = run('Location store', app_module.handle_location_update, finish=location_store.stop)
+    rows_written = location_store.metrics()['rows_written'] - rows_written
+    print(f'Location store wrote {rows_written:,} rows for {len(last):,} responders '
+          f'({after / before:.0f}x the ping rate)')
+
+    failed = False
+    stored = stored_positions()
+    if any(stored[personnel_id] != position for personnel_id, position in last.items()):
+        print('❌ Stored positions differ from the last pings')
+        failed = True
+    if after < needed:
+        print(f'❌ Location store sustains fewer than {needed:,.0f} pings/s')
+        failed = True
+    if failed:
+        sys.exit(1)
+    print('✅ Every responder\'s last position was saved')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Benchmark: requests per second and tail latency of the server entry points.
+
+Before serve.py the backend only ran as `python app.py`: the development
+server with the debugger, the reloader and an access log line per request,
+and with blocking database writes and socket I/O that hold up every other
+connection. Starts each entry point on a throwaway database, then has
+CONNECTIONS keep-alive clients send a mix of incident and personnel reads,
+location pings and SOS mesh reports for DURATION_SECONDS. On hosts with
+several cores serve.py also runs one worker per core, each client sticking
+to one worker as behind a load balancer. Reports requests per second,
+median and p99 latency and errors for each, and checks that serve.py
+drains in-flight requests on SIGTERM.
+
+Run from the backend directory:
+    python -m benchmarks.bench_production_server
+"""
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+PORT = 5330
+CONNECTIONS = 32
+DURATION_SECONDS = 10
+RESPONDERS = 50
+INCIDENTS = 100
+
+def start(command, database_path, workers=1):
+    env = dict(os.environ, DATABASE_PATH=database_path, PORT=str(PORT), SERVER_WORKERS=str(workers),
+               PYTHONUNBUFFERED='1')
+    env.pop('SOCKETIO_MESSAGE_QUEUE', None)
+    # A session of its own, so the reloader's child and serve.py's workers are stopped with it
+    server = subprocess.Popen(command, env=env, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    for port in range(PORT, PORT + workers):
+        while True:
+            try:
+                request('GET', '/health', port=port)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    stop(server)
+                    raise RuntimeError(f'{command} did not start')
+                time.sleep(0.2)
+    return server
+
+def stop(server):
+    os.killpg(server.pid, signal.SIGTERM)
+    try:
+        server.wait(40)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+        server.wait()
+
+def request(method, path, body=None, conn=None, port=PORT):
+    own = conn is None
+    conn = conn or http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None,
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        if own:
+            conn.close()
+
+def seed():
+    rng = random.Random(4)
+    for i in range(INCIDENTS):
+        request('POST', '/api/sosmesh', sos_report(rng))
+    for i in range(RESPONDERS):
+        request('POST', '/api/personnel', {'name': f'Responder {i}', 'role': 'Paramedic',
+                                           'lat': 19.0 + rng.random(), 'lng': 72.8 + rng.random()})
+
+def sos_report(rng):
+    return {'msg_id': str(uuid.uuid4()), 'type': 'SOS', 'name': 'Bench', 'emergency': 'Medical Emergency',
+            'latitude': 19.0 + rng.random(), 'longitude': 72.8 + rng.random(),
+            'timestamp': int(time.time() * 1000), 'delivered': False}
+
+def next_request(rng):
+    """Dashboard-like traffic: mostly reads, some pings and new reports"""
+    roll = rng.random()
+    if roll < 0.45:
+        return 'GET', '/api/incidents', None
+    if roll < 0.75:
+        return 'GET', '/api/personnel', None
+    if roll < 0.95:
+        return 'PUT', f'/api/personnel/{rng.randrange(1, RESPONDERS + 1)}/location', {
+            'lat': 19.0 + rng.random(), 'lng': 72.8 + rng.random()}
+    return 'POST', '/api/sosmesh', sos_report(rng)
+
+def load(workers):
+    """CONNECTIONS keep-alive clients spread over the workers; returns requests/s, latencies in ms and errors"""
+    latencies = [[] for _ in range(CONNECTIONS)]
+    errors = [0] * CONNECTIONS
+    deadline = time.perf_counter() + DURATION_SECONDS
+
+    def client(index):
+        rng = random.Random(index)
+        port = PORT + index % workers
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.perf_counter() < deadline:
+            method, path, body = next_request(rng)
+            start_time = time.perf_counter()
+            try:
+                status = request(method, path, body, conn)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                status = None
+            latencies[index].append((time.perf_counter() - start_time) * 1000)
+            if status is None or status >= 500:
+                errors[index] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(CONNECTIONS)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    merged = sorted(latency for per_client in latencies for latency in per_client)
+    return len(merged) / elapsed, merged, sum(errors)
+
+def run(name, command, workers=1):
+    database_path = os.path.join(tempfile.mkdtemp(), 'bench_server.db')
+    server = start(command, database_path, workers)
+    try:
+        seed()
+        rate, latencies, errors = load(workers)
+    finally:
+        stop(server)
+    median = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f'{name:<18}: {rate:,.0f} req/s, median {median:.1f} ms, p99 {p99:.1f} ms, {errors} errors')
+    return rate, p99, errors
+
+def drains_in_flight():
+    """SIGTERM while requests are in flight: every one of them must still be answered"""
+    database_path = os.path.join(tempfile.mkdtemp(), 'bench_drain.db')
+    server = start([sys.executable, 'serve.py'], database_path)
+    statuses = []
+
+    def client():
+        try:
+            statuses.append(request('GET', '/api/incidents'))
+        except ConnectionRefusedError:
+            statuses.append('refused')
+        except (OSError, http.client.HTTPException):
+            statuses.append(None)
+
+    threads = [threading.Thread(target=client) for _ in range(CONNECTIONS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    os.killpg(server.pid, signal.SIGTERM)
+    for thread in threads:
+        thread.join()
+    server.wait(40)
+    # Connections made after the listener closes are refused; accepted ones are answered
+    answered = statuses.count(200)
+    refused = statuses.count('refused')
+    print(f'Drain on SIGTERM   : {answered} answered, {refused} refused, '
+          f'{CONNECTIONS - answered - refused} cut off, exit code {server.returncode}')
+    return answered + refused == CONNECTIONS and server.returncode == 0
+
+def main():
+    print(f'{CONNECTIONS} keep-alive clients for {DURATION_SECONDS} s each ({os.cpu_count()} CPU cores)')
+    before, before_p99, _ = run('python app.py', [sys.executable, 'app.py'])
+    after, after_p99, errors = run('python serve.py', [sys.executable, 'serve.py'])
+    print(f'serve.py: {after / before:.1f}x the requests/s, {after_p99 / before_p99:.1f}x the p99 latency')
+    cores = os.cpu_count() or 1
+    if cores > 1:
+        scaled, scaled_p99, scaled_errors = run(f'serve.py x {cores}', [sys.executable, 'serve.py'], workers=cores)
+        print(f'serve.py x {cores}: {scaled / before:.1f}x the requests/s, {scaled_p99 / before_p99:.1f}x the p99 latency')
+        errors += scaled_errors
+    else:
+        print('One CPU core: skipping the run with a worker per core')
+
+    failed = False
+    if errors:
+        print(f'❌ serve.py answered {errors} requests with errors')
+        failed = True
+    if not drains_in_flight():
+        print('❌ serve.py dropped requests or failed while draining')
+        failed = True
+    if failed:
+        sys.exit(1)
+    print('✅ No errors under load; SIGTERM drained cleanly')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Benchmark: outbound socket bytes with interest-based fan-out.
+
+Before utils/subscription_utils.py location, incident, status and geofence
+events went to every connected client (and incident and location updates a
+second time to the incident room). Connects DASHBOARDS dashboards watching
+one city each and one field device per responder watching the area around
+them and their incident, then replays one round of traffic: every responder
+moves, and there are incident updates, status changes and geofence
+breaches. Reports packets and bytes delivered with global broadcasts and
+with subscriptions, and checks that every dashboard still received every
+responder that moved inside its viewport.
+
+Run from the backend directory:
+    python -m benchmarks.bench_socket_fanout
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+
+from config import Config
+
+Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench_fanout.db')
+Config.UPLOAD_FOLDER = os.path.join(tempfile.mkdtemp(), 'uploads')
+
+import database
+import app as app_module
+from location_store import location_store
+from utils.subscription_utils import INCIDENT_ROOM_PREFIX
+
+CITIES = [(28.61, 77.21), (19.07, 72.87), (12.97, 77.59), (22.57, 88.36), (13.08, 80.27),
+          (17.38, 78.48), (18.52, 73.85), (23.02, 72.57), (26.91, 75.78), (26.85, 80.95)]
+RESPONDERS = 500
+INCIDENTS = 50
+DASHBOARDS = 100
+NEARBY_DEGREES = 0.25  # Field devices watch about 25 km around them
+INCIDENT_UPDATES = 50
+STATUS_UPDATES = 100
+GEOFENCE_BREACHES = 10
+
+socketio = app_module.socketio
+
+def incident_rooms_of(room):
+    return [r for r in ([room] if isinstance(room, str) else room or []) if r.startswith(INCIDENT_ROOM_PREFIX)]
+
+def global_broadcast(event_name, data, room=None):
+    """How events went out before: to everyone, incident updates also to the incident room"""
+    socketio.emit(event_name, data)
+    if event_name == 'incident_updated':
+        for incident_room in incident_rooms_of(room):
+            socketio.emit(event_name, data, to=incident_room)
+
+class GlobalLocationBroadcast:
+    """How a location tick went out before: one batch to everyone, plus one per incident room"""
+
+    def __init__(self):
+        self.updates = []
+        self.by_incident = {}
+
+    def __call__(self, event_name, data, room=None):
+        self.updates.extend(data['updates'])
+        for incident_room in incident_rooms_of(room):
+            self.by_incident.setdefault(incident_room, []).extend(data['updates'])
+
+    def send(self):
+        socketio.emit('personnel_locations_updated', {'updates': self.updates})
+        for incident_room, updates in self.by_incident.items():
+            socketio.emit('personnel_locations_updated', {'updates': updates}, to=incident_room)
+
+def near(rng, city, spread):
+    return city[0] + rng.uniform(-spread, spread), city[1] + rng.uniform(-spread, spread)
+
+def seed():
+    rng = random.Random(2)
+    conn = database.get_db_connection()
+    for i in range(INCIDENTS):
+        lat, lng = near(rng, CITIES[i % len(CITIES)], 0.1)
+        conn.execute('''
+            INSERT INTO incidents (title, type, severity, status, lat, lng)
+            VALUES (?, 'fire', 'high', 'active', ?, ?)
+        ''', (f'Incident {i}', lat, lng))
+    responders = []
+    for i in range(RESPONDERS):
+        lat, lng = near(rng, CITIES[i % len(CITIES)], 0.1)
+        incident_id = rng.randrange(1, INCIDENTS + 1) if rng.random() < 0.3 else None
+        conn.execute('''
+            INSERT INTO personnel (name, role, status, lat, lng, assigned_incident_id)
+            VALUES (?, ?, 'on-duty', ?, ?, ?)
+        ''', (f'Responder {i}', rng.choice(['Fire Fighter', 'Paramedic', 'Police']), lat, lng, incident_id))
+        responders.append({'id': i + 1, 'lat': lat, 'lng': lng, 'incident_id': incident_id})
+    conn.commit()
+    conn.close()
+    return responders
+
+def connect_clients(responders, subscribe):
+    """Dashboards on one city each and a device per responder; returns (dashboards, devices)"""
+    app = app_module.app
+    dashboards = []
+    for i in range(DASHBOARDS):
+        city = CITIES[i % len(CITIES)]
+        viewport = {'south': city[0] - 0.2, 'west': city[1] - 0.3, 'north': city[0] + 0.2, 'east': city[1] + 0.3}
+        client = socketio.test_client(app)
+        if subscribe:
+            client.emit('subscribe', {'viewport': viewport})
+        dashboards.append((client, viewport))
+    devices = []
+    for responder in responders:
+        client = socketio.test_client(app)
+        if responder['incident_id']:
+            client.emit('join_incident', {'incident_id': responder['incident_id']})
+        if subscribe:
+            client.emit('subscribe', {'viewport': {
+                'south': responder['lat'] - NEARBY_DEGREES, 'west': responder['lng'] - NEARBY_DEGREES,
+                'north': responder['lat'] + NEARBY_DEGREES, 'east': responder['lng'] + NEARBY_DEGREES
+            }})
+        devices.append((client, responder))
+    for client, _ in dashboards + devices:
+        client.get_received()
+    return dashboards, devices
+
+def replay_traffic(sender, seed):
+    """One round of traffic; returns the new responder positions"""
+    rng = random.Random(seed)
+    moved = {}
+    for personnel_id in range(1, RESPONDERS + 1):
+        lat, lng = near(rng, CITIES[(personnel_id - 1) % len(CITIES)], 0.1)
+        location_store.update(personnel_id, lat, lng)
+        moved[personnel_id] = (lat, lng)
+    location_store.broadcast_deltas()
+    if isinstance(location_store.broadcast, GlobalLocationBroadcast):
+        location_store.broadcast.send()
+    for _ in range(INCIDENT_UPDATES):
+        sender.emit('incident_update', {'incident_id': rng.randrange(1, INCIDENTS + 1), 'type': 'status',
+                                        'data': {'note': 'Crews on scene'}})
+    for _ in range(STATUS_UPDATES):
+        sender.emit('status_update', {'personnel_id': rng.randrange(1, RESPONDERS + 1), 'status': 'responding'})
+    for _ in range(GEOFENCE_BREACHES):
+        personnel_id = rng.randrange(1, RESPONDERS + 1)
+        lat, lng = moved[personnel_id]
+        sender.emit('geofence_breach', {'zone_id': 1, 'personnel_id': personnel_id,
+                                        'location': {'lat': lat, 'lng': lng}})
+    return moved
+
+def delivered(clients):
+    """Packets and JSON bytes received by the clients, and what each received"""
+    packets = size = 0
+    received = []
+    for client in clients:
+        messages = client.get_received()
+        packets += len(messages)
+        size += sum(len(json.dumps([m['name'], *m['args']])) for m in messages)
+        received.append(messages)
+    return packets, size, received
+
+def run(name, responders, subscribe, seed):
+    dashboards, devices = connect_clients(responders, subscribe)
+    sender = socketio.test_client(app_module.app)
+    moved = replay_traffic(sender, seed)
+    packets, size, received = delivered([client for client, _ in dashboards + devices])
+    sender.disconnect()
+    for client, _ in dashboards + devices:
+        client.disconnect()
+    print(f'{name:<18}: {packets:,} packets, {size / 1024 / 1024:.1f} MiB to '
+          f'{len(dashboards) + len(devices)} clients')
+    return size, moved, dashboards, received[:len(dashboards)]
+
+def missing_positions(moved, dashboards, received):
+    """Responders that moved inside a dashboard's viewport but never reached it"""
+    missing = 0
+    for (_, viewport), messages in zip(dashboards, received):
+        seen = {update['personnel_id'] for m in messages if m['name'] == 'personnel_locations_updated'
+                for update in m['args'][0]['updates']}
+        missing += sum(1 for personnel_id, (lat, lng) in moved.items()
+                       if viewport['south'] <= lat <= viewport['north']
+                       and viewport['west'] <= lng <= viewport['east'] and personnel_id not in seen)
+    return missing
+
+def main():
+    database.init_db()
+    responders = seed()
+    print(f'{DASHBOARDS} dashboards over {len(CITIES)} cities, {RESPONDERS} field devices; '
+          f'{RESPONDERS} moves, {INCIDENT_UPDATES} incident updates, {STATUS_UPDATES} status changes, '
+          f'{GEOFENCE_BREACHES} geofence breaches')
+
+    app_module.broadcast_event = global_broadcast
+    location_store.broadcast = GlobalLocationBroadcast()
+    before, _, _, _ = run('Global broadcasts', responders, subscribe=False, seed=6)
+    app_module.broadcast_event = location_store.broadcast = app_module.app.broadcast_event
+    after, moved, dashboards, received = run('Subscriptions', responders, subscribe=True, seed=7)
+    print(f'Subscriptions send {before / after:.0f}x fewer bytes')
+
+    missing = missing_positions(moved, dashboards, received)
+    if missing:
+        print(f'❌ {missing} moves inside a dashboard viewport were not delivered')
+        sys.exit(1)
+    print('✅ Every dashboard received every move inside its viewport')
+
+if __name__ == '__main__':
+    main()
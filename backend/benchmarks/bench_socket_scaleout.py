@@ -0,0 +1,125 @@
+"""
+Benchmark: events and sessions across several worker processes.
+
+Before cluster.py and socket_bus.py the Socket.IO client list, login
+sessions and presence lived in one process, so a second worker could not
+see events, tokens or clients of the first. Starts WORKERS backend
+processes on one database, with and without SOCKETIO_MESSAGE_QUEUE=sqlite,
+connects a Socket.IO client to each, then changes a responder's status
+EVENTS times through REST on the first worker. Reports how many status
+events reached the clients of every worker and how long they took, and
+checks that a token issued by one worker is accepted by the others.
+
+Run from the backend directory:
+    python -m benchmarks.bench_socket_scaleout
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import socketio
+
+WORKERS = 2
+BASE_PORT = 5310
+EVENTS = 200
+ROLE = 'Paramedic'
+
+WORKER_SCRIPT = '''
+import app
+app.initialize_app()
+app.socketio.run(app.app, host="127.0.0.1", port={port}, use_reloader=False, log_output=False)
+'''
+
+def start_workers(database_path, message_queue):
+    env = dict(os.environ, DATABASE_PATH=database_path, PYTHONUNBUFFERED='1')
+    env.pop('SOCKETIO_MESSAGE_QUEUE', None)
+    if message_queue:
+        env['SOCKETIO_MESSAGE_QUEUE'] = message_queue
+    workers = [subprocess.Popen([sys.executable, '-c', WORKER_SCRIPT.format(port=BASE_PORT + i)], env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+               for i in range(WORKERS)]
+    urls = [f'http://127.0.0.1:{BASE_PORT + i}' for i in range(WORKERS)]
+    deadline = time.monotonic() + 60
+    for url in urls:
+        while True:
+            try:
+                requests.get(f'{url}/health', timeout=1)
+                break
+            except requests.ConnectionError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'Worker at {url} did not start')
+                time.sleep(0.2)
+    return workers, urls
+
+def stop_workers(workers):
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.wait()
+
+def connect(url, received):
+    """Socket.IO client subscribed to ROLE, recording when each status event arrives"""
+    client = socketio.Client()
+    subscribed = threading.Event()
+    client.on('subscribed', lambda data: subscribed.set())
+    client.on('personnel_status_updated', lambda data: received.append((data['status'], time.perf_counter())))
+    client.connect(url, transports=['polling'])
+    client.emit('subscribe', {'roles': [ROLE]})
+    subscribed.wait(10)
+    return client
+
+def run(name, database_path, message_queue):
+    workers, urls = start_workers(database_path, message_queue)
+    try:
+        received = [[] for _ in urls]
+        clients = [connect(url, inbox) for url, inbox in zip(urls, received)]
+        personnel_id = requests.post(f'{urls[0]}/api/personnel', json={
+            'name': 'Bench Responder', 'role': ROLE, 'lat': 19.07, 'lng': 72.87
+        }).json()['personnel_id']
+
+        sent = {}
+        for i in range(EVENTS):
+            status = f'bench-{name}-{i}'
+            sent[status] = time.perf_counter()
+            requests.put(f'{urls[0]}/api/personnel/{personnel_id}/status', json={'status': status})
+        time.sleep(1)
+
+        print(f'{name}:')
+        for index, inbox in enumerate(received):
+            latencies = sorted((at - sent[status]) * 1000 for status, at in inbox if status in sent)
+            line = f'  worker {index + 1} clients: {len(latencies)}/{EVENTS} events'
+            if latencies:
+                line += (f', median {latencies[len(latencies) // 2]:.1f} ms, '
+                         f'p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms')
+            print(line)
+
+        token = requests.post(f'{urls[0]}/api/auth/login',
+                              json={'username': 'user1', 'password': 'password123'}).json()['token']
+        accepted = sum(requests.get(f'{url}/api/auth/me', headers={'Authorization': f'Bearer {token}'}).ok
+                       for url in urls)
+        cluster = requests.get(f'{urls[-1]}/health').json()['cluster']
+        print(f'  token from worker 1 accepted by {accepted}/{len(urls)} workers; '
+              f'{len(cluster["workers"])} workers registered with {cluster["socket_clients"]} clients')
+        for client in clients:
+            client.disconnect()
+        return [len(inbox) for inbox in received], accepted
+    finally:
+        stop_workers(workers)
+
+def main():
+    print(f'{WORKERS} workers, {EVENTS} status changes sent through worker 1 ({os.cpu_count()} CPU cores)')
+    directory = tempfile.mkdtemp()
+    run('No message queue', os.path.join(directory, 'single.db'), None)
+    counts, accepted = run('SQLite message queue', os.path.join(directory, 'bus.db'), 'sqlite')
+
+    if any(count < EVENTS for count in counts) or accepted < WORKERS:
+        print('❌ Some workers missed events or rejected the session')
+        sys.exit(1)
+    print('✅ Clients of every worker received every event; sessions are shared')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: a burst of photo uploads through the AI verification queue.
+
+Uploads BURST_SIZE images at once against the fake AI handler and checks
+that no more than AI_VERIFY_CONCURRENCY model calls ever run at the same
+time (previously every upload started its own thread), that simulated model
+failures are retried, and reports queue latency percentiles.
+
+Run from the backend directory:
+    python -m benchmarks.bench_verification_queue
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+from config import Config
+
+TEMP_DIR = tempfile.mkdtemp()
+Config.DATABASE_PATH = os.path.join(TEMP_DIR, 'bench_verification.db')
+Config.UPLOAD_FOLDER = os.path.join(TEMP_DIR, 'uploads')
+Config.AI_VERIFY_BACKOFF_SECONDS = 0.1
+
+from PIL import Image
+
+import database
+from app import app
+from utils.ai_utils import FakeAIHandler
+from verification_queue import verification_queue
+
+BURST_SIZE = 300
+FAKE_LATENCY_MS = 50
+FAIL_EVERY = 10  # Every 10th model call fails and is retried
+TIMEOUT_SECONDS = 120
+
+def sample_image():
+    """Random noise image, so no upload is served from the verification cache"""
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (64, 64), os.urandom(64 * 64 * 3)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+def main():
+    database.init_db()
+    verification_queue.handler = FakeAIHandler(latency_ms=FAKE_LATENCY_MS, fail_every=FAIL_EVERY)
+    verification_queue.rate_per_worker = 0  # Measure the pool, not the rate limit
+
+    client = app.test_client()
+    client.post('/api/incidents', json={
+        'title': 'Warehouse fire', 'type': 'fire', 'severity': 'high', 'lat': 19.07, 'lng': 72.87
+    })
+    images = [sample_image() for _ in range(BURST_SIZE)]
+
+    start = time.perf_counter()
+    for i, image in enumerate(images):
+        response = client.post('/api/incidents/1/upload', data={
+            'file': (io.BytesIO(image), f'photo_{i}.jpg')
+        }, content_type='multipart/form-data')
+        assert response.status_code == 201
+    upload_s = time.perf_counter() - start
+
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    while True:
+        stats = client.get('/api/verification/status').get_json()
+        if stats['done'] + stats['failed'] == BURST_SIZE or time.monotonic() > deadline:
+            break
+        time.sleep(0.1)
+    total_s = time.perf_counter() - start
+    verification_queue.stop()
+
+    latency = stats['latency_ms']
+    print(f"Uploads: {BURST_SIZE} in {upload_s:.2f}s, all verified after {total_s:.2f}s")
+    print(f"Workers: {stats['workers']} (concurrency {stats['concurrency']}), max in flight {stats['max_in_flight']}")
+    print(f"Jobs: {stats['done']} done, {stats['failed']} failed, {stats['queue_depth']} pending")
+    for name in ('queue_wait', 'processing', 'total'):
+        summary = latency[name]
+        print(f"{name:>11}: p50 {summary['p50']:.0f} ms, p95 {summary['p95']:.0f} ms, p99 {summary['p99']:.0f} ms")
+
+    if stats['done'] != BURST_SIZE:
+        print('❌ Not every job was verified')
+        sys.exit(1)
+    if stats['max_in_flight'] > stats['concurrency']:
+        print('❌ More model calls in flight than the configured concurrency')
+        sys.exit(1)
+    print('✅ Burst verified with bounded concurrency')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Content-addressed store for uploaded files.
+
+Uploads are streamed in HASH_CHUNK_SIZE chunks to a temp file while their
+SHA-256 is computed, then renamed into uploads/blobs/<aa>/<bb>/<sha256>.<ext>.
+A file that is already stored is not written again, so re-uploading the same
+evidence costs one hash. The blobs table keeps one row per content hash,
+registered before its file is placed, with a reference count that triggers
+on attachments maintain; blobs nobody references for BLOB_GC_GRACE_SECONDS
+are deleted by collect_garbage().
+
+Usage:
+    python blob_store.py --gc       # delete unreferenced blobs now
+    python blob_store.py --stats    # blob count, bytes stored and bytes saved
+"""
+import glob
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import uuid
+from config import Config
+from database import db_session
+from db_writer import db_writer
+from utils.file_utils import HASH_CHUNK_SIZE, sha256_file, upload_abspath
+
+# Blob directory, relative to the upload folder
+BLOB_DIR = 'blobs'
+
+# Extensions stored under one name
+EXTENSION_ALIASES = {'jpeg': 'jpg'}
+
+
+def blob_relative_path(sha256, extension):
+    """`uploads/...` path of a blob, sharded by the first two hash bytes"""
+    return f'uploads/{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}'
+
+def _temp_dir():
+    temp_dir = os.path.join(Config.UPLOAD_FOLDER, BLOB_DIR, 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+    return temp_dir
+
+def _register(sha256, relative_path, file_size):
+    """
+    Track a blob and restart the grace period of an unreferenced one
+    Returns the path it is stored under, which the first registration chose
+    """
+    def register(cursor):
+        cursor.execute('''
+            INSERT INTO blobs (sha256, filepath, file_size, released_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (sha256) DO UPDATE SET
+                released_at = CASE WHEN refcount <= 0 THEN CURRENT_TIMESTAMP ELSE released_at END
+            RETURNING filepath
+        ''', (sha256, relative_path, file_size))
+        return cursor.fetchall()[0]['filepath']
+
+    return db_writer.execute(register)
+
+def _commit(temp_path, sha256, file_size, extension):
+    """Rename a hashed temp file into place, or drop it when the blob exists"""
+    extension = extension.lower()
+    extension = EXTENSION_ALIASES.get(extension, extension)
+    # Registered first: collect_garbage() now skips the blob for the grace
+    # period, and a file it removed before that is put back below
+    relative_path = _register(sha256, blob_relative_path(sha256, extension), file_size)
+    blob_path = upload_abspath(relative_path)
+
+    deduplicated = os.path.exists(blob_path)
+    if deduplicated:
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(temp_path, blob_path)
+
+    return {
+        'sha256': sha256,
+        'file_size': file_size,
+        'filepath': relative_path,
+        'deduplicated': deduplicated
+    }
+
+def write_blob(stream, extension):
+    """
+    Stream a file object into the store
+    Returns dict with sha256, file_size, filepath (relative) and
+    deduplicated (True when identical content was already stored)
+    """
+    digest = hashlib.sha256()
+    file_size = 0
+    fd, temp_path = tempfile.mkstemp(dir=_temp_dir(), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+                file_size += len(chunk)
+        return _commit(temp_path, digest.hexdigest(), file_size, extension)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def import_blob(path, extension, sha256=None):
+    """
+    Move a complete file on the same filesystem into the store
+    It is hashed in chunks from disk unless `sha256` is already known;
+    returns the same dict as write_blob
+    """
+    return _commit(path, sha256 or sha256_file(path), os.path.getsize(path), extension)
+
+def get_blob(cursor, sha256):
+    """Blob row for a content hash, or None"""
+    cursor.execute('SELECT * FROM blobs WHERE sha256 = ?', (sha256,))
+    row = cursor.fetchone()
+    return dict(row) if row else None
+
+def collect_garbage(grace_seconds=None):
+    """
+    Delete blobs (and their generated derivatives) that no attachment has
+    referenced for grace_seconds, plus abandoned temp files
+    Safe to run while other workers store uploads
+    Returns dict with blobs and bytes removed
+    """
+    grace_seconds = Config.BLOB_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = time.time() - grace_seconds
+    trashed = []  # (path, trash path)
+
+    def delete_unreferenced(cursor):
+        # Rows are deleted and files moved aside in the same write unit, so a
+        # blob registered again (see _commit) either keeps both or gets its
+        # file written anew
+        cursor.execute('''
+            DELETE FROM blobs
+            WHERE refcount <= 0 AND released_at <= datetime('now', ?)
+            RETURNING sha256, filepath
+        ''', (f'-{grace_seconds} seconds',))
+        deleted = [dict(row) for row in cursor.fetchall()]
+        for blob in deleted:
+            # The blob plus thumbnails / model inputs stored next to it (<sha256>.*)
+            root, _ = os.path.splitext(upload_abspath(blob['filepath']))
+            for path in glob.glob(glob.escape(root) + '.*'):
+                trash_path = os.path.join(_temp_dir(), f'{os.path.basename(path)}.{uuid.uuid4().hex}.trash')
+                os.replace(path, trash_path)
+                trashed.append((path, trash_path))
+        return deleted
+
+    try:
+        deleted = db_writer.execute(delete_unreferenced)
+    except Exception:
+        # Rows were rolled back: so are the files
+        for path, trash_path in trashed:
+            os.replace(trash_path, path)
+        raise
+
+    freed = 0
+    for path, trash_path in trashed:
+        freed += os.path.getsize(trash_path)
+        os.remove(trash_path)
+    for blob in deleted:
+        # Prune shard directories left empty
+        shard = os.path.dirname(upload_abspath(blob['filepath']))
+        for directory in (shard, os.path.dirname(shard)):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+
+    for pattern in ('*.part', '*.trash'):
+        for path in glob.glob(os.path.join(_temp_dir(), pattern)):
+            if os.path.getmtime(path) <= cutoff:
+                freed += os.path.getsize(path)
+                os.remove(path)
+
+    if deleted:
+        print(f"🧹 Removed {len(deleted)} unreferenced blob(s), {freed / 1024 / 1024:.1f} MB freed")
+    return {'blobs_removed': len(deleted), 'bytes_freed': freed}
+
+def blob_stats():
+    """Blobs stored, bytes on disk and bytes saved by deduplication"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*) AS blobs,
+                   COALESCE(SUM(file_size), 0) AS stored_bytes,
+                   COALESCE(SUM(file_size * MAX(refcount - 1, 0)), 0) AS saved_bytes,
+                   COALESCE(SUM(refcount <= 0), 0) AS unreferenced
+            FROM blobs
+        ''')
+        return dict(cursor.fetchone())
+
+
+if __name__ == '__main__':
+    if '--gc' in sys.argv:
+        result = collect_garbage()
+        print(f"✅ {result['blobs_removed']} blob(s) removed")
+    else:
+        stats = blob_stats()
+        print(f"📦 {stats['blobs']} blob(s), {stats['stored_bytes'] / 1024 / 1024:.1f} MB stored, "
+              f"{stats['saved_bytes'] / 1024 / 1024:.1f} MB saved by deduplication, "
+              f"{stats['unreferenced']} unreferenced")
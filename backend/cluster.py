@@ -0,0 +1,130 @@
+"""
+Worker processes sharing one database.
+
+Several copies of the backend can serve the same database (see socket_bus.py
+for how their Socket.IO clients reach each other). Each process registers in
+worker_processes under WORKER_ID and refreshes its heartbeat every
+WORKER_HEARTBEAT_SECONDS. Workers that miss WORKER_TIMEOUT_SECONDS of
+heartbeats are reaped by the others; a trigger then drops their Socket.IO
+clients from socket_clients and re-queues the verification jobs they were
+running. A worker that stops cleanly removes itself the same way.
+
+Usage:
+    python cluster.py    # live workers and their connected clients
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from config import Config
+from database import db_session
+from db_writer import db_writer
+
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class WorkerRegistry:
+    """Heartbeat of this process and presence of its Socket.IO clients"""
+
+    def __init__(self, heartbeat_seconds=None, timeout_seconds=None):
+        self.heartbeat_seconds = heartbeat_seconds or Config.WORKER_HEARTBEAT_SECONDS
+        self.timeout_seconds = timeout_seconds or Config.WORKER_TIMEOUT_SECONDS
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Register this worker and keep its heartbeat going"""
+        self._beat(register=True)
+        if not (self._thread and self._thread.is_alive()):
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='worker-heartbeat', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Leave the cluster: clients are dropped and running jobs re-queued"""
+        self._stopping.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+        self._thread = None
+        db_writer.execute('DELETE FROM worker_processes WHERE worker_id = ?', (WORKER_ID,))
+
+    def client_connected(self, sid):
+        db_writer.submit('''
+            INSERT OR REPLACE INTO socket_clients (sid, worker_id, connected_at) VALUES (?, ?, ?)
+        ''', (sid, WORKER_ID, time.time()))
+
+    def client_disconnected(self, sid):
+        db_writer.submit('DELETE FROM socket_clients WHERE sid = ?', (sid,))
+
+    def stats(self):
+        """Live workers with their connected client counts"""
+        with db_session() as conn:
+            rows = conn.execute('''
+                SELECT w.worker_id, w.hostname, w.pid, w.started_at, w.heartbeat_at,
+                       (SELECT COUNT(*) FROM socket_clients c WHERE c.worker_id = w.worker_id) AS clients
+                FROM worker_processes w
+                ORDER BY w.started_at
+            ''').fetchall()
+        workers = [dict(row) for row in rows]
+        return {
+            'worker_id': WORKER_ID,
+            'workers': workers,
+            'socket_clients': sum(worker['clients'] for worker in workers)
+        }
+
+    def _beat(self, register=False):
+        now = time.time()
+
+        def beat(cursor):
+            if register:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO worker_processes (worker_id, hostname, pid, started_at, heartbeat_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (WORKER_ID, socket.gethostname(), os.getpid(), now, now))
+            else:
+                cursor.execute('UPDATE worker_processes SET heartbeat_at = ? WHERE worker_id = ?', (now, WORKER_ID))
+            # Reaping fires the worker_processes_reap trigger
+            cursor.execute('DELETE FROM worker_processes WHERE heartbeat_at < ?', (now - self.timeout_seconds,))
+            return cursor.rowcount
+
+        reaped = db_writer.execute(beat)
+        if reaped:
+            print(f"🪦 Reaped {reaped} worker(s) that stopped sending heartbeats")
+
+    def _run(self):
+        while not self._stopping.wait(self.heartbeat_seconds):
+            try:
+                self._beat()
+            except Exception as e:
+                print(f"⚠️ Worker heartbeat failed: {e}")
+
+
+@contextmanager
+def startup_lock():
+    """
+    Serialize start-up work (creating and migrating the database) between
+    workers launched together. Held as an exclusive lock on a side file, so
+    it works wherever SQLite does.
+    """
+    lock = sqlite3.connect(Config.DATABASE_PATH + '.startup-lock', timeout=600, isolation_level=None)
+    try:
+        lock.execute('BEGIN EXCLUSIVE')
+        yield
+    finally:
+        lock.close()
+
+
+# Singleton instance
+worker_registry = WorkerRegistry()
+
+
+if __name__ == '__main__':
+    stats = worker_registry.stats()
+    now = time.time()
+    for worker in stats['workers']:
+        print(f"🟢 {worker['worker_id']}: {worker['clients']} client(s), "
+              f"heartbeat {now - worker['heartbeat_at']:.0f} s ago, up {now - worker['started_at']:.0f} s")
+    print(f"👥 {len(stats['workers'])} worker(s), {stats['socket_clients']} connected client(s)")
@@ -8,25 +8,91 @@ class Config:
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     
     # Database
-    DATABASE_PATH = os.path.join(BASE_DIR, 'crisis_management.db')
+    DATABASE_PATH = os.environ.get('DATABASE_PATH') or os.path.join(BASE_DIR, 'crisis_management.db')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 16))  # Idle connections kept open
+    DB_POOL_MAX_CONNECTIONS = int(os.environ.get('DB_POOL_MAX_CONNECTIONS', 64))  # Open at once; more callers wait
+    DB_BUSY_TIMEOUT_MS = 30000
+    DB_CACHE_SIZE_KB = 20000  # Page cache per connection
+    DB_MMAP_SIZE = 256 * 1024 * 1024
+    DB_WRITER_BATCH_SIZE = 100  # Max write units per group commit
+    DB_WRITER_BATCH_MS = 5  # Max time to wait for a batch to fill
     
     # File uploads
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max request (single upload or one resumable chunk)
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'pdf'}
+    RESUMABLE_UPLOAD_MAX_BYTES = 512 * 1024 * 1024  # Whole file; each chunk is still capped by MAX_CONTENT_LENGTH
+    RESUMABLE_CHUNK_BYTES = 1024 * 1024  # Chunk size suggested to clients
+    RESUMABLE_UPLOAD_TTL_SECONDS = 24 * 3600  # Idle sessions and their partial files are purged after this
+    RESUMABLE_COMPLETE_TIMEOUT_SECONDS = 600  # A completion whose worker died can be retried after this
+    BLOB_GC_GRACE_SECONDS = 3600  # Unreferenced blobs are kept this long before deletion
+    UPLOAD_IMMUTABLE_MAX_AGE_SECONDS = 365 * 24 * 3600  # Content-addressed files never change
+    # Let a reverse proxy send upload bodies: None, 'x-sendfile' (Apache, lighttpd) or 'x-accel-redirect' (nginx)
+    UPLOAD_OFFLOAD = os.environ.get('UPLOAD_OFFLOAD')
+    UPLOAD_ACCEL_REDIRECT_PREFIX = os.environ.get('UPLOAD_ACCEL_REDIRECT_PREFIX', '/protected-uploads/')  # nginx internal location
     
     # WebSocket
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     
+    # Production server (see serve.py)
+    PORT = int(os.environ.get('PORT', 5000))
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 1))  # Processes, listening on PORT, PORT+1, ...
+    SERVER_WORKER_CONNECTIONS = int(os.environ.get('SERVER_WORKER_CONNECTIONS', 1000))  # Concurrent connections per worker
+    SERVER_BACKLOG = int(os.environ.get('SERVER_BACKLOG', 2048))  # Connections the kernel queues before accept
+    SERVER_KEEPALIVE_SECONDS = int(os.environ.get('SERVER_KEEPALIVE_SECONDS', 75))  # Idle keep-alive connections are closed after this
+    SERVER_DRAIN_SECONDS = int(os.environ.get('SERVER_DRAIN_SECONDS', 30))  # In-flight requests get this long after SIGTERM
+    
+    # Several worker processes (see cluster.py and socket_bus.py)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')  # None (one process), 'sqlite' or a broker URL
+    SOCKETIO_BUS_POLL_MS = 10  # How often each worker checks the sqlite queue for new messages
+    SOCKETIO_BUS_RETENTION_SECONDS = 60  # Relayed messages are deleted after this
+    WORKER_HEARTBEAT_SECONDS = 10
+    WORKER_TIMEOUT_SECONDS = 30  # Workers silent this long are reaped and their jobs re-queued
+    
     # CORS - Allow all origins for development
     CORS_ORIGINS = '*'
     
     # Geofencing
     DANGER_ZONE_RADIUS_METERS = 500  # Default radius for danger zones
     NEARBY_ALERT_RADIUS_METERS = 5000  # 5km radius for nearby alerts
+    DUPLICATE_INCIDENT_RADIUS_METERS = 500  # Reports this close are merged
+    SOSMESH_BATCH_MAX_MESSAGES = 1000  # Per POST /api/sosmesh/batch request
+    
+    # Personnel location pings (see location_store.py)
+    LOCATION_BROADCAST_SECONDS = 1  # Coalesced position changes are emitted at this tick
+    LOCATION_FLUSH_SECONDS = 2  # Latest positions are written to the database this often
+    
+    # Socket subscriptions (see utils/subscription_utils.py)
+    SUBSCRIPTION_TILE_LEVELS = (0.1, 1, 10)  # Tile grids in cells per degree: 10°, 1° and 0.1° tiles
+    SUBSCRIPTION_MAX_TILES = 64  # Larger viewports use coarser tiles, then the whole-map room
+    
+    # AI verification queue
+    AI_VERIFY_CONCURRENCY = int(os.environ.get('AI_VERIFY_CONCURRENCY', 4))  # Worker threads
+    AI_VERIFY_RATE_PER_WORKER = float(os.environ.get('AI_VERIFY_RATE_PER_WORKER', 1.0))  # Model calls per second
+    AI_VERIFY_MAX_ATTEMPTS = 5
+    AI_VERIFY_BACKOFF_SECONDS = 2  # Doubled after every failed attempt
+    AI_VERIFY_BACKOFF_MAX_SECONDS = 300
+    VERIFY_CACHE_TTL_SECONDS = 24 * 3600  # Reuse a verification for the same image this long
+    VERIFY_CACHE_MAX_HAMMING = 6  # dHash bits that may differ for a near-duplicate image
+    AI_IMAGE_MAX_SIDE = 1024  # Longest side of the image sent to the model
+    AI_IMAGE_FORMAT = 'JPEG'  # Model input derivative format (JPEG or WEBP)
+    AI_IMAGE_QUALITY = 85
+    
+    # Evidence gallery thumbnails (longest side in pixels per size name)
+    THUMBNAIL_SIZES = {'small': 160, 'medium': 320, 'large': 960}
+    THUMBNAIL_QUALITY = 80
+    THUMBNAIL_WORKERS = 2  # Background generation threads
+    VIDEO_POSTER_OFFSET_SECONDS = 1  # Where ffmpeg grabs the video poster frame
     
     # Analytics
     RESPONSE_TIME_THRESHOLD_MINUTES = 15  # Target response time
+    ANALYTICS_CACHE_TTL_SECONDS = 15  # Dashboard results are shared this long without a write
+    ANALYTICS_CACHE_STALE_SECONDS = 120  # Then served stale for up to this long while one refresh runs
+    ANALYTICS_CACHE_SYNC_SECONDS = 1  # Writes from other workers and tools invalidate it within this long
+    TIMESERIES_MAX_POINTS = 150  # Longer trend ranges are downsampled to wider buckets
+    
+    # Delta sync (see routes/sync.py)
+    SYNC_MAX_CHANGES = 1000  # Changed or deleted rows per GET /api/sync response
     
     # Notifications
     CRITICAL_SEVERITY_LEVELS = ['critical', 'high']
@@ -1,16 +1,239 @@
+import math
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from config import Config
 
-def get_db_connection():
-    """Create and return a database connection with WAL mode enabled"""
-    conn = sqlite3.connect(Config.DATABASE_PATH, timeout=30)
+try:
+    # Under gevent every greenlet gets its own connection, not just every thread
+    from greenlet import getcurrent as _current_owner
+except ImportError:
+    _current_owner = threading.get_ident
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    SQLite connection that returns itself to its pool when closed
+    Nested holders work inside a savepoint: their commit() and rollback()
+    only settle their own changes, never the outer caller's transaction.
+    """
+
+    pool = None
+    savepoints = ()  # Per nested holder: its savepoint, or None when it began outside a transaction
+
+    def begin_nested(self):
+        name = None
+        if self.in_transaction:
+            name = f'nested_{len(self.savepoints) + 1}'
+            self.execute(f'SAVEPOINT {name}')
+        self.savepoints.append(name)
+
+    def end_nested(self):
+        name = self.savepoints.pop()
+        # Changes left uncommitted stay part of the outer transaction
+        if name and self.in_transaction:
+            self.execute(f'RELEASE {name}')
+
+    def commit(self):
+        name = self.savepoints[-1] if self.savepoints else None
+        if not (name and self.in_transaction):
+            return super().commit()
+        self.execute(f'RELEASE {name}')
+        self.execute(f'SAVEPOINT {name}')
+
+    def rollback(self):
+        name = self.savepoints[-1] if self.savepoints else None
+        if not (name and self.in_transaction):
+            return super().rollback()
+        self.execute(f'ROLLBACK TO {name}')
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def close_physical(self):
+        """Really close the underlying SQLite connection"""
+        self.pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Bounded pool of pre-configured SQLite connections.
+
+    PRAGMAs are applied once when a connection is opened. Nested
+    get_db_connection() calls from the same thread/greenlet share one
+    connection, each inside its own savepoint; it goes back to the pool when
+    the outermost caller closes it. At most `max_connections` are handed out
+    at once (further callers wait up to the busy timeout), and at most
+    `max_size` idle ones are kept, extra ones are closed.
+    """
+
+    def __init__(self, database_path, max_size, max_connections=None):
+        self.database_path = database_path
+        self.max_size = max_size
+        self.max_connections = max_connections or max_size
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._idle = []
+        self._in_use = {}  # owner -> [connection, depth]
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database_path,
+            timeout=Config.DB_BUSY_TIMEOUT_MS / 1000,
+            factory=PooledConnection,
+            check_same_thread=False
+        )
+        configure_connection(conn)
+        conn.pool = self
+        conn.savepoints = []
+        return conn
+
+    def acquire(self):
+        owner = _current_owner()
+        with self._lock:
+            entry = self._in_use.get(owner)
+            if entry:
+                entry[1] += 1
+        if entry:
+            entry[0].begin_nested()
+            return entry[0]
+
+        if not self._slots.acquire(timeout=Config.DB_BUSY_TIMEOUT_MS / 1000):
+            raise sqlite3.OperationalError(f'all {self.max_connections} pooled database connections are in use')
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use[owner] = [conn, 1]
+        return conn
+
+    def release(self, conn):
+        owner = _current_owner()
+        with self._lock:
+            entry = self._in_use.get(owner)
+            if entry and entry[0] is conn:
+                entry[1] -= 1
+                nested = entry[1] > 0
+                if not nested:
+                    del self._in_use[owner]
+            elif any(idle is conn for idle in self._idle):
+                return  # Already released (close() called twice)
+            else:
+                # Closed from a different thread than the one that opened it
+                owners = [key for key, (pooled, _) in self._in_use.items() if pooled is conn]
+                if not owners:
+                    return  # Already released
+                for key in owners:
+                    del self._in_use[key]
+                nested = False
+        if nested:
+            conn.end_nested()
+            return
+
+        # Never hand out a connection with a half-finished transaction
+        del conn.savepoints[:]
+        if conn.in_transaction:
+            conn.rollback()
+
+        try:
+            with self._lock:
+                if len(self._idle) < self.max_size:
+                    self._idle.append(conn)
+                    return
+            conn.close_physical()
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close_physical()
+
+    def stats(self):
+        with self._lock:
+            return {'idle': len(self._idle), 'in_use': len(self._in_use), 'max_size': self.max_size,
+                    'max_connections': self.max_connections}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _ln(value):
+    # SQLite's ln() is NULL outside its domain
+    return math.log(value) if value is not None and value > 0 else None
+
+MATH_FUNCTIONS = {
+    'ln': _ln,
+    'ceil': lambda value: None if value is None else math.ceil(value),
+    'cos': lambda value: None if value is None else math.cos(value),
+    'radians': lambda value: None if value is None else math.radians(value)
+}
+
+def configure_connection(conn):
+    """Apply connection-level PRAGMAs"""
     # Enable Write-Ahead Logging (WAL) for better concurrency
     conn.execute('PRAGMA journal_mode=WAL')
     # Extra safety for busy timeouts
-    conn.execute('PRAGMA busy_timeout=30000')
+    conn.execute(f'PRAGMA busy_timeout={Config.DB_BUSY_TIMEOUT_MS}')
+    # WAL makes NORMAL durable against application crashes
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA mmap_size={Config.DB_MMAP_SIZE}')
+    conn.execute(f'PRAGMA cache_size=-{Config.DB_CACHE_SIZE_KB}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    # The geofence and rollup triggers use SQLite's math functions (built in
+    # by default since 3.35); fill them in on builds compiled without them
+    try:
+        conn.execute('SELECT ln(1)')
+    except sqlite3.OperationalError:
+        for name, function in MATH_FUNCTIONS.items():
+            conn.create_function(name, 1, function, deterministic=True)
     conn.row_factory = sqlite3.Row
-    return conn
+
+def get_pool():
+    """Return the connection pool for the configured database"""
+    path = Config.DATABASE_PATH
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(path, ConnectionPool(path, Config.DB_POOL_SIZE, Config.DB_POOL_MAX_CONNECTIONS))
+    return pool
+
+def get_db_connection():
+    """Get a pooled database connection; close() returns it to the pool"""
+    return get_pool().acquire()
+
+@contextmanager
+def db_session():
+    """Pooled connection that commits on success and rolls back on error"""
+    conn = get_db_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def close_db_pool():
+    """Close all idle pooled connections (e.g. on shutdown)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
 
 def init_db():
     """Initialize the database with all required tables"""
@@ -51,7 +274,6 @@ def init_db():
             reporter_phone TEXT,
             victims_count INTEGER DEFAULT 0,
             report_count INTEGER DEFAULT 1,
-            sosmesh_messages TEXT,
             is_verified INTEGER DEFAULT 0,
             verification_score INTEGER DEFAULT 0,
             ai_analysis TEXT,
@@ -192,6 +414,11 @@ def init_db():
     
     conn.commit()
     conn.close()
+    
+    # Bring the fresh schema up to the latest version (indexes etc.)
+    from migrations import run_migrations
+    run_migrations(backup=False)
+    
     print("✅ Database initialized successfully!")
 
 def seed_sample_data():
@@ -0,0 +1,171 @@
+"""
+Single-writer commit queue.
+
+One background thread owns a dedicated write connection. Callers submit
+write units and get a Future back; the worker drains the queue and
+group-commits up to DB_WRITER_BATCH_SIZE units (or whatever arrived within
+DB_WRITER_BATCH_MS) in a single transaction. Each unit runs inside its own
+savepoint, so a failing unit only fails its own Future.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from config import Config
+from database import configure_connection
+
+_STOP = object()
+
+
+class DatabaseWriter:
+    """Serializes writes through one connection and batches commits"""
+
+    def __init__(self, batch_size=None, batch_ms=None):
+        self.batch_size = batch_size or Config.DB_WRITER_BATCH_SIZE
+        self.batch_ms = batch_ms if batch_ms is not None else Config.DB_WRITER_BATCH_MS
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._conn = None
+        self._conn_path = None
+        self._stats = {
+            'batches': 0,
+            'units': 0,
+            'failed_units': 0,
+            'failed_batches': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_commit_ms': 0.0
+        }
+
+    def submit(self, unit, params=()):
+        """
+        Queue a write unit and return a Future with its result.
+        `unit` is either an SQL string (executed with `params`, result is
+        lastrowid) or a callable taking a cursor (result is its return value).
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((unit, params, future))
+        return future
+
+    def execute(self, unit, params=(), timeout=None):
+        """Submit a write unit and wait for it to be committed"""
+        return self.submit(unit, params).result(timeout)
+
+    def metrics(self):
+        stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['avg_batch_size'] = round(stats['units'] / stats['batches'], 2) if stats['batches'] else 0
+        stats['running'] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+    def stop(self, timeout=None):
+        """Flush queued units and stop the worker"""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def _connection(self):
+        # Reopen if the configured database changed (e.g. benchmarks)
+        if self._conn is None or self._conn_path != Config.DATABASE_PATH:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = sqlite3.connect(
+                Config.DATABASE_PATH,
+                timeout=Config.DB_BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None  # Transactions are managed explicitly
+            )
+            configure_connection(self._conn)
+            self._conn_path = Config.DATABASE_PATH
+        return self._conn
+
+    def _next_batch(self):
+        """Block for the first unit, then gather more until size or time limit"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_ms / 1000
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stopping = batch[-1] is _STOP
+            units = [item for item in batch if item is not _STOP]
+            if units:
+                self._commit_batch(units)
+            if stopping:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+                return
+
+    def _commit_batch(self, units):
+        start = time.perf_counter()
+        results = []
+        try:
+            conn = self._connection()
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            for unit, params, future in units:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cursor.execute('SAVEPOINT write_unit')
+                try:
+                    if callable(unit):
+                        result = unit(cursor)
+                    else:
+                        cursor.execute(unit, params)
+                        result = cursor.lastrowid
+                    cursor.execute('RELEASE write_unit')
+                    results.append((future, result, None))
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO write_unit')
+                    cursor.execute('RELEASE write_unit')
+                    results.append((future, None, e))
+            cursor.execute('COMMIT')
+        except Exception as e:
+            print(f"⚠️ DB writer batch failed: {e}")
+            if self._conn is not None and self._conn.in_transaction:
+                self._conn.rollback()
+            self._stats['failed_batches'] += 1
+            for _, _, future in units:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                self._stats['failed_units'] += 1
+                future.set_exception(error)
+
+        size = len(units)
+        self._stats['batches'] += 1
+        self._stats['units'] += size
+        self._stats['last_batch_size'] = size
+        self._stats['max_batch_size'] = max(self._stats['max_batch_size'], size)
+        self._stats['last_commit_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+
+# Singleton instance
+db_writer = DatabaseWriter()
@@ -1,5 +1,6 @@
 import sqlite3
 from config import Config
+from database import configure_connection
 import shutil
 from datetime import datetime
 
@@ -12,6 +13,7 @@ def force_clean_database():
     print(f"✅ Database backed up to: {backup_path}")
     
     conn = sqlite3.connect(Config.DATABASE_PATH)
+    configure_connection(conn)  # SQL functions the triggers call
     cursor = conn.cursor()
     
     print("\n🔍 Current database contents:")
@@ -0,0 +1,218 @@
+"""
+Coalescing store for personnel location pings.
+
+Responders ping their position every couple of seconds. Instead of a commit
+and two broadcasts per ping, update() only records the latest position of
+each person in memory. One background thread then, every
+LOCATION_BROADCAST_SECONDS, emits personnel_locations_updated events with
+everyone who moved since the previous tick to the clients subscribed to
+where they are, their role or their incident, and every
+LOCATION_FLUSH_SECONDS writes the positions that changed to SQLite with one
+executemany through the single writer. Pending positions are written when
+the store stops. Reads in this process see them before they are written
+through overlay().
+"""
+import json
+import threading
+import time
+from config import Config
+from database import db_session
+from db_writer import db_writer
+from utils.subscription_utils import personnel_rooms, tile_rooms
+from utils.time_utils import utc_timestamp
+
+# Carries every changed position a subscriber is interested in, once per tick
+BROADCAST_EVENT = 'personnel_locations_updated'
+
+
+def parse_position(lat, lng):
+    """Validate a ping's coordinates, raising ValueError for unusable ones"""
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        raise ValueError('lat and lng must be numbers')
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('lat must be within ±90 and lng within ±180')
+    return lat, lng
+
+
+class LocationStore:
+    """Latest position per person, flushed and broadcast on fixed ticks"""
+
+    def __init__(self, flush_seconds=None, broadcast_seconds=None):
+        self.flush_seconds = flush_seconds or Config.LOCATION_FLUSH_SECONDS
+        self.broadcast_seconds = broadcast_seconds or Config.LOCATION_BROADCAST_SECONDS
+        # broadcast(event_name, data, room=None); nothing is emitted until it is set
+        self.broadcast = None
+        self._lock = threading.Lock()
+        self._unflushed = {}  # personnel_id -> (lat, lng, updated_at)
+        self._flushing = {}  # positions being written by flush()
+        self._flush_lock = threading.Lock()
+        self._unsent = {}  # personnel_id -> (lat, lng)
+        self._sent = {}  # personnel_id -> last broadcast (lat, lng)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats = {
+            'pings': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'broadcasts': 0,
+            'positions_sent': 0,
+            'last_flush_ms': 0.0
+        }
+
+    def update(self, personnel_id, lat, lng):
+        """Record a ping; returns the parsed position as {'lat', 'lng'}"""
+        lat, lng = parse_position(lat, lng)
+        try:
+            personnel_id = int(personnel_id)
+        except (TypeError, ValueError):
+            raise ValueError('personnel_id must be an integer')
+        updated_at = utc_timestamp()
+        with self._lock:
+            self._unflushed[personnel_id] = (lat, lng, updated_at)
+            self._unsent[personnel_id] = (lat, lng)
+            self._stats['pings'] += 1
+        self._ensure_started()
+        return {'lat': lat, 'lng': lng}
+
+    def flush(self):
+        """Write every position received since the last flush"""
+        # One at a time, so _flushing always holds what is being written
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._unflushed = self._unflushed, {}
+            self._flushing = pending
+        if not pending:
+            return 0
+        rows = [(lat, lng, updated_at, personnel_id)
+                for personnel_id, (lat, lng, updated_at) in pending.items()]
+
+        def save_positions(cursor):
+            cursor.executemany('''
+                UPDATE personnel
+                SET lat = ?, lng = ?, updated_at = ?
+                WHERE id = ?
+            ''', rows)
+
+        start = time.perf_counter()
+        try:
+            db_writer.execute(save_positions)
+        except Exception:
+            # Keep the positions for the next flush unless newer ones arrived
+            with self._lock:
+                for personnel_id, position in pending.items():
+                    self._unflushed.setdefault(personnel_id, position)
+            raise
+        finally:
+            with self._lock:
+                self._flushing = {}
+        self._stats['flushes'] += 1
+        self._stats['rows_written'] += len(rows)
+        self._stats['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        return len(rows)
+
+    def overlay(self, people):
+        """
+        Apply positions not yet written to personnel rows (dicts read from
+        the database), so a read right after a ping returns it
+        """
+        with self._lock:
+            if self._unflushed or self._flushing:
+                for person in people:
+                    position = self._unflushed.get(person['id']) or self._flushing.get(person['id'])
+                    if position:
+                        person['lat'], person['lng'], person['updated_at'] = position
+        return people
+
+    def pending_ids(self):
+        """Ids of people whose latest position is not written yet"""
+        with self._lock:
+            return list(self._unflushed.keys() | self._flushing.keys())
+
+    def broadcast_deltas(self):
+        """Emit the positions that changed since the last tick"""
+        with self._lock:
+            pending, self._unsent = self._unsent, {}
+        moved = {personnel_id: position for personnel_id, position in pending.items()
+                 if self._sent.get(personnel_id) != position}
+        if not moved or self.broadcast is None:
+            return 0
+
+        with db_session() as conn:
+            people = conn.execute('''
+                SELECT id, name, role, status, assigned_incident_id
+                FROM personnel
+                WHERE id IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(list(moved)),)).fetchall()
+
+        # People interesting to the same rooms go out together
+        by_rooms = {}
+        for person in people:
+            lat, lng = moved[person['id']]
+            update = {
+                'personnel_id': person['id'],
+                'name': person['name'],
+                'location': {'lat': lat, 'lng': lng},
+                'status': person['status']
+            }
+            rooms = personnel_rooms(person, lat, lng)
+            previous = self._sent.get(person['id'])
+            if previous:
+                # Maps they just moved out of see them leave
+                rooms += [room for room in tile_rooms(*previous) if room not in rooms]
+            by_rooms.setdefault(tuple(rooms), []).append(update)
+            self._sent[person['id']] = (lat, lng)
+
+        for rooms, updates in by_rooms.items():
+            self.broadcast(BROADCAST_EVENT, {'updates': updates}, room=list(rooms))
+        self._stats['broadcasts'] += len(by_rooms)
+        self._stats['positions_sent'] += len(people)
+        return len(people)
+
+    def metrics(self):
+        stats = dict(self._stats)
+        with self._lock:
+            stats['unflushed'] = len(self._unflushed)
+            stats['unsent'] = len(self._unsent)
+        stats['running'] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+    def stop(self, timeout=None):
+        """Stop the ticker and write whatever is still pending"""
+        if self._thread and self._thread.is_alive():
+            self._stopping.set()
+            self._thread.join(timeout)
+        self._thread = None
+        self._stopping.clear()
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='location-store', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_seconds
+        while not self._stopping.wait(self.broadcast_seconds):
+            try:
+                self.broadcast_deltas()
+            except Exception as e:
+                print(f"⚠️ Location broadcast failed: {e}")
+            if time.monotonic() >= next_flush:
+                next_flush = time.monotonic() + self.flush_seconds
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"⚠️ Location flush failed: {e}")
+
+
+# Singleton instance
+location_store = LocationStore()
@@ -0,0 +1,879 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once, in order, inside its own transaction and is
+recorded in the schema_version table. Pending migrations are applied on
+startup; they can also be run by hand:
+
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # show applied/pending versions
+"""
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from config import Config
+from database import get_db_connection
+from utils.geo_utils import GRID_CELLS_PER_DEGREE, lng_degrees_sql
+
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register a migration function taking a cursor"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+def _columns(cursor, table):
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row['name']: row for row in cursor.fetchall()}
+
+def _add_column(cursor, table, column, definition):
+    """ALTER TABLE ADD COLUMN unless the column already exists"""
+    if column not in _columns(cursor, table):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def _geofence_zone_box_sql():
+    """R*Tree row of the zone NEW: the bounding box of its circle"""
+    lng_span = lng_degrees_sql('NEW.lat', 'NEW.radius')
+    return f'''
+        NEW.id,
+        NEW.lat - NEW.radius / 111000.0, NEW.lat + NEW.radius / 111000.0,
+        NEW.lng - {lng_span}, NEW.lng + {lng_span}
+    '''
+
+# ==================== Migrations ====================
+
+@migration(1, 'Create users table for authentication')
+def create_users_table(cursor):
+    # Replaces migrate_add_users.py for databases created before authentication
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            name TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('user', 'responder')),
+            email TEXT,
+            phone TEXT,
+            avatar TEXT,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+    ''')
+
+@migration(2, 'Allow broadcast communications and link senders to users')
+def rebuild_communications(cursor):
+    # Replaces migrate_communications.py and the table rebuild in migrate_add_users.py
+    incident_column = _columns(cursor, 'communications')['incident_id']
+    cursor.execute('PRAGMA foreign_key_list(communications)')
+    has_sender_fk = any(row['from'] == 'sender_id' for row in cursor.fetchall())
+
+    if not incident_column['notnull'] and has_sender_fk:
+        return
+
+    cursor.execute('''
+        CREATE TABLE communications_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            incident_id INTEGER,
+            sender_id INTEGER,
+            sender_name TEXT,
+            message TEXT NOT NULL,
+            type TEXT DEFAULT 'text',
+            read_status BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (incident_id) REFERENCES incidents(id),
+            FOREIGN KEY (sender_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO communications_new
+            (id, incident_id, sender_id, sender_name, message, type, read_status, created_at)
+        SELECT id, incident_id, sender_id, sender_name, message, type, read_status, created_at
+        FROM communications
+    ''')
+    cursor.execute('DROP TABLE communications')
+    cursor.execute('ALTER TABLE communications_new RENAME TO communications')
+
+@migration(3, 'Index pack for hot query predicates')
+def add_hot_path_indexes(cursor):
+    indexes = [
+        # Listing, dedup and analytics windows
+        'idx_incidents_type_status_created ON incidents(type, status, created_at)',
+        'idx_incidents_status_created ON incidents(status, created_at)',
+        'idx_incidents_created ON incidents(created_at)',
+        # Covering indexes for incident hydration (name/role/status, name/type/status)
+        'idx_personnel_assigned ON personnel(assigned_incident_id, name, role, status)',
+        'idx_resources_assigned ON resources(assigned_incident_id, name, type, status)',
+        'idx_personnel_user ON personnel(user_id)',
+        'idx_personnel_status ON personnel(status, role, name)',
+        'idx_resources_status ON resources(status)',
+        'idx_resources_public ON resources(is_public, status)',
+        'idx_timeline_incident_created ON incident_timeline(incident_id, created_at)',
+        'idx_attachments_incident_created ON attachments(incident_id, created_at)',
+        'idx_attachments_created ON attachments(created_at)',
+        'idx_communications_incident_created ON communications(incident_id, created_at)',
+        'idx_communications_unread ON communications(read_status, created_at)',
+        'idx_notifications_user_created ON notifications(user_id, created_at)',
+        'idx_alerts_expires ON alerts(expires_at)',
+        'idx_geofence_active ON geofence_zones(active)',
+    ]
+    for index in indexes:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {index}')
+
+def _sql_floor(expression):
+    """floor() using only core SQL (math functions are optional in SQLite builds)"""
+    return f'(CAST({expression} AS INTEGER) - ({expression} < CAST({expression} AS INTEGER)))'
+
+@migration(4, 'Spatial grid cell on incidents for duplicate detection')
+def add_incident_grid_cell(cursor):
+    # Generated from lat/lng so every insert path keeps it in sync (see geo_utils.grid_cell)
+    row = _sql_floor(f'lat * {GRID_CELLS_PER_DEGREE}')
+    col = _sql_floor(f'lng * {GRID_CELLS_PER_DEGREE}')
+    _add_column(cursor, 'incidents', 'grid_cell',
+                f"TEXT GENERATED ALWAYS AS ({row} || ':' || {col}) VIRTUAL")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_incidents_type_status_cell
+        ON incidents(type, status, grid_cell, created_at)
+    ''')
+
+@migration(5, 'R*Tree spatial indexes for proximity queries')
+def add_rtree_indexes(cursor):
+    # Point entities: the box is the point itself
+    for table in ('alerts', 'incidents', 'resources', 'personnel'):
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table}_rtree
+            USING rtree(id, min_lat, max_lat, min_lng, max_lng)
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_rtree_insert AFTER INSERT ON {table}
+            WHEN NEW.lat IS NOT NULL AND NEW.lng IS NOT NULL
+            BEGIN
+                INSERT OR REPLACE INTO {table}_rtree VALUES (NEW.id, NEW.lat, NEW.lat, NEW.lng, NEW.lng);
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_rtree_update AFTER UPDATE OF lat, lng ON {table}
+            BEGIN
+                DELETE FROM {table}_rtree WHERE id = OLD.id;
+                INSERT INTO {table}_rtree
+                SELECT NEW.id, NEW.lat, NEW.lat, NEW.lng, NEW.lng
+                WHERE NEW.lat IS NOT NULL AND NEW.lng IS NOT NULL;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_rtree_delete AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM {table}_rtree WHERE id = OLD.id;
+            END
+        ''')
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO {table}_rtree
+            SELECT id, lat, lat, lng, lng FROM {table}
+            WHERE lat IS NOT NULL AND lng IS NOT NULL
+        ''')
+
+    # Geofence zones: the box is the bounding box of the zone circle
+    zone_box = _geofence_zone_box_sql()
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS geofence_zones_rtree
+        USING rtree(id, min_lat, max_lat, min_lng, max_lng)
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS geofence_zones_rtree_insert AFTER INSERT ON geofence_zones
+        BEGIN
+            INSERT OR REPLACE INTO geofence_zones_rtree VALUES ({zone_box});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS geofence_zones_rtree_update
+        AFTER UPDATE OF lat, lng, radius ON geofence_zones
+        BEGIN
+            INSERT OR REPLACE INTO geofence_zones_rtree VALUES ({zone_box});
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS geofence_zones_rtree_delete AFTER DELETE ON geofence_zones
+        BEGIN
+            DELETE FROM geofence_zones_rtree WHERE id = OLD.id;
+        END
+    ''')
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO geofence_zones_rtree
+        SELECT {zone_box.replace('NEW.', '')} FROM geofence_zones
+    ''')
+
+@migration(6, 'Move SOS mesh messages out of the incidents JSON blob')
+def normalize_sosmesh_messages(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sosmesh_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            msg_id TEXT NOT NULL UNIQUE,
+            incident_id INTEGER,
+            name TEXT,
+            latitude REAL,
+            longitude REAL,
+            emergency TEXT,
+            timestamp INTEGER,
+            delivered BOOLEAN DEFAULT 0,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (incident_id) REFERENCES incidents(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sosmesh_messages_incident
+        ON sosmesh_messages(incident_id)
+    ''')
+
+    if 'sosmesh_messages' not in _columns(cursor, 'incidents'):
+        return
+
+    # Explode the blobs in list order; unparseable blobs and messages
+    # without a msg_id are skipped, repeated msg_ids keep the first copy
+    cursor.execute('''
+        INSERT OR IGNORE INTO sosmesh_messages
+            (msg_id, incident_id, name, latitude, longitude, emergency, timestamp, delivered, received_at)
+        SELECT json_extract(m.value, '$.msg_id'), i.id,
+               json_extract(m.value, '$.name'),
+               json_extract(m.value, '$.latitude'),
+               json_extract(m.value, '$.longitude'),
+               json_extract(m.value, '$.emergency'),
+               json_extract(m.value, '$.timestamp'),
+               COALESCE(json_extract(m.value, '$.delivered'), 0),
+               COALESCE(json_extract(m.value, '$.received_at'), i.created_at)
+        FROM incidents i, json_each(i.sosmesh_messages) m
+        WHERE i.sosmesh_messages IS NOT NULL AND json_valid(i.sosmesh_messages)
+        ORDER BY i.id, m.key
+    ''')
+    cursor.execute('ALTER TABLE incidents DROP COLUMN sosmesh_messages')
+
+@migration(7, 'Persistent AI verification job queue')
+def create_verification_jobs(cursor):
+    # *_at columns are unix timestamps (seconds, float) for latency math
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS verification_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            incident_id INTEGER NOT NULL,
+            attachment_id INTEGER,
+            photo_path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending'
+                CHECK(status IN ('pending', 'running', 'done', 'failed')),
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            result TEXT,
+            enqueued_at REAL NOT NULL,
+            available_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            FOREIGN KEY (incident_id) REFERENCES incidents(id),
+            FOREIGN KEY (attachment_id) REFERENCES attachments(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_verification_jobs_status
+        ON verification_jobs(status, available_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_verification_jobs_finished
+        ON verification_jobs(status, finished_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_verification_jobs_incident
+        ON verification_jobs(incident_id)
+    ''')
+
+@migration(8, 'Upload content hashes and AI verification result cache')
+def add_verification_cache(cursor):
+    _add_column(cursor, 'attachments', 'sha256', 'TEXT')
+    _add_column(cursor, 'attachments', 'dhash', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attachments_sha256 ON attachments(sha256)')
+
+    # One cached result per image content and incident type; times are unix seconds
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS verification_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sha256 TEXT NOT NULL,
+            dhash TEXT,
+            incident_type TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            UNIQUE (sha256, incident_type)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_verification_cache_expires
+        ON verification_cache(expires_at)
+    ''')
+
+    # Each dHash split into bytes ("bands"): hashes within Hamming distance 7
+    # share at least one band, so near-duplicates are found by exact lookups
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS verification_cache_bands (
+            band_key INTEGER NOT NULL,
+            cache_id INTEGER NOT NULL,
+            PRIMARY KEY (band_key, cache_id),
+            FOREIGN KEY (cache_id) REFERENCES verification_cache(id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_verification_cache_bands_cache
+        ON verification_cache_bands(cache_id)
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS verification_cache_bands_delete
+        AFTER DELETE ON verification_cache
+        BEGIN
+            DELETE FROM verification_cache_bands WHERE cache_id = OLD.id;
+        END
+    ''')
+
+@migration(9, 'Thumbnail and poster derivatives of uploads')
+def create_attachment_derivatives(cursor):
+    # One row per generated size; filepath is relative like attachments.filepath
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachment_derivatives (
+            attachment_id INTEGER NOT NULL,
+            size TEXT NOT NULL,
+            filepath TEXT NOT NULL,
+            mime_type TEXT NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            file_size INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (attachment_id, size),
+            FOREIGN KEY (attachment_id) REFERENCES attachments(id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS attachment_derivatives_delete
+        AFTER DELETE ON attachments
+        BEGIN
+            DELETE FROM attachment_derivatives WHERE attachment_id = OLD.id;
+        END
+    ''')
+
+@migration(10, 'Content-addressed blob store with reference counts')
+def create_blobs(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            filepath TEXT NOT NULL,
+            file_size INTEGER,
+            dhash TEXT,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            released_at TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced
+        ON blobs(released_at) WHERE refcount <= 0
+    ''')
+
+    # Attachments hold the references; released_at starts the GC grace period
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS blobs_reference
+        AFTER INSERT ON attachments WHEN NEW.sha256 IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO blobs (sha256, filepath, file_size, dhash)
+            VALUES (NEW.sha256, NEW.filepath, NEW.file_size, NEW.dhash);
+            UPDATE blobs SET refcount = refcount + 1, released_at = NULL
+            WHERE sha256 = NEW.sha256;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS blobs_release
+        AFTER DELETE ON attachments WHEN OLD.sha256 IS NOT NULL
+        BEGIN
+            UPDATE blobs SET
+                refcount = refcount - 1,
+                released_at = CASE WHEN refcount <= 1 THEN CURRENT_TIMESTAMP ELSE released_at END
+            WHERE sha256 = OLD.sha256;
+        END
+    ''')
+
+    # Uploads from before the store keep their per-incident files as blobs
+    cursor.execute('''
+        INSERT OR IGNORE INTO blobs (sha256, filepath, file_size, dhash, refcount)
+        SELECT sha256, MIN(filepath), MAX(file_size), MAX(dhash), COUNT(*)
+        FROM attachments
+        WHERE sha256 IS NOT NULL
+        GROUP BY sha256
+    ''')
+
+@migration(11, 'Resumable upload sessions')
+def create_upload_sessions(cursor):
+    # Chunks are appended to uploads/resumable/<id>.part; received_size is the committed offset
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            id TEXT PRIMARY KEY,
+            incident_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            total_size INTEGER NOT NULL,
+            received_size INTEGER NOT NULL DEFAULT 0,
+            sha256 TEXT,
+            status TEXT NOT NULL DEFAULT 'open',
+            attachment_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (incident_id) REFERENCES incidents(id),
+            FOREIGN KEY (attachment_id) REFERENCES attachments(id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_upload_sessions_status_updated
+        ON upload_sessions(status, updated_at)
+    ''')
+
+@migration(12, 'Incrementally maintained analytics rollups')
+def create_analytics_rollups(cursor):
+    from analytics_rollups import ROLLUP_GRANULARITIES, RESPONSE_EVENTS_SQL, rebuild_rollups, rollup_delta_sql
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS incident_rollups (
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            status TEXT NOT NULL,
+            incidents INTEGER NOT NULL DEFAULT 0,
+            resolved INTEGER NOT NULL DEFAULT 0,
+            resolution_minutes REAL NOT NULL DEFAULT 0,
+            responded INTEGER NOT NULL DEFAULT 0,
+            response_minutes REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, bucket, type, severity, status)
+        ) WITHOUT ROWID
+    ''')
+    # Rows whose last incident moved away are dropped after every change
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_incident_rollups_empty
+        ON incident_rollups(incidents) WHERE incidents = 0
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS incident_first_response (
+            incident_id INTEGER PRIMARY KEY,
+            first_response_at TIMESTAMP NOT NULL
+        )
+    ''')
+
+    def delta(sign, incident, source, where='true'):
+        return ';\n'.join(rollup_delta_sql(g, sign, incident, source, where) for g in ROLLUP_GRANULARITIES) + ';'
+
+    drop_empty = 'DELETE FROM incident_rollups WHERE incidents = 0;'
+    new_incident = 'NEW', '(SELECT 1) LEFT JOIN incident_first_response r ON r.incident_id = NEW.id'
+    old_incident = 'OLD', '(SELECT 1) LEFT JOIN incident_first_response r ON r.incident_id = OLD.id'
+    stored_incident = 'i', 'incidents i LEFT JOIN incident_first_response r ON r.incident_id = i.id'
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS incident_rollups_insert
+        AFTER INSERT ON incidents
+        BEGIN
+            {delta(1, *new_incident)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS incident_rollups_update
+        AFTER UPDATE OF type, severity, status, created_at, resolved_at ON incidents
+        WHEN OLD.type IS NOT NEW.type OR OLD.severity IS NOT NEW.severity OR OLD.status IS NOT NEW.status
+          OR OLD.created_at IS NOT NEW.created_at OR OLD.resolved_at IS NOT NEW.resolved_at
+        BEGIN
+            {delta(-1, *old_incident)}
+            {delta(1, *new_incident)}
+            {drop_empty}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS incident_rollups_delete
+        AFTER DELETE ON incidents
+        BEGIN
+            {delta(-1, *old_incident)}
+            {drop_empty}
+            DELETE FROM incident_first_response WHERE incident_id = OLD.id;
+        END
+    ''')
+
+    # An earlier response event replaces the incident's first response
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS incident_rollups_response
+        AFTER INSERT ON incident_timeline
+        WHEN NEW.event_type IN ({RESPONSE_EVENTS_SQL}) AND NOT EXISTS (
+            SELECT 1 FROM incident_first_response
+            WHERE incident_id = NEW.incident_id AND julianday(first_response_at) <= julianday(NEW.created_at)
+        )
+        BEGIN
+            {delta(-1, *stored_incident, 'i.id = NEW.incident_id')}
+            INSERT INTO incident_first_response (incident_id, first_response_at)
+            VALUES (NEW.incident_id, NEW.created_at)
+            ON CONFLICT (incident_id) DO UPDATE SET first_response_at = excluded.first_response_at;
+            {delta(1, *stored_incident, 'i.id = NEW.incident_id')}
+            {drop_empty}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS incident_rollups_response_delete
+        AFTER DELETE ON incident_timeline
+        WHEN OLD.event_type IN ({RESPONSE_EVENTS_SQL}) AND EXISTS (
+            SELECT 1 FROM incident_first_response
+            WHERE incident_id = OLD.incident_id AND first_response_at = OLD.created_at
+        )
+        BEGIN
+            {delta(-1, *stored_incident, 'i.id = OLD.incident_id')}
+            DELETE FROM incident_first_response WHERE incident_id = OLD.incident_id;
+            INSERT INTO incident_first_response (incident_id, first_response_at)
+            SELECT incident_id, created_at FROM incident_timeline
+            WHERE incident_id = OLD.incident_id AND event_type IN ({RESPONSE_EVENTS_SQL})
+            ORDER BY julianday(created_at) LIMIT 1;
+            {delta(1, *stored_incident, 'i.id = OLD.incident_id')}
+            {drop_empty}
+        END
+    ''')
+
+    rebuild_rollups(cursor)
+
+@migration(13, 'Response and resolution time sketches for percentiles')
+def create_duration_sketches(cursor):
+    from analytics_rollups import create_rollup_triggers, rebuild_rollups
+
+    # DDSketch bin counts (see utils/sketch_utils.py) per span of 2^level
+    # hours (see analytics_rollups.py), by type and/or severity ('*' when
+    # not grouped by that column)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS duration_sketches (
+            metric TEXT NOT NULL,
+            grouped_by TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            span INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            sketch_key INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, grouped_by, level, span, type, severity, sketch_key)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_duration_sketches_empty
+        ON duration_sketches(count) WHERE count = 0
+    ''')
+
+    # The rollup triggers now maintain the sketches as well
+    create_rollup_triggers(cursor)
+    rebuild_rollups(cursor)
+
+@migration(14, 'Minute incident rollups for trend charts')
+def create_minute_rollups(cursor):
+    from analytics_rollups import create_rollup_triggers, rebuild_rollups
+
+    # ROLLUP_GRANULARITIES gained 'minute'; the triggers and rows follow it
+    create_rollup_triggers(cursor)
+    rebuild_rollups(cursor)
+
+@migration(15, 'Shared sessions, presence and socket messages for multiple workers')
+def create_cluster_tables(cursor):
+    # Login sessions, readable by every worker process
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS auth_sessions (
+            token TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_auth_sessions_user ON auth_sessions(user_id)')
+
+    # Live worker processes (see cluster.py); *_at columns are unix timestamps
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS worker_processes (
+            worker_id TEXT PRIMARY KEY,
+            hostname TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            started_at REAL NOT NULL,
+            heartbeat_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_worker_processes_heartbeat ON worker_processes(heartbeat_at)')
+
+    # Socket.IO clients connected to each worker
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS socket_clients (
+            sid TEXT PRIMARY KEY,
+            worker_id TEXT NOT NULL,
+            connected_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_socket_clients_worker ON socket_clients(worker_id)')
+
+    # Socket.IO pub/sub messages between workers (see socket_bus.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS socket_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_socket_messages_created ON socket_messages(created_at)')
+
+    # Jobs remember which worker runs them, so only a dead worker's jobs are re-queued
+    _add_column(cursor, 'verification_jobs', 'worker_id', 'TEXT')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_verification_jobs_worker
+        ON verification_jobs(worker_id) WHERE status = 'running'
+    ''')
+
+    # A worker leaving (or reaped after missing heartbeats) takes its clients
+    # along and hands its running jobs back to the queue
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS worker_processes_reap AFTER DELETE ON worker_processes
+        BEGIN
+            DELETE FROM socket_clients WHERE worker_id = OLD.worker_id;
+            UPDATE verification_jobs
+            SET status = 'pending', worker_id = NULL, available_at = (julianday('now') - 2440587.5) * 86400.0
+            WHERE status = 'running' AND worker_id = OLD.worker_id;
+        END
+    ''')
+
+@migration(16, 'Change log for delta sync')
+def create_change_log(cursor):
+    # Latest change per entity row; seq only grows, so a client's cursor is
+    # the highest seq it has seen (see routes/sync.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (entity, entity_id)
+        )
+    ''')
+
+    # Delete then insert rather than INSERT OR REPLACE: an outer
+    # INSERT OR IGNORE would turn the replace into a silent no-op
+    def record(table, row, deleted):
+        return f'''
+            DELETE FROM change_log WHERE entity = '{table}' AND entity_id = {row}.id;
+            INSERT INTO change_log (entity, entity_id, deleted) VALUES ('{table}', {row}.id, {deleted});
+        '''
+
+    for table in ('incidents', 'personnel', 'resources', 'attachments'):
+        for event, row, deleted in (('INSERT', 'NEW', 0), ('UPDATE', 'NEW', 0), ('DELETE', 'OLD', 1)):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_change_log_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    {record(table, row, deleted)}
+                END
+            ''')
+
+        # Existing rows are the first changes, so since=0 is a full snapshot
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO change_log (entity, entity_id)
+            SELECT '{table}', id FROM {table} ORDER BY id
+        ''')
+
+@migration(17, 'Data generations for cached analytics across workers')
+def create_data_generations(cursor):
+    # Bumped by every write to what cached analytics read (see
+    # utils/result_cache_utils.py), whichever process or tool writes it.
+    # Position updates (location flushes) leave them alone.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_generations (
+            tag TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    updates = {
+        'incidents': 'UPDATE',
+        'personnel': 'UPDATE OF role, status, assigned_incident_id',
+        'resources': 'UPDATE OF type, status'
+    }
+    for table, update in updates.items():
+        cursor.execute('INSERT OR IGNORE INTO data_generations (tag) VALUES (?)', (table,))
+        for event in ('INSERT', update, 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_generation_{event.split()[0].lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_generations SET generation = generation + 1 WHERE tag = '{table}';
+                END
+            ''')
+
+@migration(18, 'Blob rows registered before attachments reference them')
+def register_blobs_first(cursor):
+    # blob_store registers a blob before any attachment exists, so the first
+    # image attachment now fills in the perceptual hash the row was created without
+    cursor.execute('DROP TRIGGER IF EXISTS blobs_reference')
+    cursor.execute('''
+        CREATE TRIGGER blobs_reference
+        AFTER INSERT ON attachments WHEN NEW.sha256 IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO blobs (sha256, filepath, file_size, dhash)
+            VALUES (NEW.sha256, NEW.filepath, NEW.file_size, NEW.dhash);
+            UPDATE blobs SET refcount = refcount + 1, released_at = NULL, dhash = COALESCE(dhash, NEW.dhash)
+            WHERE sha256 = NEW.sha256;
+        END
+    ''')
+
+@migration(19, 'Resumable upload completion checkpoint')
+def add_upload_session_filepath(cursor):
+    # Blob a completing upload was moved to, so a retried completion attaches it
+    _add_column(cursor, 'upload_sessions', 'filepath', 'TEXT')
+
+@migration(20, 'Store app-written timestamps in UTC')
+def normalize_timestamps_to_utc(cursor):
+    from analytics_rollups import rebuild_rollups
+
+    # Web reports, assignments and timeline entries were written in the
+    # server's local time as ISO strings ('T' separator); column defaults,
+    # SOS and SMS rows were already UTC. Convert with the server's current zone.
+    columns = {
+        'incidents': ('created_at', 'updated_at', 'resolved_at'),
+        'incident_timeline': ('created_at',),
+        'personnel': ('updated_at',),
+        'resources': ('updated_at',),
+        'sosmesh_messages': ('received_at',)
+    }
+    for table, names in columns.items():
+        for name in names:
+            cursor.execute(f'''
+                UPDATE {table} SET {name} = datetime({name}, 'utc')
+                WHERE {name} LIKE '____-__-__T%' AND datetime({name}, 'utc') IS NOT NULL
+            ''')
+
+    # Buckets and durations move with the timestamps
+    rebuild_rollups(cursor)
+
+@migration(21, 'Triggers in plain SQL, without application functions')
+def inline_trigger_functions(cursor):
+    from analytics_rollups import create_rollup_triggers
+
+    # lng_degrees() and ddsketch_key() only existed on the app's own
+    # connections; the sqlite3 shell and other tools failed on these writes
+    zone_box = _geofence_zone_box_sql()
+    for event, body in (
+        ('insert', f'''
+            AFTER INSERT ON geofence_zones
+            BEGIN
+                INSERT OR REPLACE INTO geofence_zones_rtree VALUES ({zone_box});
+            END
+        '''),
+        ('update', f'''
+            AFTER UPDATE OF lat, lng, radius ON geofence_zones
+            BEGIN
+                INSERT OR REPLACE INTO geofence_zones_rtree VALUES ({zone_box});
+            END
+        ''')
+    ):
+        cursor.execute(f'DROP TRIGGER IF EXISTS geofence_zones_rtree_{event}')
+        cursor.execute(f'CREATE TRIGGER geofence_zones_rtree_{event} {body}')
+
+    create_rollup_triggers(cursor)
+
+# ==================== Runner ====================
+
+def _ensure_version_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def current_version(cursor):
+    """Return the highest applied migration version (0 if none)"""
+    _ensure_version_table(cursor)
+    cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+    return cursor.fetchone()[0]
+
+def pending_migrations(cursor):
+    version = current_version(cursor)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+def _backup_database(conn, from_version):
+    """Snapshot the database (including WAL contents) before migrating"""
+    backup_path = Config.DATABASE_PATH + f'.backup_v{from_version}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+    backup = sqlite3.connect(backup_path)
+    try:
+        conn.backup(backup)
+    finally:
+        backup.close()
+    print(f"✅ Database backed up to: {backup_path}")
+    return backup_path
+
+def run_migrations(backup=True):
+    """
+    Apply all pending migrations in order
+    Returns list of applied versions
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        pending = pending_migrations(cursor)
+        conn.commit()
+        if not pending:
+            return []
+
+        backup_path = None
+        if backup:
+            backup_path = _backup_database(conn, current_version(cursor))
+
+        applied = []
+        for version, description, func in pending:
+            try:
+                # DDL does not open an implicit transaction, so start one explicitly.
+                # IMMEDIATE takes the write lock first: with several workers starting
+                # at once, the others wait here and then skip what was applied.
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,))
+                if cursor.fetchone():
+                    conn.commit()
+                    continue
+                func(cursor)
+                cursor.execute('''
+                    INSERT INTO schema_version (version, description) VALUES (?, ?)
+                ''', (version, description))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Migration {version} failed: {e}")
+                if backup_path:
+                    print(f"   Database can be restored from: {backup_path}")
+                raise
+            applied.append(version)
+            print(f"✅ Migration {version}: {description}")
+
+        # Refresh planner statistics for new indexes
+        cursor.execute('PRAGMA optimize')
+        return applied
+    finally:
+        conn.close()
+
+def print_status():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    version = current_version(cursor)
+    conn.commit()
+    conn.close()
+
+    print(f"📦 Schema version: {version}")
+    for number, description, _ in MIGRATIONS:
+        state = 'applied' if number <= version else 'pending'
+        print(f"   {number:>3} [{state}] {description}")
+
+
+if __name__ == '__main__':
+    if not os.path.exists(Config.DATABASE_PATH):
+        print(f"Database not found at {Config.DATABASE_PATH}. Run `python database.py` first.")
+        sys.exit(1)
+
+    if '--status' in sys.argv:
+        print_status()
+    else:
+        print("🔄 Running database migrations...")
+        applied = run_migrations()
+        print(f"✅ Applied {len(applied)} migration(s)" if applied else "✅ Database is up to date")
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from database import get_db_connection
 from utils.geo_utils import get_nearby_items, check_geofence_breach
 from utils.notification_utils import create_geofence_alert
+from utils.spatial_utils import within_radius_clause, containing_point_clause
 from config import Config
 
 alerts_bp = Blueprint('alerts', __name__)
@@ -19,19 +20,21 @@ def get_nearby_alerts():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Get all active alerts
-    cursor.execute('''
+    # Get active alerts inside the bounding box (R*Tree lookup)
+    nearby_clause, params = within_radius_clause('alerts', lat, lng, radius, 'a.id')
+    cursor.execute(f'''
         SELECT a.*, i.title as incident_title, i.type as incident_type, i.status as incident_status
         FROM alerts a
         LEFT JOIN incidents i ON a.incident_id = i.id
-        WHERE a.expires_at IS NULL OR a.expires_at > datetime('now')
-    ''')
+        WHERE {nearby_clause}
+        AND (a.expires_at IS NULL OR a.expires_at > datetime('now'))
+    ''', params)
     
-    all_alerts = [dict(row) for row in cursor.fetchall()]
+    candidate_alerts = [dict(row) for row in cursor.fetchall()]
     conn.close()
     
-    # Filter by proximity
-    nearby_alerts = get_nearby_items(lat, lng, all_alerts, radius)
+    # Filter by exact distance
+    nearby_alerts = get_nearby_items(lat, lng, candidate_alerts, radius)
     
     return jsonify({
         'success': True,
@@ -87,13 +90,14 @@ def check_geofence():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Get all active geofence zones
-    cursor.execute('''
+    # Get active geofence zones whose bounding box contains the point (R*Tree lookup)
+    zone_clause, params = containing_point_clause('geofence_zones', data['lat'], data['lng'], 'g.id')
+    cursor.execute(f'''
         SELECT g.*, i.title as incident_title, i.severity as incident_severity
         FROM geofence_zones g
         LEFT JOIN incidents i ON g.incident_id = i.id
-        WHERE g.active = 1
-    ''')
+        WHERE {zone_clause} AND g.active = 1
+    ''', params)
     
     zones = [dict(row) for row in cursor.fetchall()]
     conn.close()
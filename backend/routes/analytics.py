@@ -4,8 +4,11 @@ from utils.analytics_utils import (
     get_incident_statistics,
     get_personnel_efficiency,
     get_resource_utilization,
-    calculate_response_time
+    calculate_response_time,
+    get_duration_distribution,
+    get_incident_timeseries
 )
+from datetime import datetime, timezone
 
 analytics_bp = Blueprint('analytics', __name__)
 
@@ -31,6 +34,67 @@ def get_incident_analytics():
         'statistics': stats
     })
 
+def _utc_arg(name):
+    """Optional ISO 8601 query argument as naive UTC (ValueError when malformed)"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@analytics_bp.route('/analytics/distribution', methods=['GET'])
+def get_time_distribution():
+    """
+    Response or resolution time percentiles and histogram
+    Query: metric (response|resolution), days or start/end (ISO 8601),
+    type, severity, group_by (type|severity)
+    """
+    try:
+        distribution = get_duration_distribution(
+            request.args.get('metric', 'response'),
+            start=_utc_arg('start'),
+            end=_utc_arg('end'),
+            days=request.args.get('days', type=int, default=30),
+            incident_type=request.args.get('type'),
+            severity=request.args.get('severity'),
+            group_by=request.args.get('group_by')
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'distribution': distribution
+    })
+
+@analytics_bp.route('/analytics/timeseries', methods=['GET'])
+def get_timeseries():
+    """
+    Incident trend as columnar arrays
+    Query: bucket (1m..7d), days or start/end (ISO 8601), metric,
+    group_by (type|severity|status), type, severity
+    """
+    try:
+        timeseries = get_incident_timeseries(
+            request.args.get('bucket', '1h'),
+            start=_utc_arg('start'),
+            end=_utc_arg('end'),
+            days=request.args.get('days', type=int, default=7),
+            metric=request.args.get('metric', 'incidents'),
+            group_by=request.args.get('group_by'),
+            incident_type=request.args.get('type'),
+            severity=request.args.get('severity')
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'timeseries': timeseries
+    })
+
 @analytics_bp.route('/analytics/personnel', methods=['GET'])
 def get_personnel_analytics():
     """Get personnel efficiency analytics"""
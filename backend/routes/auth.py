@@ -1,13 +1,12 @@
 from flask import Blueprint, request, jsonify
 from database import get_db_connection
-from datetime import datetime
 import secrets
 import sqlite3
 
 auth_bp = Blueprint('auth', __name__)
 
-# Simple session storage (in production, use Redis or proper session management)
-active_sessions = {}
+def _bearer_token():
+    return request.headers.get('Authorization', '').replace('Bearer ', '')
 
 @auth_bp.route('/auth/login', methods=['POST'])
 def login():
@@ -35,6 +34,12 @@ def login():
         conn.close()
         return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
     
+    # Create session token (stored in the database so every worker accepts it)
+    session_token = secrets.token_urlsafe(32)
+    cursor.execute('''
+        INSERT INTO auth_sessions (token, user_id) VALUES (?, ?)
+    ''', (session_token, user['id']))
+    
     # Update last login
     cursor.execute('''
         UPDATE users SET last_login = datetime('now') WHERE id = ?
@@ -42,16 +47,6 @@ def login():
     conn.commit()
     conn.close()
     
-    # Create session token
-    session_token = secrets.token_urlsafe(32)
-    active_sessions[session_token] = {
-        'user_id': user['id'],
-        'username': user['username'],
-        'name': user['name'],
-        'role': user['role'],
-        'created_at': datetime.now().isoformat()
-    }
-    
     return jsonify({
         'success': True,
         'token': session_token,
@@ -68,31 +63,31 @@ def login():
 @auth_bp.route('/auth/logout', methods=['POST'])
 def logout():
     """Logout endpoint"""
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    
-    if token in active_sessions:
-        del active_sessions[token]
+    conn = get_db_connection()
+    conn.execute('DELETE FROM auth_sessions WHERE token = ?', (_bearer_token(),))
+    conn.commit()
+    conn.close()
     
     return jsonify({'success': True, 'message': 'Logged out successfully'})
 
 @auth_bp.route('/auth/me', methods=['GET'])
 def get_current_user():
     """Get current user info"""
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    
-    if token not in active_sessions:
-        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
-    
-    session = active_sessions[token]
-    
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM users WHERE id = ?', (session['user_id'],))
+    cursor.execute('''
+        SELECT s.user_id, u.* FROM auth_sessions s
+        LEFT JOIN users u ON u.id = s.user_id
+        WHERE s.token = ?
+    ''', (_bearer_token(),))
     user = cursor.fetchone()
     conn.close()
     
     if not user:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    if user['id'] is None:
         return jsonify({'success': False, 'error': 'User not found'}), 404
     
     return jsonify({
@@ -188,10 +183,18 @@ def register_responder():
 
 def verify_token(token):
     """Helper function to verify token"""
-    return token in active_sessions
+    return get_user_from_token(token) is not None
 
 def get_user_from_token(token):
     """Helper function to get user from token"""
-    if token in active_sessions:
-        return active_sessions[token]
-    return None
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT s.user_id, u.username, u.name, u.role, s.created_at
+        FROM auth_sessions s
+        JOIN users u ON u.id = s.user_id
+        WHERE s.token = ?
+    ''', (token,))
+    session = cursor.fetchone()
+    conn.close()
+    return dict(session) if session else None
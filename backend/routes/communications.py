@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from database import get_db_connection
-from datetime import datetime
+from utils.time_utils import utc_timestamp
 
 comms_bp = Blueprint('comms', __name__)
 
@@ -71,7 +71,7 @@ def send_message():
     return jsonify({
         'success': True,
         'comm_id': comm_id,
-        'created_at': datetime.now().isoformat()
+        'created_at': utc_timestamp()
     }), 201
 
 @comms_bp.route('/comms/<int:comm_id>/read', methods=['PUT'])
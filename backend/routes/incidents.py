@@ -1,13 +1,15 @@
 from flask import Blueprint, request, jsonify
 from database import get_db_connection
-from datetime import datetime, timedelta
+from verification_queue import verification_queue
+from datetime import datetime, timedelta, timezone
 from utils.file_utils import save_file
-from utils.geo_utils import calculate_distance
+from utils.attachment_utils import attach_file
+from utils.thumbnail_utils import thumbnail_urls
+from utils.dedup_utils import find_duplicate_incident
+from utils.hydration_utils import hydrate_incidents
+from utils.spatial_utils import parse_proximity_args, within_radius_clause, filter_nearby
 from utils.notification_utils import broadcast_incident_notification
-from utils.ai_utils import ai_handler
-from config import Config
-import threading
-import os
+from utils.time_utils import utc_timestamp
 
 incidents_bp = Blueprint('incidents', __name__)
 
@@ -19,6 +21,7 @@ def get_all_attachments():
     
     limit = request.args.get('limit', 100)
     
+    # Joined before LIMIT so attachments of deleted incidents never shorten the page
     cursor.execute('''
         SELECT a.*, i.title as incident_title, i.severity as incident_severity
         FROM attachments a
@@ -28,6 +31,9 @@ def get_all_attachments():
     ''', (limit,))
     
     attachments = [dict(row) for row in cursor.fetchall()]
+    for attachment in attachments:
+        attachment['thumbnails'] = thumbnail_urls(attachment)
+    
     conn.close()
     
     return jsonify({
@@ -46,6 +52,7 @@ def get_incidents():
     status = request.args.get('status')
     severity = request.args.get('severity')
     incident_type = request.args.get('type')
+    proximity = parse_proximity_args(request.args)
     
     query = 'SELECT * FROM incidents WHERE 1=1'
     params = []
@@ -62,41 +69,22 @@ def get_incidents():
         query += ' AND type = ?'
         params.append(incident_type)
     
+    if proximity:
+        nearby_clause, nearby_params = within_radius_clause('incidents', *proximity)
+        query += f' AND {nearby_clause}'
+        params.extend(nearby_params)
+    
     query += ' ORDER BY created_at DESC'
     
     cursor.execute(query, params)
     incidents = [dict(row) for row in cursor.fetchall()]
     
-    # Get personnel and resources for each incident
-    for incident in incidents:
-        # Get assigned personnel
-        cursor.execute('''
-            SELECT name, role, status FROM personnel
-            WHERE assigned_incident_id = ?
-        ''', (incident['id'],))
-        incident['responders'] = [dict(row) for row in cursor.fetchall()]
-        
-        # Get assigned resources
-        cursor.execute('''
-            SELECT name, type, status FROM resources
-            WHERE assigned_incident_id = ?
-        ''', (incident['id'],))
-        incident['resources'] = [dict(row) for row in cursor.fetchall()]
-        
-        # Get attachments
-        cursor.execute('''
-            SELECT * FROM attachments
-            WHERE incident_id = ?
-            ORDER BY created_at DESC
-        ''', (incident['id'],))
-        incident['attachments'] = [dict(row) for row in cursor.fetchall()]
-        incident['attachments_count'] = len(incident['attachments'])
-        
-        # Format location
-        incident['location'] = {
-            'lat': incident['lat'],
-            'lng': incident['lng']
-        }
+    # Nearest first when a location is given
+    if proximity:
+        incidents = filter_nearby(incidents, proximity)
+    
+    # Hydrate responders, resources and attachments for the whole page at once
+    hydrate_incidents(cursor, incidents)
     
     conn.close()
     
@@ -121,35 +109,8 @@ def get_incident(incident_id):
     
     incident = dict(incident)
     
-    # Get personnel
-    cursor.execute('''
-        SELECT * FROM personnel
-        WHERE assigned_incident_id = ?
-    ''', (incident_id,))
-    incident['responders'] = [dict(row) for row in cursor.fetchall()]
-    
-    # Get resources
-    cursor.execute('''
-        SELECT * FROM resources
-        WHERE assigned_incident_id = ?
-    ''', (incident_id,))
-    incident['resources'] = [dict(row) for row in cursor.fetchall()]
-    
-    # Get timeline
-    cursor.execute('''
-        SELECT * FROM incident_timeline
-        WHERE incident_id = ?
-        ORDER BY created_at DESC
-    ''', (incident_id,))
-    incident['timeline'] = [dict(row) for row in cursor.fetchall()]
-    
-    # Get attachments
-    cursor.execute('''
-        SELECT * FROM attachments
-        WHERE incident_id = ?
-        ORDER BY created_at DESC
-    ''', (incident_id,))
-    incident['attachments'] = [dict(row) for row in cursor.fetchall()]
+    # Get personnel, resources, timeline and attachments
+    hydrate_incidents(cursor, [incident], detail=True)
     
     # Get communications
     cursor.execute('''
@@ -160,12 +121,6 @@ def get_incident(incident_id):
     ''', (incident_id,))
     incident['communications'] = [dict(row) for row in cursor.fetchall()]
     
-    # Format location
-    incident['location'] = {
-        'lat': incident['lat'],
-        'lng': incident['lng']
-    }
-    
     conn.close()
     
     return jsonify({
@@ -189,30 +144,18 @@ def create_incident():
     # Define severity ranking for upgrades
     severity_rank = {'critical': 3, 'high': 2, 'medium': 1, 'low': 0}
     
-    # 1. Search for potential duplicates (Active within last 24 hours)
-    cutoff = (datetime.now() - timedelta(hours=24)).isoformat()
-    cursor.execute('''
-        SELECT id, lat, lng, report_count, severity FROM incidents 
-        WHERE type = ? AND status = 'active' AND created_at >= ?
-    ''', (data['type'], cutoff))
-    
-    active_incidents = [dict(row) for row in cursor.fetchall()]
-    
-    # Check for duplicates (within 500m)
-    duplicate_incident = None
-    for incident in active_incidents:
-        distance = calculate_distance(
-            data['lat'], data['lng'],
-            incident['lat'], incident['lng']
-        )
-        if distance <= 500:  # 500 meters threshold
-            duplicate_incident = incident
-            break
+    # 1. Search for potential duplicates (Active within last 24 hours, within 500m)
+    cutoff = utc_timestamp(datetime.now(timezone.utc) - timedelta(hours=24))
+    duplicate_incident = find_duplicate_incident(
+        cursor, data['type'], data['lat'], data['lng'],
+        columns='id, lat, lng, report_count, severity',
+        since=cutoff
+    )
             
     if duplicate_incident:
         # Increment report count
         new_count = (duplicate_incident['report_count'] or 1) + 1
-        now = datetime.now().isoformat()
+        now = utc_timestamp()
         
         # Determine if severity upgrade is needed
         new_severity = data['severity']
@@ -259,7 +202,7 @@ def create_incident():
             'severity_upgraded': upgrade_needed
         }), 200
 
-    now = datetime.now().isoformat()
+    now = utc_timestamp()
     cursor.execute('''
         INSERT INTO incidents (
             title, description, type, severity, status,
@@ -334,7 +277,7 @@ def update_incident(incident_id):
         return jsonify({'success': False, 'error': 'No fields to update'}), 400
     
     # Add updated_at
-    now = datetime.now().isoformat()
+    now = utc_timestamp()
     update_fields.append('updated_at = ?')
     params.append(now)
     
@@ -389,7 +332,7 @@ def assign_resources(incident_id):
                 UPDATE personnel
                 SET assigned_incident_id = ?, status = 'en-route', updated_at = ?
                 WHERE id = ?
-            ''', (incident_id, datetime.now().isoformat(), personnel_id))
+            ''', (incident_id, utc_timestamp(), personnel_id))
             assigned['personnel'].append(personnel_id)
     
     # Assign resources
@@ -399,7 +342,7 @@ def assign_resources(incident_id):
                 UPDATE resources
                 SET assigned_incident_id = ?, status = 'en-route', updated_at = ?
                 WHERE id = ?
-            ''', (incident_id, datetime.now().isoformat(), resource_id))
+            ''', (incident_id, utc_timestamp(), resource_id))
             assigned['resources'].append(resource_id)
     
     # Add timeline event
@@ -430,119 +373,36 @@ def upload_attachment(incident_id):
     file = request.files['file']
     
     # Save file
-    file_info = save_file(file, incident_id)
+    file_info = save_file(file)
     
     if not file_info:
         return jsonify({'success': False, 'error': 'Invalid file or file type not allowed'}), 400
     
-    # Save to database
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO attachments (incident_id, filename, filepath, file_type, file_size)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (
-        incident_id,
-        file_info['filename'],
-        file_info['filepath'],
-        file_info['file_type'],
-        file_info['file_size']
-    ))
-    
-    attachment_id = cursor.lastrowid
-    
-    # Trigger AI Verification in background if it's an image
-    if file_info['file_type'] == 'image':
-        def run_verification(inc_id, photo_path):
-            incident_type = None
-            incident_desc = None
-            
-            # Step 1: Get incident data and close connection immediately
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT type, description FROM incidents WHERE id = ?', (inc_id,))
-                incident = cursor.fetchone()
-                if incident:
-                    incident_type = incident['type']
-                    incident_desc = incident['description'] or "No description provided"
-            
-            if not incident_type:
-                return
+    return jsonify(attach_file(incident_id, file_info)), 201
 
-            # Step 2: Call AI (This is the slow part, no DB connection held)
-            print(f"🤖 AI: Starting verification for incident {inc_id}...")
-            result = ai_handler.verify_incident_photo(photo_path, incident_type, incident_desc)
-            
-            # Step 3: Re-open connection to save results (with retry)
-            import time
-            import random
-            max_retries = 5
-            for attempt in range(max_retries):
-                try:
-                    with get_db_connection() as conn:
-                        # Explicitly begin transaction
-                        conn.execute('BEGIN IMMEDIATE')
-                        cursor = conn.cursor()
-                        # Update incident with verification results
-                        cursor.execute('''
-                            UPDATE incidents 
-                            SET is_verified = ?, verification_score = ?, ai_analysis = ?, updated_at = CURRENT_TIMESTAMP
-                            WHERE id = ?
-                        ''', (
-                            result['is_verified'], # Now an integer: 1, 0, or -1
-                            result['confidence_score'],
-                            result['analysis'],
-                            inc_id
-                        ))
-                        
-                        # Add timeline event
-                        status_map = {1: "VERIFIED", 0: "UNVERIFIED", -1: "FAKE/FRAUD"}
-                        verification_status = status_map.get(result['is_verified'], "UNKNOWN")
-                        
-                        cursor.execute('''
-                            INSERT INTO incident_timeline (incident_id, event_type, description, user_name, metadata)
-                            VALUES (?, ?, ?, ?, ?)
-                        ''', (
-                            inc_id,
-                            'ai_verification',
-                            f"AI Verification Result: {verification_status} (Score: {result['confidence_score']}%)",
-                            'Gemini Flash',
-                            result['analysis']
-                        ))
-                        conn.commit()
-                        print(f"✅ AI Verification saved successfully on attempt {attempt + 1}")
-                        break # Success!
-                except Exception as db_err:
-                    # Check if it's a lock error
-                    if 'locked' in str(db_err) and attempt < max_retries - 1:
-                        wait_time = (0.5 * (2 ** attempt)) + (random.random() * 0.2)
-                        print(f"⚠️ DB Locked. Retrying in {wait_time:.2f}s... (Attempt {attempt + 1}/{max_retries})")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"🤖 DB Error saving verification: {db_err}")
-                        break
-            else:
-                print(f"🤖 AI Error: {result.get('error')}")
-
-        # Start verification in a separate thread to not block the response
-        full_photo_path = os.path.join(Config.BASE_DIR, file_info['filepath'])
-        threading.Thread(target=run_verification, args=(incident_id, full_photo_path)).start()
-
-    # Add timeline event for the upload itself
-    cursor.execute('''
-        INSERT INTO incident_timeline (incident_id, event_type, description, user_name)
-        VALUES (?, ?, ?, ?)
-    ''', (incident_id, 'attachment_added', f'File uploaded: {file_info["filename"]}', 'User'))
-    
-    conn.commit()
-    conn.close()
+@incidents_bp.route('/verification/status', methods=['GET'])
+def get_verification_status():
+    """Get AI verification queue depth, workers and latency percentiles"""
+    status = verification_queue.stats()
+    
+    # Optionally include the jobs of one incident
+    incident_id = request.args.get('incident_id', type=int)
+    if incident_id:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, attachment_id, status, attempts, last_error, enqueued_at, finished_at
+            FROM verification_jobs
+            WHERE incident_id = ?
+            ORDER BY id DESC
+        ''', (incident_id,))
+        status['jobs'] = [dict(row) for row in cursor.fetchall()]
+        conn.close()
     
     return jsonify({
         'success': True,
-        'attachment_id': attachment_id,
-        'file_info': file_info
-    }), 201
+        **status
+    })
 
 @incidents_bp.route('/incidents/<int:incident_id>/timeline', methods=['GET'])
 def get_incident_timeline(incident_id):
@@ -578,7 +438,7 @@ def add_timeline_event(incident_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    now = datetime.now().isoformat()
+    now = utc_timestamp()
     cursor.execute('''
         INSERT INTO incident_timeline (incident_id, event_type, description, user_name, metadata, created_at)
         VALUES (?, ?, ?, ?, ?, ?)
@@ -620,7 +480,7 @@ def resolve_incident(incident_id):
 
         # If not confirmed, just set to pending_review
         if not confirm:
-            now = datetime.now().isoformat()
+            now = utc_timestamp()
             cursor.execute('''
                 UPDATE incidents 
                 SET status = 'pending_review', updated_at = ?
@@ -649,7 +509,7 @@ def resolve_incident(incident_id):
             })
 
         # 2. Update Incident Status
-        now = datetime.now().isoformat()
+        now = utc_timestamp()
         cursor.execute('''
             UPDATE incidents 
             SET status = 'resolved', updated_at = ?, resolved_at = ?
@@ -661,7 +521,7 @@ def resolve_incident(incident_id):
             UPDATE personnel
             SET status = 'available', assigned_incident_id = NULL, updated_at = ?
             WHERE assigned_incident_id = ?
-        ''', (datetime.now().isoformat(), incident_id))
+        ''', (utc_timestamp(), incident_id))
         affected_personnel = cursor.rowcount
         
         # 4. Release Resources
@@ -669,7 +529,7 @@ def resolve_incident(incident_id):
             UPDATE resources
             SET status = 'available', assigned_incident_id = NULL, updated_at = ?
             WHERE assigned_incident_id = ?
-        ''', (datetime.now().isoformat(), incident_id))
+        ''', (utc_timestamp(), incident_id))
         affected_resources = cursor.rowcount
         
         # 5. Add Timeline Event
@@ -1,6 +1,11 @@
+import json
 from flask import Blueprint, request, jsonify, current_app
 from database import get_db_connection
-from datetime import datetime
+from utils.time_utils import utc_timestamp
+from location_store import location_store
+from utils.hydration_utils import attach_parent
+from utils.spatial_utils import parse_proximity_args, within_radius_clause, filter_nearby
+from utils.subscription_utils import personnel_rooms
 
 personnel_bp = Blueprint('personnel', __name__)
 
@@ -14,6 +19,7 @@ def get_personnel():
     status = request.args.get('status')
     role = request.args.get('role')
     incident_id = request.args.get('incident_id')
+    proximity = parse_proximity_args(request.args)
     
     query = 'SELECT * FROM personnel WHERE 1=1'
     params = []
@@ -30,10 +36,20 @@ def get_personnel():
         query += ' AND assigned_incident_id = ?'
         params.append(incident_id)
     
+    if proximity:
+        nearby_clause, nearby_params = within_radius_clause('personnel', *proximity)
+        # People with a pending position are checked against it below
+        query += f' AND ({nearby_clause} OR id IN (SELECT value FROM json_each(?)))'
+        params.extend(nearby_params + [json.dumps(location_store.pending_ids())])
+    
     query += ' ORDER BY name'
     
     cursor.execute(query, params)
-    personnel = [dict(row) for row in cursor.fetchall()]
+    personnel = location_store.overlay([dict(row) for row in cursor.fetchall()])
+    
+    # Nearest first when a location is given
+    if proximity:
+        personnel = filter_nearby(personnel, proximity)
     
     # Format location for each
     for person in personnel:
@@ -64,14 +80,10 @@ def get_personnel_detail(personnel_id):
         conn.close()
         return jsonify({'success': False, 'error': 'Personnel not found'}), 404
     
-    person = dict(person)
+    person = location_store.overlay([dict(person)])[0]
     
     # Get assigned incident if any
-    if person['assigned_incident_id']:
-        cursor.execute('SELECT * FROM incidents WHERE id = ?', (person['assigned_incident_id'],))
-        incident = cursor.fetchone()
-        if incident:
-            person['assigned_incident'] = dict(incident)
+    attach_parent(cursor, [person], 'assigned_incident', 'incidents', 'assigned_incident_id')
     
     # Format location
     if person['lat'] and person['lng']:
@@ -95,45 +107,16 @@ def update_personnel_location(personnel_id):
     if 'lat' not in data or 'lng' not in data:
         return jsonify({'success': False, 'error': 'Missing lat or lng'}), 400
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        UPDATE personnel
-        SET lat = ?, lng = ?, updated_at = ?
-        WHERE id = ?
-    ''', (data['lat'], data['lng'], datetime.now().isoformat(), personnel_id))
-    
-    conn.commit()
-    
-    # Get personnel info for broadcasting
-    cursor.execute('SELECT name, status, assigned_incident_id FROM personnel WHERE id = ?', (personnel_id,))
-    person = cursor.fetchone()
-    
-    conn.close()
-    
-    if person:
-        # Broadcast to all
-        current_app.broadcast_event('personnel_location_updated', {
-            'personnel_id': personnel_id,
-            'name': person['name'],
-            'location': {'lat': data['lat'], 'lng': data['lng']},
-            'status': person['status']
-        })
-        
-        # If assigned, broadcast to incident room
-        if person['assigned_incident_id']:
-            current_app.broadcast_event('personnel_location_updated', {
-                'personnel_id': personnel_id,
-                'name': person['name'],
-                'location': {'lat': data['lat'], 'lng': data['lng']},
-                'status': person['status']
-            }, room=f'incident_{person["assigned_incident_id"]}')
+    # Saved and broadcast with the socket pings on the location store's ticks
+    try:
+        location = location_store.update(personnel_id, data['lat'], data['lng'])
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
     return jsonify({
         'success': True,
         'personnel_id': personnel_id,
-        'location': {'lat': data['lat'], 'lng': data['lng']}
+        'location': location
     })
 
 
@@ -163,7 +146,7 @@ def update_personnel_status(personnel_id):
         UPDATE personnel
         SET status = ?, updated_at = ?
         WHERE id = ?
-    ''', (data['status'], datetime.now().isoformat(), personnel_id))
+    ''', (data['status'], utc_timestamp(), personnel_id))
     
     # If status changed to available, clear assignment
     if data['status'] == 'available' and person['assigned_incident_id']:
@@ -187,13 +170,13 @@ def update_personnel_status(personnel_id):
     conn.commit()
     conn.close()
     
-    # Broadcast status change
+    # Broadcast status change (the room of an incident they were released from included)
     current_app.broadcast_event('personnel_status_updated', {
         'personnel_id': personnel_id,
         'name': person['name'],
         'status': data['status'],
         'assigned_incident_id': person['assigned_incident_id'] if data['status'] != 'available' else None
-    })
+    }, room=personnel_rooms(person))
     
     return jsonify({
         'success': True,
@@ -215,14 +198,10 @@ def get_personnel_by_user(user_id):
         conn.close()
         return jsonify({'success': False, 'error': 'Personnel not found for this user'}), 404
     
-    person = dict(person)
+    person = location_store.overlay([dict(person)])[0]
     
     # Get assigned incident if any
-    if person['assigned_incident_id']:
-        cursor.execute('SELECT * FROM incidents WHERE id = ?', (person['assigned_incident_id'],))
-        incident = cursor.fetchone()
-        if incident:
-            person['assigned_incident'] = dict(incident)
+    attach_parent(cursor, [person], 'assigned_incident', 'incidents', 'assigned_incident_id')
     
     # Format location
     if person['lat'] and person['lng']:
@@ -285,13 +264,22 @@ def get_available_personnel():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT * FROM personnel
-        WHERE status = 'available'
-        ORDER BY role, name
-    ''')
+    query = "SELECT * FROM personnel WHERE status = 'available'"
+    params = []
+    
+    proximity = parse_proximity_args(request.args)
+    if proximity:
+        nearby_clause, params = within_radius_clause('personnel', *proximity)
+        # People with a pending position are checked against it below
+        query += f' AND ({nearby_clause} OR id IN (SELECT value FROM json_each(?)))'
+        params.append(json.dumps(location_store.pending_ids()))
     
-    personnel = [dict(row) for row in cursor.fetchall()]
+    cursor.execute(query + ' ORDER BY role, name', params)
+    personnel = location_store.overlay([dict(row) for row in cursor.fetchall()])
+    
+    # Nearest first when a location is given
+    if proximity:
+        personnel = filter_nearby(personnel, proximity)
     
     # Format location
     for person in personnel:
@@ -341,7 +329,7 @@ def assign_personnel_to_incident(personnel_id):
         UPDATE personnel
         SET assigned_incident_id = ?, status = 'responding', updated_at = ?
         WHERE id = ?
-    ''', (incident_id, datetime.now().isoformat(), personnel_id))
+    ''', (incident_id, utc_timestamp(), personnel_id))
     
     # Add timeline event to incident
     cursor.execute('''
@@ -357,19 +345,19 @@ def assign_personnel_to_incident(personnel_id):
     conn.commit()
     conn.close()
     
-    # Broadcast status change
+    # Broadcast status change and assignment, to the previous incident's room as well
+    rooms = personnel_rooms(person, incident_ids=(incident_id,))
     current_app.broadcast_event('personnel_status_updated', {
         'personnel_id': personnel_id,
         'name': person['name'],
         'status': 'responding',
         'assigned_incident_id': incident_id
-    })
+    }, room=rooms)
     
-    # Broadcast assignment
     current_app.broadcast_event('personnel_assigned', {
         'personnel_id': personnel_id,
         'incident_id': incident_id
-    })
+    }, room=rooms)
     
     return jsonify({
         'success': True,
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from database import get_db_connection
+from utils.spatial_utils import parse_proximity_args, within_radius_clause, filter_nearby
 import sqlite3
 import requests
 
@@ -13,6 +14,7 @@ def get_resources():
     status = request.args.get('status')
     type_filter = request.args.get('type')
     is_public = request.args.get('is_public')
+    proximity = parse_proximity_args(request.args)
     
     query = "SELECT * FROM resources"
     params = []
@@ -30,6 +32,11 @@ def get_resources():
         conditions.append("is_public = ?")
         params.append(1 if is_public.lower() == 'true' else 0)
     
+    if proximity:
+        nearby_clause, nearby_params = within_radius_clause('resources', *proximity)
+        conditions.append(nearby_clause)
+        params.extend(nearby_params)
+    
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
         
@@ -37,6 +44,10 @@ def get_resources():
     resources = [dict(row) for row in cursor.fetchall()]
     conn.close()
     
+    # Nearest first when a location is given
+    if proximity:
+        resources = filter_nearby(resources, proximity)
+    
     return jsonify({
         'success': True,
         'count': len(resources),
@@ -50,15 +61,26 @@ def get_public_resources():
     cursor = conn.cursor()
     
     # Fetch only active/deployed resources that are public
-    cursor.execute('''
+    query = '''
         SELECT * FROM resources 
         WHERE is_public = 1 
         AND status != 'maintenance'
-    ''')
+    '''
+    params = []
     
+    proximity = parse_proximity_args(request.args)
+    if proximity:
+        nearby_clause, params = within_radius_clause('resources', *proximity)
+        query += f' AND {nearby_clause}'
+    
+    cursor.execute(query, params)
     resources = [dict(row) for row in cursor.fetchall()]
     conn.close()
     
+    # Nearest first when a location is given
+    if proximity:
+        resources = filter_nearby(resources, proximity)
+    
     return jsonify({
         'success': True,
         'count': len(resources),
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app
 from database import get_db_connection
+from utils.subscription_utils import incident_rooms
 from datetime import datetime
 import requests
 from twilio.twiml.messaging_response import MessagingResponse
@@ -144,7 +145,7 @@ def sms_webhook():
             'location_name': incident_data['location_name'],
             'status': 'active',
             'report_source': 'SMS'
-        })
+        }, room=incident_rooms({'id': incident_id, 'lat': lat, 'lng': lng}))
 
     conn.close()
 
@@ -1,12 +1,293 @@
 from flask import Blueprint, request, jsonify
 from database import get_db_connection
-from datetime import datetime
+from db_writer import db_writer
+from utils.time_utils import utc_timestamp
 import json
-from utils.geo_utils import calculate_distance
+from config import Config
+from utils.dedup_utils import find_duplicate_incident
+from utils.geo_utils import calculate_distance, get_neighbor_cells, grid_cell
+from utils.hydration_utils import attach_children
 from utils.notification_utils import broadcast_incident_notification
 
 sos_mesh_bp = Blueprint('sos_mesh', __name__)
 
+# Map emergency type to incident type and severity
+INCIDENT_TYPE_MAP = {
+    'Medical Emergency': ('medical', 'critical'),
+    'Fire': ('fire', 'critical'),
+    'Accident': ('accident', 'high'),
+    'Crime': ('security', 'high'),
+    'Natural Disaster': ('natural_disaster', 'critical'),
+    'Other': ('other', 'medium')
+}
+
+# Columns of sosmesh_messages returned as a message by the API
+MESSAGE_COLUMNS = 'msg_id, name, latitude, longitude, emergency, timestamp, delivered, received_at'
+
+def format_message(row):
+    """Convert a sosmesh_messages row to the API message shape"""
+    message = dict(row)
+    message['delivered'] = bool(message['delivered'])
+    return message
+
+REQUIRED_FIELDS = ['msg_id', 'name', 'latitude', 'longitude', 'emergency', 'timestamp']
+
+def validate_sos_message(data):
+    """Return an error message for an invalid SOS message, or None"""
+    if not isinstance(data, dict):
+        return 'Message must be a JSON object'
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            return f'Missing required field: {field}'
+    # sosmesh_messages.msg_id is TEXT; a number would never match on redelivery
+    if not isinstance(data['msg_id'], str) or not data['msg_id']:
+        return 'Invalid msg_id'
+    for field in ('latitude', 'longitude'):
+        if isinstance(data[field], bool) or not isinstance(data[field], (int, float)):
+            return f'Invalid {field}'
+    return None
+
+def _reporters(messages, limit=3):
+    """Distinct reporter names for timeline and notification text"""
+    names = list(dict.fromkeys(msg['name'] for msg in messages))
+    if len(names) > limit:
+        return ', '.join(names[:limit]) + f' and {len(names) - limit} more'
+    return ', '.join(names)
+
+def _cluster_messages(messages):
+    """
+    Group messages of the same incident type that lie within the duplicate
+    radius of a cluster's first message, which anchors the cluster
+    """
+    radius = Config.DUPLICATE_INCIDENT_RADIUS_METERS
+    clusters = []
+    clusters_by_cell = {}
+    
+    for data in messages:
+        incident_type, severity = INCIDENT_TYPE_MAP.get(data['emergency'], ('other', 'high'))
+        lat, lng = data['latitude'], data['longitude']
+        
+        nearest = None
+        nearest_distance = None
+        for cell in get_neighbor_cells(lat, lng, radius):
+            for cluster in clusters_by_cell.get((incident_type, cell), []):
+                distance = calculate_distance(lat, lng, cluster['lat'], cluster['lng'])
+                if distance <= radius and (nearest is None or distance < nearest_distance):
+                    nearest = cluster
+                    nearest_distance = distance
+        
+        if nearest is None:
+            nearest = {
+                'type': incident_type,
+                'severity': severity,
+                'lat': lat,
+                'lng': lng,
+                'messages': []
+            }
+            clusters.append(nearest)
+            clusters_by_cell.setdefault((incident_type, grid_cell(lat, lng)), []).append(nearest)
+        
+        nearest['messages'].append(data)
+    
+    return clusters
+
+def _ingest_cluster(cursor, cluster):
+    """
+    Merge a cluster of new messages into an existing nearby incident or
+    create one, with a single timeline row either way
+    """
+    messages = cluster['messages']
+    first = messages[0]
+    count = len(messages)
+    reporters = _reporters(messages)
+    
+    # Check for existing active incidents at similar location (within 500m)
+    duplicate_incident = find_duplicate_incident(
+        cursor, cluster['type'], cluster['lat'], cluster['lng'],
+        columns='id, lat, lng, report_count'
+    )
+    
+    if duplicate_incident:
+        incident_id = duplicate_incident['id']
+        new_count = (duplicate_incident['report_count'] or 1) + count
+        
+        cursor.execute('''
+            UPDATE incidents 
+            SET report_count = ?, 
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (new_count, incident_id))
+        
+        if count == 1:
+            description = f'SOS Mesh report from {first["name"]} - {first["emergency"]}. Total reports: {new_count}'
+        else:
+            description = f'{count} SOS Mesh reports from {reporters} - {first["emergency"]}. Total reports: {new_count}'
+        
+        cursor.execute('''
+            INSERT INTO incident_timeline (incident_id, event_type, description, user_name)
+            VALUES (?, ?, ?, ?)
+        ''', (incident_id, 'sosmesh_report', description, 'SOS Mesh'))
+        
+        status = 'merged'
+        report_count = new_count
+    else:
+        # Create new incident from the first SOS mesh message of the cluster
+        title = f"SOS: {first['emergency']} - {first['name']}"
+        description = f"Emergency reported via SOS Bluetooth Mesh Network.\n\nReporter: {first['name']}\nEmergency Type: {first['emergency']}\nMessage ID: {first['msg_id']}"
+        
+        cursor.execute('''
+            INSERT INTO incidents (
+                title, description, type, severity, status,
+                lat, lng, location_name, report_source, report_count
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            title,
+            description,
+            cluster['type'],
+            cluster['severity'],
+            'active',
+            first['latitude'],
+            first['longitude'],
+            f"SOS Mesh Location ({first['latitude']:.4f}, {first['longitude']:.4f})",
+            'sosmesh',
+            count
+        ))
+        
+        incident_id = cursor.lastrowid
+        
+        cursor.execute('''
+            INSERT INTO incident_timeline (incident_id, event_type, description, user_name)
+            VALUES (?, ?, ?, ?)
+        ''', (
+            incident_id, 
+            'incident_created', 
+            f'Incident created from SOS Mesh: {first["emergency"]} reported by {reporters}', 
+            'SOS Mesh'
+        ))
+        
+        status = 'created'
+        report_count = count
+    
+    cursor.execute('''
+        UPDATE sosmesh_messages SET incident_id = ?
+        WHERE msg_id IN (SELECT value FROM json_each(?))
+    ''', (incident_id, json.dumps([msg['msg_id'] for msg in messages])))
+    
+    return {
+        'status': status,
+        'incident_id': incident_id,
+        'report_count': report_count,
+        'severity': cluster['severity'],
+        'emergency': first['emergency'],
+        'reporters': reporters,
+        'new_reports': count
+    }
+
+def _stored_messages(cursor, msg_ids):
+    """msg_id -> incident_id and report_count for messages already stored"""
+    cursor.execute('''
+        SELECT m.msg_id, m.incident_id, i.report_count
+        FROM sosmesh_messages m
+        LEFT JOIN incidents i ON m.incident_id = i.id
+        WHERE m.msg_id IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(msg_ids),))
+    return {row['msg_id']: dict(row) for row in cursor.fetchall()}
+
+def ingest_sos_batch(cursor, messages):
+    """
+    Ingest validated SOS mesh messages as a single write unit.
+    Messages already stored or repeated within the batch are skipped; the
+    rest are clustered spatially and each cluster is merged into a nearby
+    incident or creates a new one.
+    Returns (results, incidents): a status dict per message in input order,
+    and one summary dict per incident that received messages
+    """
+    stored = _stored_messages(cursor, [data['msg_id'] for data in messages])
+    
+    # First copy of each msg_id wins
+    new_messages = {}
+    for data in messages:
+        if data['msg_id'] not in stored and data['msg_id'] not in new_messages:
+            new_messages[data['msg_id']] = data
+    
+    # Unique msg_id keeps redelivery a no-op even outside the writer; only
+    # rows actually inserted are clustered and counted
+    received_at = utc_timestamp()
+    inserted = []
+    for data in new_messages.values():
+        cursor.execute('''
+            INSERT OR IGNORE INTO sosmesh_messages
+                (msg_id, name, latitude, longitude, emergency, timestamp, delivered, received_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING msg_id
+        ''', (
+            data['msg_id'],
+            data['name'],
+            data['latitude'],
+            data['longitude'],
+            data['emergency'],
+            data['timestamp'],
+            data.get('delivered', False),
+            received_at
+        ))
+        if cursor.fetchone():
+            inserted.append(data)
+    if len(inserted) < len(new_messages):
+        # Stored by a writer outside the queue since the lookup above
+        inserted_ids = {data['msg_id'] for data in inserted}
+        stored.update(_stored_messages(cursor, [msg_id for msg_id in new_messages if msg_id not in inserted_ids]))
+    
+    incidents = []
+    placed = {}
+    for cluster in _cluster_messages(inserted):
+        incident = _ingest_cluster(cursor, cluster)
+        incidents.append(incident)
+        for data in cluster['messages']:
+            placed[data['msg_id']] = incident
+    
+    # Counts after this batch for incidents it touched
+    report_counts = {incident['incident_id']: incident['report_count'] for incident in incidents}
+    
+    results = []
+    reported = set()
+    for data in messages:
+        msg_id = data['msg_id']
+        if msg_id in placed and msg_id not in reported:
+            incident = placed[msg_id]
+            result = {
+                'status': incident['status'],
+                'incident_id': incident['incident_id'],
+                'report_count': incident['report_count']
+            }
+            if incident['status'] == 'created':
+                result['severity'] = incident['severity']
+            reported.add(msg_id)
+        elif msg_id in stored:
+            incident_id = stored[msg_id]['incident_id']
+            result = {
+                'status': 'already_exists',
+                'incident_id': incident_id,
+                'report_count': report_counts.get(incident_id, stored[msg_id]['report_count'])
+            }
+        else:
+            result = {
+                'status': 'already_exists',
+                'incident_id': placed[msg_id]['incident_id'],
+                'report_count': placed[msg_id]['report_count']
+            }
+        results.append(result)
+    
+    return results, incidents
+
+def ingest_sos_message(cursor, data):
+    """
+    Merge one SOS mesh message into an existing nearby incident or create a new one.
+    Runs as a single write unit so concurrent reports cannot race each other.
+    Returns dict with status ('created', 'merged', 'already_exists'), incident_id, report_count
+    """
+    results, _ = ingest_sos_batch(cursor, [data])
+    return results[0]
+
 @sos_mesh_bp.route('/sosmesh', methods=['POST'])
 def receive_sos_mesh():
     """
@@ -27,168 +308,36 @@ def receive_sos_mesh():
     data = request.get_json()
     
     # Validate required fields
-    required_fields = ['msg_id', 'name', 'latitude', 'longitude', 'emergency', 'timestamp']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({
-                'success': False,
-                'error': f'Missing required field: {field}'
-            }), 400
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Map emergency type to incident type and severity
-    emergency_type = data.get('emergency', 'Unknown Emergency')
-    incident_type_map = {
-        'Medical Emergency': ('medical', 'critical'),
-        'Fire': ('fire', 'critical'),
-        'Accident': ('accident', 'high'),
-        'Crime': ('security', 'high'),
-        'Natural Disaster': ('natural_disaster', 'critical'),
-        'Other': ('other', 'medium')
-    }
-    
-    incident_type, severity = incident_type_map.get(
-        emergency_type,
-        ('other', 'high')
-    )
+    error = validate_sos_message(data)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
     
-    # Check for existing active incidents at similar location (within 500m)
-    cursor.execute('''
-        SELECT id, lat, lng, report_count, sosmesh_messages FROM incidents 
-        WHERE type = ? AND status = 'active'
-    ''', (incident_type,))
-    
-    active_incidents = [dict(row) for row in cursor.fetchall()]
-    
-    duplicate_incident = None
-    for incident in active_incidents:
-        distance = calculate_distance(
-            data['latitude'], data['longitude'],
-            incident['lat'], incident['lng']
-        )
-        if distance <= 500:  # 500 meters threshold
-            duplicate_incident = incident
-            break
+    result = db_writer.execute(lambda cursor: ingest_sos_message(cursor, data))
     
-    if duplicate_incident:
-        # Update existing incident with new SOS mesh message
-        new_count = (duplicate_incident['report_count'] or 1) + 1
-        
-        # Parse existing sosmesh_messages or create new list
-        existing_messages = []
-        if duplicate_incident['sosmesh_messages']:
-            try:
-                existing_messages = json.loads(duplicate_incident['sosmesh_messages'])
-            except json.JSONDecodeError:
-                existing_messages = []
-        
-        # Check if this message ID already exists (deduplication)
-        if any(msg.get('msg_id') == data['msg_id'] for msg in existing_messages):
-            conn.close()
-            return jsonify({
-                'success': True,
-                'status': 'already_exists',
-                'incident_id': duplicate_incident['id'],
-                'msg_id': data['msg_id'],
-                'message': 'SOS message already received'
-            }), 200
-        
-        # Add new message to the list
-        existing_messages.append({
+    if result['status'] == 'already_exists':
+        return jsonify({
+            'success': True,
+            'status': 'already_exists',
+            'incident_id': result['incident_id'],
             'msg_id': data['msg_id'],
-            'name': data['name'],
-            'latitude': data['latitude'],
-            'longitude': data['longitude'],
-            'emergency': data['emergency'],
-            'timestamp': data['timestamp'],
-            'delivered': data.get('delivered', False),
-            'received_at': datetime.now().isoformat()
-        })
-        
-        # Update incident
-        cursor.execute('''
-            UPDATE incidents 
-            SET report_count = ?, 
-                sosmesh_messages = ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (new_count, json.dumps(existing_messages), duplicate_incident['id']))
-        
-        # Add timeline event
-        cursor.execute('''
-            INSERT INTO incident_timeline (incident_id, event_type, description, user_name)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            duplicate_incident['id'], 
-            'sosmesh_report', 
-            f'SOS Mesh report from {data["name"]} - {data["emergency"]}. Total reports: {new_count}', 
-            'SOS Mesh'
-        ))
-        
-        conn.commit()
-        conn.close()
-        
+            'message': 'SOS message already received'
+        }), 200
+    
+    if result['status'] == 'merged':
         return jsonify({
             'success': True,
             'status': 'merged',
-            'incident_id': duplicate_incident['id'],
+            'incident_id': result['incident_id'],
             'msg_id': data['msg_id'],
             'message': 'SOS message merged with existing incident',
-            'report_count': new_count
+            'report_count': result['report_count']
         }), 200
     
-    # Create new incident from SOS mesh message
-    title = f"SOS: {data['emergency']} - {data['name']}"
-    description = f"Emergency reported via SOS Bluetooth Mesh Network.\n\nReporter: {data['name']}\nEmergency Type: {data['emergency']}\nMessage ID: {data['msg_id']}"
-    
-    # Create initial sosmesh_messages array
-    initial_message = [{
-        'msg_id': data['msg_id'],
-        'name': data['name'],
-        'latitude': data['latitude'],
-        'longitude': data['longitude'],
-        'emergency': data['emergency'],
-        'timestamp': data['timestamp'],
-        'delivered': data.get('delivered', False),
-        'received_at': datetime.now().isoformat()
-    }]
-    
-    cursor.execute('''
-        INSERT INTO incidents (
-            title, description, type, severity, status,
-            lat, lng, location_name, report_source, report_count, sosmesh_messages
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        title,
-        description,
-        incident_type,
-        severity,
-        'active',
-        data['latitude'],
-        data['longitude'],
-        f"SOS Mesh Location ({data['latitude']:.4f}, {data['longitude']:.4f})",
-        'sosmesh',
-        1,
-        json.dumps(initial_message)
-    ))
-    
-    incident_id = cursor.lastrowid
-    
-    # Add timeline event
-    cursor.execute('''
-        INSERT INTO incident_timeline (incident_id, event_type, description, user_name)
-        VALUES (?, ?, ?, ?)
-    ''', (
-        incident_id, 
-        'incident_created', 
-        f'Incident created from SOS Mesh: {data["emergency"]} reported by {data["name"]}', 
-        'SOS Mesh'
-    ))
-    
-    conn.commit()
-    conn.close()
+    incident_id = result['incident_id']
+    severity = result['severity']
     
     # Broadcast notification
     notification = broadcast_incident_notification(
@@ -213,6 +362,90 @@ def receive_sos_mesh():
     }), 201
 
 
+@sos_mesh_bp.route('/sosmesh/batch', methods=['POST'])
+def receive_sos_mesh_batch():
+    """
+    Receive buffered SOS messages from a mesh gateway in one request.
+    
+    The body is either a JSON array of messages (same structure as
+    POST /sosmesh) or NDJSON with one message per line. All valid messages
+    are committed in one transaction; the response has a status per message
+    in input order and one notification per newly created incident.
+    """
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, list):
+            return jsonify({'success': False, 'error': 'Expected a JSON array of messages'}), 400
+        messages = payload
+    else:
+        # NDJSON: one message per non-empty line
+        messages = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                messages.append(json.loads(line))
+            except json.JSONDecodeError:
+                messages.append(None)
+    
+    if not messages:
+        return jsonify({'success': False, 'error': 'No messages in batch'}), 400
+    
+    if len(messages) > Config.SOSMESH_BATCH_MAX_MESSAGES:
+        return jsonify({
+            'success': False,
+            'error': f'Batch exceeds {Config.SOSMESH_BATCH_MAX_MESSAGES} messages'
+        }), 413
+    
+    results = [None] * len(messages)
+    valid = []
+    for index, data in enumerate(messages):
+        error = validate_sos_message(data) if data is not None else 'Invalid JSON'
+        if error:
+            results[index] = {
+                'index': index,
+                'msg_id': data.get('msg_id') if isinstance(data, dict) else None,
+                'status': 'invalid',
+                'error': error
+            }
+        else:
+            valid.append((index, data))
+    
+    incidents = []
+    if valid:
+        batch = [data for _, data in valid]
+        ingested, incidents = db_writer.execute(lambda cursor: ingest_sos_batch(cursor, batch))
+        for (index, data), result in zip(valid, ingested):
+            results[index] = {'index': index, 'msg_id': data['msg_id'], **result}
+    
+    # One notification per new incident rather than per message
+    notifications = []
+    for incident in incidents:
+        if incident['status'] != 'created':
+            continue
+        severity = incident['severity']
+        notifications.append(broadcast_incident_notification(
+            incident['incident_id'],
+            f"🚨 SOS MESH ALERT: {severity.upper()}",
+            f"{incident['emergency']} - {incident['reporters']}",
+            'critical' if severity == 'critical' else 'high'
+        ))
+    
+    summary = {status: 0 for status in ('created', 'merged', 'already_exists', 'invalid')}
+    for result in results:
+        summary[result['status']] += 1
+    
+    print(f"🚨 RECEIVED SOS MESH BATCH: {len(messages)} messages, {summary}")
+    
+    return jsonify({
+        'success': True,
+        'results': results,
+        'incidents': incidents,
+        'summary': summary,
+        'notifications': notifications
+    }), 200
+
+
 @sos_mesh_bp.route('/sosmesh/messages', methods=['GET'])
 def get_all_sosmesh_messages():
     """Get all SOS mesh messages from all incidents"""
@@ -221,33 +454,24 @@ def get_all_sosmesh_messages():
     
     cursor.execute('''
         SELECT id, title, type, severity, status, lat, lng, 
-               sosmesh_messages, created_at, updated_at, report_count
+               created_at, updated_at, report_count
         FROM incidents 
-        WHERE sosmesh_messages IS NOT NULL
+        WHERE id IN (SELECT incident_id FROM sosmesh_messages)
         ORDER BY updated_at DESC
     ''')
+    incidents = [dict(row) for row in cursor.fetchall()]
     
-    incidents = []
-    for row in cursor.fetchall():
-        incident = dict(row)
-        
-        # Parse sosmesh_messages JSON
-        if incident['sosmesh_messages']:
-            try:
-                incident['sosmesh_messages'] = json.loads(incident['sosmesh_messages'])
-            except json.JSONDecodeError:
-                incident['sosmesh_messages'] = []
-        else:
-            incident['sosmesh_messages'] = []
-        
-        incidents.append(incident)
+    # Messages for every incident in one query, in arrival order
+    attach_children(cursor, incidents, 'sosmesh_messages', 'sosmesh_messages', 'incident_id',
+                    MESSAGE_COLUMNS, order_by='id')
     
     conn.close()
     
     # Flatten all messages for easier access
     all_messages = []
     for incident in incidents:
-        for msg in incident.get('sosmesh_messages', []):
+        incident['sosmesh_messages'] = [format_message(msg) for msg in incident['sosmesh_messages']]
+        for msg in incident['sosmesh_messages']:
             all_messages.append({
                 **msg,
                 'incident_id': incident['id'],
@@ -270,37 +494,27 @@ def get_sosmesh_message(msg_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT id, title, type, severity, status, lat, lng, 
-               sosmesh_messages, created_at, updated_at
-        FROM incidents 
-        WHERE sosmesh_messages IS NOT NULL
-    ''')
+    cursor.execute(f'''
+        SELECT {MESSAGE_COLUMNS}, incident_id FROM sosmesh_messages WHERE msg_id = ?
+    ''', (msg_id,))
+    row = cursor.fetchone()
     
-    for row in cursor.fetchall():
-        incident = dict(row)
-        
-        if incident['sosmesh_messages']:
-            try:
-                messages = json.loads(incident['sosmesh_messages'])
-                for msg in messages:
-                    if msg.get('msg_id') == msg_id:
-                        conn.close()
-                        return jsonify({
-                            'success': True,
-                            'message': msg,
-                            'incident': {
-                                'id': incident['id'],
-                                'title': incident['title'],
-                                'status': incident['status'],
-                                'severity': incident['severity']
-                            }
-                        })
-            except json.JSONDecodeError:
-                continue
+    if not row:
+        conn.close()
+        return jsonify({
+            'success': False,
+            'error': 'Message not found'
+        }), 404
     
+    message = format_message(row)
+    cursor.execute('''
+        SELECT id, title, status, severity FROM incidents WHERE id = ?
+    ''', (message.pop('incident_id'),))
+    incident = cursor.fetchone()
     conn.close()
+    
     return jsonify({
-        'success': False,
-        'error': 'Message not found'
-    }), 404
+        'success': True,
+        'message': message,
+        'incident': dict(incident) if incident else None
+    })
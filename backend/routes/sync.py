@@ -0,0 +1,79 @@
+from flask import Blueprint, request, jsonify
+from config import Config
+from database import get_db_connection
+from location_store import location_store
+from utils.hydration_utils import fetch_by_ids
+from utils.thumbnail_utils import thumbnail_urls
+
+sync_bp = Blueprint('sync', __name__)
+
+# Tables whose changes are recorded in change_log (migration 16)
+SYNC_ENTITIES = ('incidents', 'personnel', 'resources', 'attachments')
+
+def _format(entity, row):
+    """Shape a row like the entity's list endpoint does"""
+    if entity == 'incidents':
+        row['location'] = {'lat': row['lat'], 'lng': row['lng']}
+    elif entity == 'attachments':
+        row['thumbnails'] = thumbnail_urls(row)
+    return row
+
+@sync_bp.route('/sync', methods=['GET'])
+def sync():
+    """
+    Incidents, personnel, resources and attachments changed after a cursor
+    `since` is the `cursor` of the previous response (0 for everything).
+    Each changed row appears once, in its current state; deleted rows are
+    listed by id. Call again while `has_more` is true. `reset` means the
+    cursor is unknown to this database and the client should drop its
+    state and apply the response as a full snapshot.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', Config.SYNC_MAX_CHANGES)), Config.SYNC_MAX_CHANGES)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'since and limit must be integers'}), 400
+    if since < 0 or limit < 1:
+        return jsonify({'success': False, 'error': 'since must be >= 0 and limit >= 1'}), 400
+
+    # Pings this worker holds back reach change_log first
+    location_store.flush()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # A cursor past the newest change comes from another (or a restored) database
+    cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log')
+    reset = since > cursor.fetchone()[0]
+    if reset:
+        since = 0
+
+    cursor.execute('''
+        SELECT seq, entity, entity_id, deleted FROM change_log
+        WHERE seq > ?
+        ORDER BY seq
+        LIMIT ?
+    ''', (since, limit + 1))
+    changes = cursor.fetchall()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    changed = {entity: [] for entity in SYNC_ENTITIES}
+    deleted = {entity: [] for entity in SYNC_ENTITIES}
+    for change in changes:
+        (deleted if change['deleted'] else changed)[change['entity']].append(change['entity_id'])
+
+    response = {'success': True}
+    for entity in SYNC_ENTITIES:
+        # Rows deleted since the change was read show up as a later deletion
+        rows = fetch_by_ids(cursor, entity, changed[entity])
+        response[entity] = [_format(entity, rows[entity_id]) for entity_id in changed[entity] if entity_id in rows]
+    conn.close()
+
+    response.update({
+        'deleted': deleted,
+        'cursor': changes[-1]['seq'] if changes else since,
+        'has_more': has_more,
+        'reset': reset
+    })
+    return jsonify(response)
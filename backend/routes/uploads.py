@@ -0,0 +1,350 @@
+from flask import Blueprint, request, jsonify
+from database import get_db_connection
+from config import Config
+from utils.file_utils import allowed_file, save_assembled_file, sha256_file, stored_file_info, upload_abspath
+from utils.attachment_utils import attach_file
+import hashlib
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+
+uploads_bp = Blueprint('uploads', __name__)
+
+# Partial files, relative to the upload folder (same filesystem as the blob store)
+RESUMABLE_DIR = 'resumable'
+
+# Read size while streaming a chunk body to disk
+CHUNK_READ_SIZE = 64 * 1024
+
+def _part_path(upload_id):
+    return os.path.join(Config.UPLOAD_FOLDER, RESUMABLE_DIR, f'{upload_id}.part')
+
+def _lock_path(upload_id):
+    return _part_path(upload_id) + '.lock'
+
+def _remove_part(upload_id):
+    for path in (_part_path(upload_id), _lock_path(upload_id)):
+        if os.path.exists(path):
+            os.remove(path)
+
+@contextmanager
+def _locked_part(upload_id):
+    """
+    The partial file opened for writing, locked against requests for the same
+    upload in every worker process; None while another request holds it
+    Raises FileNotFoundError once the upload was completed or cancelled
+    Held as an exclusive lock on a side file (like cluster.startup_lock), so
+    it works wherever SQLite does and is released if the worker dies
+    """
+    with open(_part_path(upload_id), 'r+b') as part:
+        lock = sqlite3.connect(_lock_path(upload_id), timeout=0, isolation_level=None)
+        try:
+            try:
+                lock.execute('BEGIN EXCLUSIVE')
+            except sqlite3.OperationalError:
+                yield None
+                return
+            yield part
+        finally:
+            lock.close()
+
+def _get_session(cursor, upload_id):
+    cursor.execute('SELECT * FROM upload_sessions WHERE id = ?', (upload_id,))
+    row = cursor.fetchone()
+    return dict(row) if row else None
+
+def _session_status(session):
+    return {
+        'success': True,
+        'upload_id': session['id'],
+        'incident_id': session['incident_id'],
+        'filename': session['filename'],
+        'size': session['total_size'],
+        'offset': session['received_size'],
+        'status': session['status'],
+        'attachment_id': session['attachment_id'],
+        'chunk_size': Config.RESUMABLE_CHUNK_BYTES
+    }
+
+def _remove_session(upload_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM upload_sessions WHERE id = ?', (upload_id,))
+    conn.commit()
+    conn.close()
+
+    _remove_part(upload_id)
+
+def purge_expired_uploads():
+    """Delete unfinished sessions idle for RESUMABLE_UPLOAD_TTL_SECONDS and their partial files"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        DELETE FROM upload_sessions
+        WHERE status IN ('open', 'completing') AND updated_at < datetime('now', ?)
+        RETURNING id
+    ''', (f'-{Config.RESUMABLE_UPLOAD_TTL_SECONDS} seconds',))
+    expired = [row['id'] for row in cursor.fetchall()]
+    conn.commit()
+    conn.close()
+
+    for upload_id in expired:
+        _remove_part(upload_id)
+
+    if expired:
+        print(f"🧹 Purged {len(expired)} expired resumable upload(s)")
+    return len(expired)
+
+@uploads_bp.route('/incidents/<int:incident_id>/uploads', methods=['POST'])
+def create_upload(incident_id):
+    """
+    Start a resumable upload
+    Body: {filename, size, sha256 (optional, checked on completion)}
+    """
+    data = request.get_json() or {}
+    filename = data.get('filename')
+    size = data.get('size')
+
+    if not filename or not allowed_file(filename):
+        return jsonify({'success': False, 'error': 'Invalid file or file type not allowed'}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'success': False, 'error': 'size must be a positive number of bytes'}), 400
+    if size > Config.RESUMABLE_UPLOAD_MAX_BYTES:
+        return jsonify({
+            'success': False,
+            'error': f'File too large (max {Config.RESUMABLE_UPLOAD_MAX_BYTES} bytes)'
+        }), 413
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT id FROM incidents WHERE id = ?', (incident_id,))
+    if not cursor.fetchone():
+        conn.close()
+        return jsonify({'success': False, 'error': 'Incident not found'}), 404
+
+    upload_id = uuid.uuid4().hex
+    cursor.execute('''
+        INSERT INTO upload_sessions (id, incident_id, filename, total_size, sha256)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (upload_id, incident_id, filename, size, (data.get('sha256') or '').lower() or None))
+    session = _get_session(cursor, upload_id)
+
+    conn.commit()
+    conn.close()
+
+    os.makedirs(os.path.dirname(_part_path(upload_id)), exist_ok=True)
+    open(_part_path(upload_id), 'wb').close()
+
+    return jsonify(_session_status(session)), 201
+
+@uploads_bp.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Get the committed offset of a resumable upload (where to resume from)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    session = _get_session(cursor, upload_id)
+    conn.close()
+
+    if not session:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+
+    response = jsonify(_session_status(session))
+    response.headers['Upload-Offset'] = str(session['received_size'])
+    return response
+
+@uploads_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+def append_upload(upload_id):
+    """
+    Append one chunk (raw request body) at the offset in the Upload-Offset header
+    An X-Chunk-SHA256 header (hex) is verified before the chunk is committed
+    """
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'success': False, 'error': 'Upload-Offset header is required'}), 400
+    expected_checksum = (request.headers.get('X-Chunk-SHA256') or '').lower() or None
+
+    try:
+        with _locked_part(upload_id) as part:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            session = _get_session(cursor, upload_id)
+            conn.close()
+
+            if not session:
+                return jsonify({'success': False, 'error': 'Upload not found'}), 404
+            if session['status'] != 'open':
+                return jsonify({'success': False, 'error': 'Upload is already complete'}), 409
+            if part is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Another request is writing to this upload',
+                    'offset': session['received_size']
+                }), 409
+            if offset != session['received_size']:
+                # The client lost track (e.g. a response never arrived): resume from here
+                return jsonify({
+                    'success': False,
+                    'error': 'Offset does not match the received size',
+                    'offset': session['received_size']
+                }), 409
+
+            remaining = session['total_size'] - offset
+            if request.content_length is not None and request.content_length > remaining:
+                return jsonify({'success': False, 'error': 'Chunk runs past the declared size'}), 413
+
+            # Stream the body to the partial file, hashing as it goes
+            digest = hashlib.sha256()
+            written = 0
+            part.seek(offset)
+            for block in iter(lambda: request.stream.read(CHUNK_READ_SIZE), b''):
+                if written + len(block) > remaining:
+                    part.truncate(offset)
+                    return jsonify({'success': False, 'error': 'Chunk runs past the declared size'}), 413
+                digest.update(block)
+                part.write(block)
+                written += len(block)
+
+            if expected_checksum and digest.hexdigest() != expected_checksum:
+                part.truncate(offset)
+                return jsonify({
+                    'success': False,
+                    'error': 'Chunk checksum mismatch',
+                    'offset': offset
+                }), 400
+
+            # Drop anything a failed earlier attempt left past this chunk
+            part.truncate(offset + written)
+            part.flush()
+            os.fsync(part.fileno())
+
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE upload_sessions SET received_size = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND received_size = ? AND status = 'open'
+            ''', (offset + written, upload_id, offset))
+            updated = cursor.rowcount
+            conn.commit()
+            session = _get_session(cursor, upload_id)
+            conn.close()
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'Upload not found or already complete'}), 404
+
+    if not updated:
+        # Completed or cancelled meanwhile
+        return jsonify({
+            'success': False,
+            'error': 'Upload changed while the chunk was written',
+            'offset': session['received_size'] if session else None
+        }), 409
+
+    response = jsonify({
+        'success': True,
+        'upload_id': upload_id,
+        'offset': offset + written,
+        'size': session['total_size']
+    })
+    response.headers['Upload-Offset'] = str(offset + written)
+    return response
+
+@uploads_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """Move a fully received upload into the blob store and attach it to its incident"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # Only one request, in any worker, gets to complete an upload; one left
+    # completing by a worker that died is taken over after the timeout
+    cursor.execute('''
+        UPDATE upload_sessions SET status = 'completing', updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND received_size = total_size
+          AND (status = 'open' OR (status = 'completing' AND updated_at < datetime('now', ?)))
+    ''', (upload_id, f'-{Config.RESUMABLE_COMPLETE_TIMEOUT_SECONDS} seconds'))
+    claimed = cursor.rowcount
+    conn.commit()
+    session = _get_session(cursor, upload_id)
+    conn.close()
+
+    if not session:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    if not claimed:
+        if session['status'] == 'complete':
+            # Repeated completion (the first response was lost)
+            return jsonify(_session_status(session))
+        if session['status'] == 'completing':
+            return jsonify({'success': False, 'error': 'Upload is being completed'}), 409
+        return jsonify({
+            'success': False,
+            'error': 'Upload is incomplete',
+            'offset': session['received_size']
+        }), 409
+
+    try:
+        if session['filepath'] is None:
+            # Hashed from disk in chunks, then renamed (not copied) into the blob store
+            part_path = _part_path(upload_id)
+            sha256 = sha256_file(part_path)
+            if session['sha256'] and sha256 != session['sha256']:
+                _remove_session(upload_id)
+                return jsonify({'success': False, 'error': 'File checksum mismatch, start the upload again'}), 400
+
+            file_info = save_assembled_file(part_path, session['filename'], sha256)
+
+            # The part file is gone now: a retry resumes from the stored blob
+            conn = get_db_connection()
+            conn.execute('UPDATE upload_sessions SET sha256 = ?, filepath = ? WHERE id = ?',
+                         (sha256, file_info['filepath'], upload_id))
+            conn.commit()
+            conn.close()
+            _remove_part(upload_id)
+        elif os.path.exists(upload_abspath(session['filepath'])):
+            file_info = stored_file_info(session['filename'], session['sha256'], session['filepath'],
+                                         session['total_size'])
+        else:
+            # Unreferenced for longer than the blob store's grace period
+            _remove_session(upload_id)
+            return jsonify({'success': False, 'error': 'Stored file expired, start the upload again'}), 409
+
+        result = attach_file(session['incident_id'], file_info)
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE upload_sessions SET status = 'complete', attachment_id = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (result['attachment_id'], upload_id))
+        conn.commit()
+        conn.close()
+    except Exception:
+        # Let the client retry
+        conn = get_db_connection()
+        conn.execute('''
+            UPDATE upload_sessions SET status = 'open', updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'completing'
+        ''', (upload_id,))
+        conn.commit()
+        conn.close()
+        raise
+
+    return jsonify({**result, 'upload_id': upload_id}), 201
+
+@uploads_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    """Abandon a resumable upload and delete its partial file"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM upload_sessions WHERE id = ? AND status = 'open' RETURNING id", (upload_id,))
+    cancelled = cursor.fetchall()
+    conn.commit()
+    session = None if cancelled else _get_session(cursor, upload_id)
+    conn.close()
+
+    if not cancelled:
+        if not session:
+            return jsonify({'success': False, 'error': 'Upload not found'}), 404
+        return jsonify({'success': False, 'error': 'Upload is already complete'}), 409
+
+    _remove_part(upload_id)
+
+    return jsonify({'success': True, 'upload_id': upload_id})
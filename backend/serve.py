@@ -0,0 +1,136 @@
+"""
+Production server: gevent WSGI workers.
+
+`python app.py` runs the development server (debugger, reloader, a request
+log line per request, and unpatched blocking I/O that stalls every
+connection while one request waits on the database writer or the AI
+model). This entry point monkey-patches the standard library before
+anything imports sqlite3, requests or threading, then serves the app with
+gevent's WSGI server: a greenlet per connection up to
+SERVER_WORKER_CONNECTIONS, the SERVER_BACKLOG listen queue, keep-alive
+connections closed after SERVER_KEEPALIVE_SECONDS idle, WebSockets and
+zero-copy upload bodies (utils/sendfile_utils.py).
+
+With SERVER_WORKERS > 1 this process supervises that many workers on ports
+PORT, PORT+1, ... sharing the database and a Socket.IO message queue
+(SOCKETIO_MESSAGE_QUEUE, 'sqlite' unless set), and restarts any that die.
+Put them behind a load balancer with sticky sessions (see README).
+
+SIGTERM (or Ctrl+C) drains: the worker stops accepting connections,
+disconnects its Socket.IO clients so they reconnect elsewhere, gives
+in-flight requests SERVER_DRAIN_SECONDS to finish, then writes pending
+location and queue state and leaves the cluster.
+
+Usage:
+    python serve.py
+    SERVER_WORKERS=4 PORT=5001 python serve.py
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import signal
+import subprocess
+import sys
+import time
+import gevent
+from gevent.event import Event
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+from config import Config
+from utils.sendfile_utils import sendfile_handler_class
+
+RESTART_DELAY_SECONDS = 1  # Before a worker that died is started again
+
+
+def keepalive_handler_class():
+    """sendfile_handler_class() that closes idle and draining connections"""
+    base = sendfile_handler_class()
+
+    class KeepaliveWSGIHandler(base):
+        def read_requestline(self):
+            # No new requests once the server drains; the client retries elsewhere
+            if self.server.closed:
+                return None
+            self.socket.settimeout(Config.SERVER_KEEPALIVE_SECONDS)
+            try:
+                return super().read_requestline()
+            finally:
+                if self.socket is not None:
+                    self.socket.settimeout(None)
+
+    return KeepaliveWSGIHandler
+
+
+def serve_worker(port):
+    """Run one worker in this process until SIGTERM"""
+    import app as app_module
+
+    app_module.initialize_app()
+    server = WSGIServer(
+        ('0.0.0.0', port),
+        app_module.app,
+        backlog=Config.SERVER_BACKLOG,
+        spawn=Pool(Config.SERVER_WORKER_CONNECTIONS),
+        handler_class=keepalive_handler_class(),
+        log=None
+    )
+
+    def drain():
+        print(f"🛑 Draining worker on port {port} (up to {Config.SERVER_DRAIN_SECONDS} s)...")
+        server.close()
+        app_module.socketio.server.eio.disconnect()
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        gevent.signal_handler(signum, drain)
+
+    print(f"🚀 Worker {os.getpid()} serving on http://0.0.0.0:{port} "
+          f"({Config.SERVER_WORKER_CONNECTIONS} connections, backlog {Config.SERVER_BACKLOG})")
+    # Returns once drained: in-flight requests finish or are cut off after the timeout
+    server.serve_forever(stop_timeout=Config.SERVER_DRAIN_SECONDS)
+    app_module.shutdown_app()
+
+
+def supervise(workers, base_port):
+    """Run `workers` worker processes on consecutive ports until SIGTERM"""
+    env = dict(os.environ, SERVER_WORKERS='1')
+    if not env.get('SOCKETIO_MESSAGE_QUEUE'):
+        env['SOCKETIO_MESSAGE_QUEUE'] = 'sqlite'
+    print(f"🧩 {workers} workers on ports {base_port}-{base_port + workers - 1}, "
+          f"message queue: {env['SOCKETIO_MESSAGE_QUEUE']}")
+
+    def spawn(port):
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=dict(env, PORT=str(port)))
+
+    processes = {base_port + i: spawn(base_port + i) for i in range(workers)}
+    stopping = Event()
+
+    def stop():
+        stopping.set()
+        for process in processes.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        gevent.signal_handler(signum, stop)
+
+    while not stopping.wait(RESTART_DELAY_SECONDS):
+        for port, process in processes.items():
+            if process.poll() is not None:
+                print(f"⚠️ Worker on port {port} exited with {process.returncode}, restarting")
+                processes[port] = spawn(port)
+
+    deadline = time.monotonic() + Config.SERVER_DRAIN_SECONDS + 10
+    for process in processes.values():
+        try:
+            process.wait(max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            process.kill()
+    print("👋 All workers stopped")
+
+
+if __name__ == '__main__':
+    if Config.SERVER_WORKERS > 1:
+        supervise(Config.SERVER_WORKERS, Config.PORT)
+    else:
+        serve_worker(Config.PORT)
@@ -0,0 +1,91 @@
+"""
+Socket.IO message queue for running several worker processes.
+
+Every worker keeps its own Socket.IO clients, so an event emitted by one
+worker must be relayed to the others. python-socketio does that through a
+pub/sub client manager; SOCKETIO_MESSAGE_QUEUE picks the backend:
+
+    unset        single process, no queue
+    sqlite       SQLiteBusManager below, over the shared database
+    redis://...  any URL Flask-SocketIO understands (Redis, Kafka, AMQP...)
+
+SQLiteBusManager needs nothing beyond the database the workers already
+share. Published messages are rows in socket_messages written through the
+single writer; each worker tails the table every SOCKETIO_BUS_POLL_MS and
+deletes rows older than SOCKETIO_BUS_RETENTION_SECONDS. It suits the
+workers of one host; use a real broker across hosts.
+"""
+import json
+import sqlite3
+import time
+import socketio
+from config import Config
+from db_writer import db_writer
+
+PRUNE_EVERY_SECONDS = 10
+
+
+class SQLiteBusManager(socketio.PubSubManager):
+    """Pub/sub client manager over the socket_messages table"""
+
+    name = 'sqlite'
+
+    def __init__(self, channel='socketio', write_only=False, logger=None, json=None,
+                 poll_ms=None, retention_seconds=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.poll_seconds = (poll_ms or Config.SOCKETIO_BUS_POLL_MS) / 1000
+        self.retention_seconds = retention_seconds or Config.SOCKETIO_BUS_RETENTION_SECONDS
+
+    def emit(self, event, data, namespace=None, room=None, skip_sid=None, callback=None, to=None, **kwargs):
+        # Replies to a client of this worker need not go round the queue
+        target = to or room
+        if isinstance(target, str) and self.is_connected(target, namespace or '/'):
+            kwargs['ignore_queue'] = True
+        return super().emit(event, data, namespace=namespace, room=room, skip_sid=skip_sid,
+                            callback=callback, to=to, **kwargs)
+
+    def _publish(self, data):
+        future = db_writer.submit('''
+            INSERT INTO socket_messages (channel, payload, created_at) VALUES (?, ?, ?)
+        ''', (self.channel, json.dumps(data), time.time()))
+        future.add_done_callback(self._report_failure)
+
+    @staticmethod
+    def _report_failure(future):
+        if future.exception():
+            print(f"⚠️ Socket message not published: {future.exception()}")
+
+    def _listen(self):
+        conn = sqlite3.connect(Config.DATABASE_PATH, timeout=Config.DB_BUSY_TIMEOUT_MS / 1000)
+        try:
+            # Only messages published after this worker started are relayed
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM socket_messages').fetchone()[0]
+            next_prune = time.monotonic()
+            while True:
+                rows = conn.execute('''
+                    SELECT id, payload FROM socket_messages
+                    WHERE id > ? AND channel = ?
+                    ORDER BY id
+                ''', (last_id, self.channel)).fetchall()
+                conn.commit()  # End the read so WAL checkpoints are not held back
+                for message_id, payload in rows:
+                    last_id = message_id
+                    yield payload
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + PRUNE_EVERY_SECONDS
+                    db_writer.submit('DELETE FROM socket_messages WHERE created_at < ?',
+                                     (time.time() - self.retention_seconds,))
+                if not rows:
+                    self.server.sleep(self.poll_seconds)
+        finally:
+            conn.close()
+
+
+def message_queue_options(url=None, channel='socketio'):
+    """SocketIO() keyword arguments for the configured message queue"""
+    url = url if url is not None else Config.SOCKETIO_MESSAGE_QUEUE
+    if not url:
+        return {}
+    if url == SQLiteBusManager.name:
+        return {'client_manager': SQLiteBusManager(channel=channel)}
+    return {'message_queue': url, 'channel': channel}
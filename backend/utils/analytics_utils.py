@@ -1,5 +1,9 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from config import Config
 from database import get_db_connection
+from analytics_rollups import SKETCH_METRICS, sketch_window_sql
+from utils.result_cache_utils import analytics_cache
+from utils.sketch_utils import SKETCH_QUANTILES, DDSketch
 
 def calculate_response_time(incident_id):
     """
@@ -9,114 +13,224 @@ def calculate_response_time(incident_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Get incident creation time
-    cursor.execute('SELECT created_at FROM incidents WHERE id = ?', (incident_id,))
-    incident = cursor.fetchone()
-    
-    if not incident:
-        return None
-    
-    # Get first "arrived" timeline event
+    # First arrival is kept up to date by the analytics rollup triggers
     cursor.execute('''
-        SELECT created_at FROM incident_timeline 
-        WHERE incident_id = ? AND event_type IN ('personnel_arrived', 'status_update')
-        ORDER BY created_at ASC LIMIT 1
+        SELECT (julianday(r.first_response_at) - julianday(i.created_at)) * 24 * 60 AS response_time
+        FROM incidents i
+        JOIN incident_first_response r ON r.incident_id = i.id
+        WHERE i.id = ?
     ''', (incident_id,))
     
-    arrival = cursor.fetchone()
+    row = cursor.fetchone()
     conn.close()
     
-    if not arrival:
+    if not row or row['response_time'] is None:
         return None
     
-    created = datetime.fromisoformat(incident['created_at'])
-    arrived = datetime.fromisoformat(arrival['created_at'])
-    
-    response_time = (arrived - created).total_seconds() / 60
-    return round(response_time, 2)
+    return round(row['response_time'], 2)
 
 def get_incident_statistics(time_period_days=30):
     """
     Get comprehensive incident statistics
+    Read from the rollups, so the window starts on the hour
     """
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cutoff_date = datetime.now() - timedelta(days=time_period_days)
-    
-    # Total incidents
+    # Hourly rows up to the first midnight in the window, daily rows after it
+    window = f'-{time_period_days} days'
     cursor.execute('''
-        SELECT COUNT(*) as total,
-               SUM(CASE WHEN status = 'active' THEN 1 ELSE 0 END) as active,
-               SUM(CASE WHEN status = 'resolved' THEN 1 ELSE 0 END) as resolved,
-               SUM(CASE WHEN severity = 'critical' THEN 1 ELSE 0 END) as critical
-        FROM incidents
-        WHERE created_at >= ?
-    ''', (cutoff_date.isoformat(),))
+        SELECT type, severity, status,
+               SUM(incidents) AS incidents,
+               SUM(resolved) AS resolved,
+               SUM(resolution_minutes) AS resolution_minutes,
+               SUM(responded) AS responded,
+               SUM(response_minutes) AS response_minutes
+        FROM incident_rollups
+        WHERE (granularity = 'hour'
+               AND bucket >= strftime('%Y-%m-%d %H:00:00', 'now', ?)
+               AND bucket < strftime('%Y-%m-%d 00:00:00', 'now', ?, '+1 day'))
+           OR (granularity = 'day'
+               AND bucket >= strftime('%Y-%m-%d 00:00:00', 'now', ?, '+1 day'))
+        GROUP BY type, severity, status
+    ''', (window, window, window))
+    
+    rows = cursor.fetchall()
+    conn.close()
     
-    incident_stats = dict(cursor.fetchone())
+    incident_stats = {'total': 0, 'active': 0, 'resolved': 0, 'critical': 0}
+    by_type = {}
+    by_severity = {}
+    resolved = resolution_minutes = responded = response_minutes = 0
+    for row in rows:
+        count = row['incidents']
+        incident_stats['total'] += count
+        if row['status'] in ('active', 'resolved'):
+            incident_stats[row['status']] += count
+        if row['severity'] == 'critical':
+            incident_stats['critical'] += count
+        by_type[row['type']] = by_type.get(row['type'], 0) + count
+        by_severity[row['severity']] = by_severity.get(row['severity'], 0) + count
+        resolved += row['resolved']
+        resolution_minutes += row['resolution_minutes']
+        responded += row['responded']
+        response_minutes += row['response_minutes']
+    
+    incidents_by_type = [{'type': t, 'count': n} for t, n in sorted(by_type.items(), key=lambda item: -item[1])]
+    incidents_by_severity = [{'severity': s, 'count': n} for s, n in by_severity.items()]
     
-    # Incidents by type
-    cursor.execute('''
-        SELECT type, COUNT(*) as count
-        FROM incidents
-        WHERE created_at >= ?
-        GROUP BY type
-        ORDER BY count DESC
-    ''', (cutoff_date.isoformat(),))
+    return {
+        'incident_stats': incident_stats,
+        'incidents_by_type': incidents_by_type,
+        'incidents_by_severity': incidents_by_severity,
+        'avg_response_time_minutes': round(response_minutes / responded, 2) if responded else 0,
+        'avg_resolution_time_minutes': round(resolution_minutes / resolved, 2) if resolved else 0,
+        'response_time_percentiles': _percentiles(get_duration_distribution('response', days=time_period_days)),
+        'resolution_time_percentiles': _percentiles(get_duration_distribution('resolution', days=time_period_days)),
+        'time_period_days': time_period_days
+    }
+
+def _percentiles(distribution):
+    return {name: distribution['overall'][name] for name in SKETCH_QUANTILES}
+
+DISTRIBUTION_GROUPS = ('type', 'severity')
+
+def get_duration_distribution(metric, start=None, end=None, days=30,
+                              incident_type=None, severity=None, group_by=None):
+    """
+    Percentiles (p50/p90/p99, within 1% relative error) and histogram of
+    response or resolution times in minutes, for incidents created in
+    [start, end) (UTC, hour resolution; default the last `days` days)
+    Reads stored sketches, so the cost does not grow with the window or incidents
+    """
+    if metric not in SKETCH_METRICS:
+        raise ValueError(f'metric must be one of: {", ".join(SKETCH_METRICS)}')
+    if group_by not in (None,) + DISTRIBUTION_GROUPS:
+        raise ValueError(f'group_by must be one of: {", ".join(DISTRIBUTION_GROUPS)}')
     
-    incidents_by_type = [dict(row) for row in cursor.fetchall()]
+    end = end or datetime.now(timezone.utc).replace(tzinfo=None)
+    start = start or end - timedelta(days=days)
     
-    # Incidents by severity
-    cursor.execute('''
-        SELECT severity, COUNT(*) as count
-        FROM incidents
-        WHERE created_at >= ?
-        GROUP BY severity
-    ''', (cutoff_date.isoformat(),))
+    query, params = sketch_window_sql(metric, start, end, incident_type or None, severity or None, group_by)
     
-    incidents_by_severity = [dict(row) for row in cursor.fetchall()]
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    conn.close()
     
-    # Average response time
-    cursor.execute('''
-        SELECT AVG(
-            (julianday(t.created_at) - julianday(i.created_at)) * 24 * 60
-        ) as avg_response_time
-        FROM incidents i
-        JOIN incident_timeline t ON i.id = t.incident_id
-        WHERE i.created_at >= ?
-        AND t.event_type IN ('personnel_arrived', 'status_update')
-        AND t.created_at = (
-            SELECT MIN(created_at) FROM incident_timeline 
-            WHERE incident_id = i.id 
-            AND event_type IN ('personnel_arrived', 'status_update')
-        )
-    ''', (cutoff_date.isoformat(),))
-    
-    avg_response = cursor.fetchone()
-    avg_response_time = round(avg_response['avg_response_time'], 2) if avg_response['avg_response_time'] else 0
+    overall = DDSketch()
+    groups = {}
+    for row in rows:
+        overall.add_key(row['sketch_key'], row['count'])
+        if group_by:
+            groups.setdefault(row['grp'], DDSketch()).add_key(row['sketch_key'], row['count'])
+    
+    distribution = {
+        'metric': metric,
+        'start': start.replace(tzinfo=timezone.utc).isoformat(),
+        'end': end.replace(tzinfo=timezone.utc).isoformat(),
+        'overall': overall.summary()
+    }
+    if group_by:
+        distribution['group_by'] = group_by
+        distribution['groups'] = {name: sketch.summary() for name, sketch in sorted(groups.items())}
+    return distribution
 
-    # Average resolution time (Creation to Resolved status)
-    cursor.execute('''
-        SELECT AVG(
-            (julianday(resolved_at) - julianday(created_at)) * 24 * 60
-        ) as avg_resolution_time
-        FROM incidents
-        WHERE created_at >= ? AND status = 'resolved' AND resolved_at IS NOT NULL
-    ''', (cutoff_date.isoformat(),))
-    
-    avg_res = cursor.fetchone()
-    avg_resolution_time = round(avg_res['avg_resolution_time'], 2) if avg_res['avg_resolution_time'] else 0
+# Trend bucket widths in seconds, narrowest first; downsampling moves down this list
+TIMESERIES_BUCKETS = {
+    '1m': 60, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '3h': 3 * 3600, '6h': 6 * 3600, '12h': 12 * 3600,
+    '1d': 86400, '7d': 7 * 86400
+}
+TIMESERIES_GROUPS = ('type', 'severity', 'status')
+TIMESERIES_METRICS = ('incidents', 'resolved', 'responded', 'avg_response_minutes', 'avg_resolution_minutes')
+
+# Rollup granularity read for a bucket width: the coarsest that divides it
+_ROLLUP_SECONDS = (('day', 86400), ('hour', 3600), ('minute', 60))
+
+def _timeseries_value(metric, row):
+    if metric == 'avg_response_minutes':
+        return round(row['response_minutes'] / row['responded'], 2) if row['responded'] else None
+    if metric == 'avg_resolution_minutes':
+        return round(row['resolution_minutes'] / row['resolved'], 2) if row['resolved'] else None
+    return row[metric]
+
+def get_incident_timeseries(bucket='1h', start=None, end=None, days=7, metric='incidents',
+                            group_by=None, incident_type=None, severity=None):
+    """
+    Trend of incidents created per bucket in [start, end) (UTC; default the
+    last `days` days), as columns: `timestamps` (bucket starts, Unix seconds,
+    aligned to the bucket width) and one array of `metric` per group in
+    `series` ('all' without group_by). Ranges needing more than
+    TIMESERIES_MAX_POINTS buckets get the next wider bucket
+    """
+    if bucket not in TIMESERIES_BUCKETS:
+        raise ValueError(f'bucket must be one of: {", ".join(TIMESERIES_BUCKETS)}')
+    if metric not in TIMESERIES_METRICS:
+        raise ValueError(f'metric must be one of: {", ".join(TIMESERIES_METRICS)}')
+    if group_by not in (None,) + TIMESERIES_GROUPS:
+        raise ValueError(f'group_by must be one of: {", ".join(TIMESERIES_GROUPS)}')
+    
+    end = end or datetime.now(timezone.utc).replace(tzinfo=None)
+    start = start or end - timedelta(days=days)
+    if start >= end:
+        raise ValueError('start must be before end')
+    start_epoch = int(start.replace(tzinfo=timezone.utc).timestamp())
+    end_epoch = int(end.replace(tzinfo=timezone.utc).timestamp())
+    
+    widths = list(TIMESERIES_BUCKETS.items())
+    for name, width in widths[list(TIMESERIES_BUCKETS).index(bucket):]:
+        first = start_epoch // width * width
+        last = -(-end_epoch // width) * width
+        if (last - first) // width <= Config.TIMESERIES_MAX_POINTS:
+            break
+    else:
+        raise ValueError(f'range is too long for {Config.TIMESERIES_MAX_POINTS} buckets of {name}')
+    granularity = next(g for g, seconds in _ROLLUP_SECONDS if width % seconds == 0)
+    
+    def bucket_text(epoch):
+        return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    
+    filters, params = '', [first, width, granularity, bucket_text(first), bucket_text(last)]
+    if incident_type:
+        filters += ' AND type = ?'
+        params.append(incident_type)
+    if severity:
+        filters += ' AND severity = ?'
+        params.append(severity)
     
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT (unixepoch(bucket) - ?) / ? AS slot, {group_by or "'all'"} AS grp,
+               SUM(incidents) AS incidents,
+               SUM(resolved) AS resolved,
+               SUM(resolution_minutes) AS resolution_minutes,
+               SUM(responded) AS responded,
+               SUM(response_minutes) AS response_minutes
+        FROM incident_rollups
+        WHERE granularity = ? AND bucket >= ? AND bucket < ?{filters}
+        GROUP BY slot, grp
+    ''', params)
+    rows = cursor.fetchall()
     conn.close()
     
+    points = (last - first) // width
+    empty = None if metric.startswith('avg_') else 0
+    series = {} if group_by else {'all': [empty] * points}
+    for row in rows:
+        values = series.setdefault(row['grp'], [empty] * points)
+        values[row['slot']] = _timeseries_value(metric, row)
+    
     return {
-        'incident_stats': incident_stats,
-        'incidents_by_type': incidents_by_type,
-        'incidents_by_severity': incidents_by_severity,
-        'avg_response_time_minutes': avg_response_time,
-        'avg_resolution_time_minutes': avg_resolution_time,
-        'time_period_days': time_period_days
+        'bucket': name,
+        'bucket_seconds': width,
+        'downsampled': name != bucket,
+        'metric': metric,
+        'group_by': group_by,
+        'timestamps': list(range(first, last, width)),
+        'series': dict(sorted(series.items()))
     }
 
 def get_personnel_efficiency():
@@ -208,12 +322,17 @@ def get_resource_utilization():
         'utilization_rate': round(utilization_rate, 2)
     }
 
-def get_dashboard_analytics():
-    """
-    Get comprehensive analytics for dashboard
-    """
+def _compute_dashboard_analytics():
     return {
         'incidents': get_incident_statistics(),
         'personnel': get_personnel_efficiency(),
         'resources': get_resource_utilization()
     }
+
+def get_dashboard_analytics():
+    """
+    Get comprehensive analytics for dashboard
+    Shared between dashboards through analytics_cache; writes invalidate it
+    """
+    return analytics_cache.get('dashboard', _compute_dashboard_analytics,
+                               tags=('incidents', 'personnel', 'resources'))
@@ -0,0 +1,82 @@
+from database import get_db_connection
+from verification_queue import verification_queue, record_verification, CACHE_SOURCE_NAME
+from blob_store import get_blob
+from utils.file_utils import dhash_image, upload_abspath
+from utils.thumbnail_utils import schedule_derivatives, thumbnail_urls
+from utils.verification_cache_utils import lookup_cached_verification
+
+def attach_file(incident_id, file_info):
+    """
+    Record a stored file as an incident attachment
+    Images are verified (from the cache or through the queue) and thumbnails
+    are scheduled once the attachment is committed
+    Returns the upload response body
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    # Known content: reuse the perceptual hash stored with its blob
+    if file_info['file_type'] == 'image' and not file_info['dhash']:
+        blob = get_blob(cursor, file_info['sha256'])
+        file_info['dhash'] = (blob and blob['dhash']) or dhash_image(upload_abspath(file_info['filepath']))
+    
+    cursor.execute('''
+        INSERT INTO attachments (incident_id, filename, filepath, file_type, file_size, sha256, dhash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        incident_id,
+        file_info['filename'],
+        file_info['filepath'],
+        file_info['file_type'],
+        file_info['file_size'],
+        file_info['sha256'],
+        file_info['dhash']
+    ))
+    
+    attachment_id = cursor.lastrowid
+    
+    # Verify images: reuse a cached result for the same (or a near-identical)
+    # image, otherwise queue it for the bounded verification pool
+    verification_job_id = None
+    verification = None
+    if file_info['file_type'] == 'image':
+        cursor.execute('SELECT type FROM incidents WHERE id = ?', (incident_id,))
+        incident = cursor.fetchone()
+        cached = None
+        if incident:
+            cached = lookup_cached_verification(cursor, file_info['sha256'], file_info['dhash'], incident['type'])
+        
+        if cached:
+            record_verification(cursor, incident_id, cached['result'], CACHE_SOURCE_NAME, cached)
+            verification = {
+                **cached['result'],
+                'cache_match': cached['match'],
+                'hamming_distance': cached['hamming_distance']
+            }
+        else:
+            verification_job_id = verification_queue.enqueue(
+                cursor, incident_id, attachment_id, file_info['filepath']
+            )
+
+    # Add timeline event for the upload itself
+    cursor.execute('''
+        INSERT INTO incident_timeline (incident_id, event_type, description, user_name)
+        VALUES (?, ?, ?, ?)
+    ''', (incident_id, 'attachment_added', f'File uploaded: {file_info["filename"]}', 'User'))
+    
+    conn.commit()
+    conn.close()
+    
+    if verification_job_id:
+        verification_queue.wake()
+    schedule_derivatives(attachment_id, file_info['filepath'], file_info['file_type'])
+    
+    return {
+        'success': True,
+        'attachment_id': attachment_id,
+        'thumbnails': thumbnail_urls({'id': attachment_id, 'file_type': file_info['file_type']}),
+        'file_info': file_info,
+        'verification_job_id': verification_job_id,
+        'verification': verification
+    }
+
@@ -0,0 +1,38 @@
+import json
+from config import Config
+from utils.geo_utils import distances_from, get_neighbor_cells
+
+def find_duplicate_incident(cursor, incident_type, lat, lng, columns='*', since=None,
+                            radius_meters=Config.DUPLICATE_INCIDENT_RADIUS_METERS):
+    """
+    Find the nearest active incident of the same type within radius_meters
+    Only incidents in the grid cells around the point are considered
+    `columns` must include lat and lng; returns a dict or None
+    """
+    cells = get_neighbor_cells(lat, lng, radius_meters)
+    
+    query = f'''
+        SELECT {columns} FROM incidents
+        WHERE type = ? AND status = 'active'
+        AND grid_cell IN (SELECT value FROM json_each(?))
+    '''
+    params = [incident_type, json.dumps(cells)]
+    
+    if since:
+        query += ' AND created_at >= ?'
+        params.append(since)
+    
+    cursor.execute(query, params)
+    candidates = cursor.fetchall()
+    distances = distances_from(lat, lng,
+                               [row['lat'] for row in candidates],
+                               [row['lng'] for row in candidates])
+    
+    duplicate = None
+    nearest = None
+    for row, distance in zip(candidates, distances):
+        if distance <= radius_meters and (nearest is None or distance < nearest):
+            duplicate = dict(row)
+            nearest = distance
+    
+    return duplicate
@@ -1,4 +1,6 @@
+import hashlib
 import os
+from PIL import Image
 from werkzeug.utils import secure_filename
 from config import Config
 
@@ -7,52 +9,110 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
-def save_file(file, incident_id):
+# Read size for streaming hashes
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def sha256_file(filepath):
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def dhash_image(filepath, hash_size=8):
     """
-    Save uploaded file and return file info
+    Perceptual difference hash of an image as a 16-char hex string
+    Visually similar images (resized, recompressed) differ in few bits
+    Returns None if the image cannot be read
     """
-    if not file or file.filename == '':
-        return None
-    
-    if not allowed_file(file.filename):
+    try:
+        with Image.open(filepath) as img:
+            img.draft('L', (hash_size * 4, hash_size * 4))  # Fast JPEG downscale
+            small = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+            pixels = list(small.getdata())
+    except Exception as e:
+        print(f"Error hashing image: {e}")
         return None
     
-    # Create incident-specific folder
-    incident_folder = os.path.join(Config.UPLOAD_FOLDER, f'incident_{incident_id}')
-    os.makedirs(incident_folder, exist_ok=True)
-    
-    # Secure filename and add timestamp to avoid conflicts
-    from datetime import datetime
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    original_filename = secure_filename(file.filename)
-    filename = f"{timestamp}_{original_filename}"
-    
-    filepath = os.path.join(incident_folder, filename)
-    file.save(filepath)
-    
-    # Get file size
-    file_size = os.path.getsize(filepath)
-    
-    # Determine file type
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left < right)
+    return f'{value:0{hash_size * hash_size // 4}x}'
+
+def hamming_distance(hash1, hash2):
+    """Number of differing bits between two hex hashes"""
+    return (int(hash1, 16) ^ int(hash2, 16)).bit_count()
+
+def file_type_for(filename):
+    """Attachment type (image, video, document, other) from the file extension"""
     file_ext = filename.rsplit('.', 1)[1].lower()
     if file_ext in ['png', 'jpg', 'jpeg', 'gif']:
-        file_type = 'image'
+        return 'image'
     elif file_ext in ['mp4', 'mov']:
-        file_type = 'video'
+        return 'video'
     elif file_ext == 'pdf':
-        file_type = 'document'
-    else:
-        file_type = 'other'
+        return 'document'
+    return 'other'
+
+def _file_info(filename, blob):
+    """File info for a stored blob, as returned by save_file"""
+    file_type = file_type_for(filename)
     
-    relative_path = f'uploads/incident_{incident_id}/{filename}'
+    # The perceptual hash of known content is already on its blob row
+    dhash = None
+    if file_type == 'image' and not blob['deduplicated']:
+        dhash = dhash_image(upload_abspath(blob['filepath']))
     
     return {
-        'filename': original_filename,
-        'filepath': relative_path,
+        'filename': secure_filename(filename),
+        'filepath': blob['filepath'],
         'file_type': file_type,
-        'file_size': file_size
+        'file_size': blob['file_size'],
+        'sha256': blob['sha256'],
+        'dhash': dhash,
+        'deduplicated': blob['deduplicated']
     }
 
+def save_file(file):
+    """
+    Save uploaded file into the content-addressed blob store and return file info
+    Identical content is stored once; `deduplicated` is True when it already was
+    """
+    if not file or file.filename == '':
+        return None
+    
+    if not allowed_file(file.filename):
+        return None
+    
+    from blob_store import write_blob
+    
+    # Hash while streaming to disk; nothing is written twice for known content
+    blob = write_blob(file.stream, file.filename.rsplit('.', 1)[1].lower())
+    return _file_info(file.filename, blob)
+
+def save_assembled_file(path, filename, sha256=None):
+    """
+    Move a fully received resumable upload into the blob store and return file info
+    The file is renamed into place and hashed from disk in chunks (unless
+    `sha256` is given), never loaded into memory
+    """
+    from blob_store import import_blob
+    
+    blob = import_blob(path, filename.rsplit('.', 1)[1].lower(), sha256)
+    return _file_info(filename, blob)
+
+def stored_file_info(filename, sha256, filepath, file_size):
+    """File info for a file already moved into the blob store"""
+    return _file_info(filename, {'sha256': sha256, 'filepath': filepath, 'file_size': file_size, 'deduplicated': False})
+
+def upload_abspath(relative_path):
+    """Absolute path of an `uploads/...` path as stored in attachments.filepath"""
+    return os.path.join(Config.UPLOAD_FOLDER, os.path.relpath(relative_path, 'uploads'))
+
 def delete_file(filepath):
     """Delete a file from the filesystem"""
     try:
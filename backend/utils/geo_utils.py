@@ -1,11 +1,24 @@
 import math
 
+try:
+    import numpy as np
+except ImportError:
+    # Batch distances fall back to a pure-Python loop
+    np = None
+
+# Grid used to bucket incidents spatially (0.01° ≈ 1.1 km of latitude).
+# The incidents.grid_cell column is generated from this value in migrations,
+# so changing it requires a new migration.
+GRID_CELLS_PER_DEGREE = 100
+
+EARTH_RADIUS_METERS = 6371000
+
 def calculate_distance(lat1, lng1, lat2, lng2):
     """
     Calculate distance between two coordinates using Haversine formula
     Returns distance in meters
     """
-    R = 6371000  # Earth's radius in meters
+    R = EARTH_RADIUS_METERS
     
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
@@ -18,6 +31,40 @@ def calculate_distance(lat1, lng1, lat2, lng2):
     distance = R * c
     return distance
 
+def _haversine_arrays(lat1, lng1, lat2, lng2):
+    """Haversine over broadcastable NumPy arrays of degrees"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(lng2 - lng1)
+    
+    a = np.sin(delta_phi/2)**2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda/2)**2
+    # Clip rounding error so sqrt(1-a) stays real for antipodal points
+    a = np.clip(a, 0.0, 1.0)
+    return EARTH_RADIUS_METERS * 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+
+def distances_from(lat, lng, lats, lngs):
+    """
+    Distances in meters from one point to many points
+    Returns a NumPy array (a list without NumPy) aligned with lats/lngs
+    """
+    if np is None:
+        return [calculate_distance(lat, lng, lat2, lng2) for lat2, lng2 in zip(lats, lngs)]
+    
+    return _haversine_arrays(lat, lng, np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float))
+
+def distance_matrix(lats1, lngs1, lats2, lngs2):
+    """
+    Distances in meters between every point of one set and every point of another
+    Returns a len(lats1) x len(lats2) NumPy array (list of lists without NumPy)
+    """
+    if np is None:
+        return [distances_from(lat, lng, lats2, lngs2) for lat, lng in zip(lats1, lngs1)]
+    
+    lats1 = np.asarray(lats1, dtype=float)[:, np.newaxis]
+    lngs1 = np.asarray(lngs1, dtype=float)[:, np.newaxis]
+    return _haversine_arrays(lats1, lngs1, np.asarray(lats2, dtype=float), np.asarray(lngs2, dtype=float))
+
 def is_within_radius(lat1, lng1, lat2, lng2, radius_meters):
     """
     Check if a point is within a given radius of another point
@@ -30,11 +77,14 @@ def get_nearby_items(user_lat, user_lng, items, radius_meters):
     Filter items that are within radius of user location
     Items should have 'lat' and 'lng' keys
     """
+    distances = distances_from(user_lat, user_lng,
+                               [item['lat'] for item in items],
+                               [item['lng'] for item in items])
+    
     nearby = []
-    for item in items:
-        if is_within_radius(user_lat, user_lng, item['lat'], item['lng'], radius_meters):
-            distance = calculate_distance(user_lat, user_lng, item['lat'], item['lng'])
-            item['distance'] = round(distance, 2)
+    for item, distance in zip(items, distances):
+        if distance <= radius_meters:
+            item['distance'] = round(float(distance), 2)
             nearby.append(item)
     
     # Sort by distance
@@ -46,11 +96,22 @@ def check_geofence_breach(lat, lng, geofence_zones):
     Check if a location breaches any geofence zones
     Returns list of breached zones
     """
-    breached_zones = []
-    for zone in geofence_zones:
-        if is_within_radius(lat, lng, zone['lat'], zone['lng'], zone['radius']):
-            breached_zones.append(zone)
-    return breached_zones
+    distances = distances_from(lat, lng,
+                               [zone['lat'] for zone in geofence_zones],
+                               [zone['lng'] for zone in geofence_zones])
+    
+    return [
+        zone for zone, distance in zip(geofence_zones, distances)
+        if distance <= zone['radius']
+    ]
+
+def lng_degrees(lat, meters):
+    """Approximate longitude span in degrees of a distance at a given latitude"""
+    return meters / (111000 * math.cos(math.radians(lat)))
+
+def lng_degrees_sql(lat, meters):
+    """lng_degrees() as an SQL expression, for the geofence R*Tree triggers"""
+    return f'({meters}) / (111000 * cos(radians({lat})))'
 
 def get_bounding_box(lat, lng, radius_meters):
     """
@@ -59,7 +120,7 @@ def get_bounding_box(lat, lng, radius_meters):
     """
     # Approximate degrees per meter
     lat_degree = radius_meters / 111000
-    lng_degree = radius_meters / (111000 * math.cos(math.radians(lat)))
+    lng_degree = lng_degrees(lat, radius_meters)
     
     return (
         lat - lat_degree,
@@ -67,3 +128,22 @@ def get_bounding_box(lat, lng, radius_meters):
         lng - lng_degree,
         lng + lng_degree
     )
+
+def grid_cell(lat, lng):
+    """
+    Get the grid cell key ("row:col") containing a coordinate
+    Must match the incidents.grid_cell generated column
+    """
+    row = math.floor(lat * GRID_CELLS_PER_DEGREE)
+    col = math.floor(lng * GRID_CELLS_PER_DEGREE)
+    return f'{row}:{col}'
+
+def get_neighbor_cells(lat, lng, radius_meters):
+    """
+    Get keys of all grid cells intersecting the radius around a point
+    For radii below the cell size this is the surrounding 3x3 block
+    """
+    min_lat, max_lat, min_lng, max_lng = get_bounding_box(lat, lng, radius_meters)
+    rows = range(math.floor(min_lat * GRID_CELLS_PER_DEGREE), math.floor(max_lat * GRID_CELLS_PER_DEGREE) + 1)
+    cols = range(math.floor(min_lng * GRID_CELLS_PER_DEGREE), math.floor(max_lng * GRID_CELLS_PER_DEGREE) + 1)
+    return [f'{row}:{col}' for row in rows for col in cols]
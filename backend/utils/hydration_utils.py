@@ -0,0 +1,111 @@
+"""
+Batched hydration of related rows.
+
+Instead of running one query per parent row (N+1), each relation is fetched
+once for the whole page with ``IN (...)`` and grouped in memory. The id list
+is bound as a single JSON array so the query count does not depend on the
+page size or SQLite's bound-parameter limit.
+"""
+import json
+from utils.thumbnail_utils import thumbnail_urls
+
+def _unique_ids(ids):
+    """Return distinct, non-null ids preserving order"""
+    seen = set()
+    unique = []
+    for value in ids:
+        if value is not None and value not in seen:
+            seen.add(value)
+            unique.append(value)
+    return unique
+
+def fetch_grouped(cursor, table, key, ids, columns='*', order_by=None):
+    """
+    Fetch rows of `table` whose `key` column is in `ids`
+    Returns {id: [row_dict, ...]} using a single query
+    """
+    ids = _unique_ids(ids)
+    grouped = {value: [] for value in ids}
+    if not ids:
+        return grouped
+
+    query = f'''
+        SELECT {key} AS _hydrate_key, {columns} FROM {table}
+        WHERE {key} IN (SELECT value FROM json_each(?))
+    '''
+    if order_by:
+        query += f' ORDER BY {order_by}'
+    cursor.execute(query, (json.dumps(ids),))
+
+    for row in cursor.fetchall():
+        row = dict(row)
+        grouped[row.pop('_hydrate_key')].append(row)
+
+    return grouped
+
+def fetch_by_ids(cursor, table, ids, columns='*', key='id'):
+    """
+    Fetch rows of `table` by a unique `key` column
+    Returns {id: row_dict}
+    """
+    return {
+        value: rows[0]
+        for value, rows in fetch_grouped(cursor, table, key, ids, columns).items()
+        if rows
+    }
+
+def attach_children(cursor, parents, field, table, key, columns='*', order_by=None):
+    """
+    Attach child rows of `table` (joined on `key`) to each parent under `field`
+    Parents must be dicts with an 'id' key
+    """
+    grouped = fetch_grouped(cursor, table, key, [p['id'] for p in parents], columns, order_by)
+    for parent in parents:
+        parent[field] = grouped.get(parent['id'], [])
+    return parents
+
+def attach_parent(cursor, rows, field, table, foreign_key, columns='*'):
+    """
+    Attach the row of `table` referenced by `foreign_key` to each row under `field`
+    Rows without a matching parent are left untouched
+    """
+    parents = fetch_by_ids(cursor, table, [row[foreign_key] for row in rows], columns)
+    for row in rows:
+        parent = parents.get(row[foreign_key])
+        if parent:
+            row[field] = parent
+    return rows
+
+def hydrate_incidents(cursor, incidents, detail=False):
+    """
+    Attach responders, resources and attachments to a page of incidents
+    With detail=True full personnel/resource rows and the timeline are included
+    """
+    if not incidents:
+        return incidents
+
+    if detail:
+        attach_children(cursor, incidents, 'responders', 'personnel', 'assigned_incident_id')
+        attach_children(cursor, incidents, 'resources', 'resources', 'assigned_incident_id')
+        attach_children(cursor, incidents, 'timeline', 'incident_timeline', 'incident_id',
+                        order_by='created_at DESC')
+    else:
+        attach_children(cursor, incidents, 'responders', 'personnel', 'assigned_incident_id',
+                        'name, role, status')
+        attach_children(cursor, incidents, 'resources', 'resources', 'assigned_incident_id',
+                        'name, type, status')
+
+    attach_children(cursor, incidents, 'attachments', 'attachments', 'incident_id',
+                    order_by='created_at DESC')
+
+    for incident in incidents:
+        incident['attachments_count'] = len(incident['attachments'])
+        for attachment in incident['attachments']:
+            attachment['thumbnails'] = thumbnail_urls(attachment)
+        # Format location
+        incident['location'] = {
+            'lat': incident['lat'],
+            'lng': incident['lng']
+        }
+
+    return incidents
@@ -0,0 +1,50 @@
+import os
+import threading
+from PIL import Image, ImageOps
+from config import Config
+
+# File extension and MIME type per derivative format
+DERIVATIVE_FORMATS = {
+    'JPEG': ('jpg', 'image/jpeg'),
+    'WEBP': ('webp', 'image/webp')
+}
+
+def derivative_path(photo_path, max_side, image_format):
+    """Path of the cached derivative stored next to the upload"""
+    extension = DERIVATIVE_FORMATS[image_format][0]
+    root, _ = os.path.splitext(photo_path)
+    return f'{root}.ai{max_side}.{extension}'
+
+def prepare_inference_image(photo_path, max_side=None, image_format=None, quality=None):
+    """
+    Bounded-resolution, orientation-corrected copy of an image for model input
+    The derivative is cached on disk next to the upload and reused while it
+    is newer than the original.
+    Returns (derivative_path, mime_type)
+    """
+    max_side = max_side or Config.AI_IMAGE_MAX_SIDE
+    image_format = (image_format or Config.AI_IMAGE_FORMAT).upper()
+    quality = quality or Config.AI_IMAGE_QUALITY
+    mime_type = DERIVATIVE_FORMATS[image_format][1]
+
+    output_path = derivative_path(photo_path, max_side, image_format)
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(photo_path):
+        return output_path, mime_type
+
+    with Image.open(photo_path) as img:
+        # Let the JPEG decoder downscale by up to 8x while decoding (no-op for other formats).
+        # A square box keeps enough pixels whichever way EXIF rotates the image.
+        img.draft('RGB', (max_side, max_side))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        # Resize before rotating so the transpose only touches the small image;
+        # bicubic is indistinguishable from Lanczos at model input resolution.
+        img.thumbnail((max_side, max_side), Image.BICUBIC)
+        img = ImageOps.exif_transpose(img)
+
+        # Write to a temp file first so readers never see a partial derivative
+        temp_path = f'{output_path}.{threading.get_ident()}.tmp'
+        img.save(temp_path, image_format, quality=quality, optimize=True)
+    os.replace(temp_path, output_path)
+
+    return output_path, mime_type
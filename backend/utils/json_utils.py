@@ -0,0 +1,37 @@
+"""
+JSON for API responses and socket events.
+
+Timestamps are stored as naive UTC text (see utils/time_utils.py), which
+browsers parse as local time; on the way out they become ISO 8601 with a
+'Z' so every client shows the right wall-clock time. Used by the Flask JSON
+provider and by Socket.IO (both json modules need dumps() and loads()).
+"""
+import json
+import re
+from flask.json.provider import DefaultJSONProvider
+
+_STORED_TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d+)?')
+
+def mark_utc(value):
+    """`value` with every stored timestamp string rewritten as 'YYYY-MM-DDTHH:MM:SSZ'"""
+    if isinstance(value, str):
+        if len(value) >= 19 and value[10] == ' ' and _STORED_TIMESTAMP.fullmatch(value):
+            return f'{value[:10]}T{value[11:]}Z'
+        return value
+    if isinstance(value, dict):
+        return {key: mark_utc(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [mark_utc(item) for item in value]
+    return value
+
+def dumps(obj, **kwargs):
+    return json.dumps(mark_utc(obj), **kwargs)
+
+loads = json.loads
+
+
+class UtcJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider marking stored timestamps as UTC"""
+
+    def dumps(self, obj, **kwargs):
+        return super().dumps(mark_utc(obj), **kwargs)
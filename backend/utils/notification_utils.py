@@ -1,5 +1,5 @@
 from database import get_db_connection
-from datetime import datetime
+from utils.time_utils import utc_timestamp
 
 def create_notification(user_id, incident_id, title, message, notification_type, priority):
     """
@@ -40,7 +40,7 @@ def broadcast_incident_notification(incident_id, title, message, priority='high'
         'type': 'incident_update',
         'priority': priority,
         'incident_id': incident_id,
-        'created_at': datetime.now().isoformat()
+        'created_at': utc_timestamp()
     }
 
 def create_geofence_alert(zone, user_location):
@@ -66,7 +66,7 @@ def create_geofence_alert(zone, user_location):
         'type': 'geofence_alert',
         'priority': 'critical',
         'zone': zone,
-        'created_at': datetime.now().isoformat()
+        'created_at': utc_timestamp()
     }
 
 def get_user_notifications(user_id=None, limit=50):
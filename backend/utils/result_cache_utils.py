@@ -0,0 +1,164 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from config import Config
+
+class _Entry:
+    __slots__ = ('value', 'versions', 'fresh_until', 'stale_until')
+
+    def __init__(self, value, versions, fresh_until, stale_until):
+        self.value = value
+        self.versions = versions
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+class ResultCache:
+    """
+    Shared in-process cache for expensive read results
+    Entries are fresh for `ttl` seconds, then served stale for up to
+    `stale_ttl` more while one refresh runs. Concurrent misses wait for a
+    single computation. Writes invalidate entries by tag: in this process
+    through invalidate(), and from any process through `generations`, a
+    callable returning a counter per tag that writes bump, read at most
+    every `generations_interval` seconds.
+    """
+
+    def __init__(self, ttl, stale_ttl, generations=None, generations_interval=0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._generations = generations
+        self.generations_interval = generations_interval
+        self._generations_due = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}  # key -> Future of the running computation
+        self._tag_versions = {}
+        self._shared_versions = {}
+        self._stats = {
+            'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0,
+            'computes': 0, 'errors': 0, 'invalidations': 0,
+            'compute_ms_total': 0.0, 'last_compute_ms': 0.0
+        }
+
+    def _version(self, tag):
+        # Both counters only grow, so their sum changes whenever either does
+        return self._tag_versions.get(tag, 0) + self._shared_versions.get(tag, 0)
+
+    def _is_current(self, entry):
+        return all(self._version(tag) == version for tag, version in entry.versions.items())
+
+    def get(self, key, compute, tags=()):
+        """
+        Cached result of compute() for `key`
+        `tags` name the data it reads; invalidate(tag) forces a recompute
+        """
+        now = time.monotonic()
+        shared = None
+        if self._generations and now >= self._generations_due:
+            # One reader per interval; the rest go on with the last counters
+            self._generations_due = now + self.generations_interval
+            shared = self._generations()
+        with self._lock:
+            if shared is not None:
+                # Requests racing a write may read older counters; keep the newest
+                newer = {tag: generation for tag, generation in shared.items()
+                         if generation > self._shared_versions.get(tag, -1)}
+                if newer:
+                    if self._shared_versions:
+                        self._stats['invalidations'] += 1
+                    self._shared_versions.update(newer)
+            entry = self._entries.get(key)
+            current = entry is not None and self._is_current(entry)
+            if current and now < entry.fresh_until:
+                self._stats['hits'] += 1
+                return entry.value
+
+            future = self._inflight.get(key)
+            # Expired, or invalidated while a refresh is already running: answer from the old copy
+            if entry is not None and now < entry.stale_until and (current or future is not None):
+                self._stats['stale_hits'] += 1
+                if future is None:
+                    self._inflight[key] = Future()
+                    threading.Thread(target=self._compute, args=(key, compute, tags), daemon=True).start()
+                return entry.value
+
+            if future is None:
+                self._stats['misses'] += 1
+                future = self._inflight[key] = Future()
+                leader = True
+            else:
+                self._stats['coalesced'] += 1
+                leader = False
+
+        if leader:
+            self._compute(key, compute, tags)
+        return future.result()
+
+    def _compute(self, key, compute, tags):
+        with self._lock:
+            future = self._inflight[key]
+            versions = {tag: self._version(tag) for tag in tags}
+
+        start = time.perf_counter()
+        try:
+            value = compute()
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+                del self._inflight[key]
+            print(f"⚠️ Cache refresh failed for {key}: {e}")
+            future.set_exception(e)
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        now = time.monotonic()
+        with self._lock:
+            # Tags invalidated during the computation leave the entry out of date
+            self._entries[key] = _Entry(value, versions, now + self.ttl, now + self.ttl + self.stale_ttl)
+            del self._inflight[key]
+            self._stats['computes'] += 1
+            self._stats['compute_ms_total'] += elapsed_ms
+            self._stats['last_compute_ms'] = round(elapsed_ms, 2)
+        future.set_result(value)
+
+    def invalidate(self, *tags):
+        """Mark every entry that reads any of `tags` as out of date"""
+        with self._lock:
+            for tag in tags:
+                self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+            self._stats['invalidations'] += 1
+
+    def recheck(self):
+        """Read the shared generations on the next get(), e.g. after a local write"""
+        self._generations_due = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0
+        stats['avg_compute_ms'] = round(stats.pop('compute_ms_total') / stats['computes'], 2) if stats['computes'] else 0
+        return stats
+
+_generations_conn = None
+_generations_lock = threading.Lock()
+
+def data_generations():
+    """Write counter per table from data_generations (migration 17)"""
+    global _generations_conn
+    # One long-lived connection, no pool round trip
+    with _generations_lock:
+        if _generations_conn is None:
+            _generations_conn = sqlite3.connect(Config.DATABASE_PATH, check_same_thread=False)
+        return dict(_generations_conn.execute('SELECT tag, generation FROM data_generations').fetchall())
+
+# Dashboard analytics, shared by every open dashboard on every worker
+analytics_cache = ResultCache(Config.ANALYTICS_CACHE_TTL_SECONDS, Config.ANALYTICS_CACHE_STALE_SECONDS,
+                              generations=data_generations,
+                              generations_interval=Config.ANALYTICS_CACHE_SYNC_SECONDS)
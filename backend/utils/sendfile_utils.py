@@ -0,0 +1,185 @@
+import mimetypes
+import os
+import re
+from functools import lru_cache
+from flask import current_app, request, abort
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.http import is_resource_modified, parse_range_header
+from werkzeug.security import safe_join
+from config import Config
+from utils.file_utils import sha256_file
+
+# Read size when a file is streamed through Python instead of os.sendfile
+SEND_BLOCK_SIZE = 64 * 1024
+
+# Blob store and derivative names start with the SHA-256 of the content
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{64}(\.[a-z0-9]+)*$')
+
+class SendfileWrapper:
+    """
+    Response body for a byte range of an open file
+    Iterating reads it in blocks; SendfileHandlerMixin servers send it with os.sendfile
+    """
+
+    def __init__(self, file, offset, length, block_size=SEND_BLOCK_SIZE):
+        self.file = file
+        self.offset = offset
+        self.length = length
+        self.block_size = block_size
+
+    def __iter__(self):
+        self.file.seek(self.offset)
+        remaining = self.length
+        while remaining > 0:
+            chunk = self.file.read(min(self.block_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        self.file.close()
+
+def sendfile_to_socket(sock, wrapper):
+    """
+    Copy a SendfileWrapper's range to a gevent socket with zero-copy os.sendfile
+    Returns number of bytes sent
+    """
+    from gevent.socket import wait_write
+
+    offset, remaining = wrapper.offset, wrapper.length
+    in_fd, out_fd = wrapper.file.fileno(), sock.fileno()
+    sent_total = 0
+    while remaining > 0:
+        try:
+            sent = os.sendfile(out_fd, in_fd, offset, remaining)
+        except BlockingIOError:
+            # gevent sockets are non-blocking; yield until the peer drains
+            wait_write(out_fd)
+            continue
+        if sent == 0:
+            break
+        offset += sent
+        remaining -= sent
+        sent_total += sent
+    return sent_total
+
+class SendfileHandlerMixin:
+    """
+    Mixin for gevent.pywsgi.WSGIHandler subclasses: file bodies returned by
+    send_upload go straight from the page cache to the socket
+    """
+
+    def process_result(self):
+        if (isinstance(self.result, SendfileWrapper) and hasattr(os, 'sendfile')
+                and not self.response_use_chunked):
+            self.write(b'')  # Flush the status line and headers
+            sendfile_to_socket(self.socket, self.result)
+            return
+        super().process_result()
+
+def sendfile_handler_class():
+    """gevent WSGI handler class with sendfile (and WebSockets when gevent-websocket is installed)"""
+    try:
+        from geventwebsocket.handler import WebSocketHandler as BaseHandler
+    except ImportError:
+        from gevent.pywsgi import WSGIHandler as BaseHandler
+
+    return type('SendfileWSGIHandler', (SendfileHandlerMixin, BaseHandler), {})
+
+@lru_cache(maxsize=4096)
+def _hashed_etag(path, size, mtime_ns):
+    return sha256_file(path)
+
+def content_etag(path, stat_result):
+    """
+    Strong ETag from the content hash
+    Content-addressed names carry it; other files are hashed once per (size, mtime)
+    """
+    name = os.path.basename(path)
+    if CONTENT_ADDRESSED_NAME.match(name):
+        return os.path.splitext(name)[0]
+    return _hashed_etag(path, stat_result.st_size, stat_result.st_mtime_ns)
+
+def _offload_headers(path, filename):
+    """X-Sendfile / X-Accel-Redirect header for a configured reverse proxy, or None"""
+    if Config.UPLOAD_OFFLOAD == 'x-sendfile':
+        return {'X-Sendfile': path}
+    if Config.UPLOAD_OFFLOAD == 'x-accel-redirect':
+        return {'X-Accel-Redirect': Config.UPLOAD_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + filename.lstrip('/')}
+    return None
+
+def _requested_range(etag, last_modified, size):
+    """(start, length, content_range) for a satisfiable Range request, else None"""
+    range_value = request.headers.get('Range')
+    if not range_value:
+        return None
+
+    # If-Range: only honour the range while the client's copy is current
+    if_range = request.if_range
+    if if_range.etag and if_range.etag != etag:
+        return None
+    if if_range.date and int(last_modified) > if_range.date.timestamp():
+        return None
+
+    parsed = parse_range_header(range_value)
+    byte_range = parsed.range_for_length(size) if parsed else None
+    if byte_range is None:
+        raise RequestedRangeNotSatisfiable(length=size)
+    start, stop = byte_range
+    return start, stop - start, parsed.to_content_range_header(size)
+
+def send_upload(filename, mimetype=None, immutable=None):
+    """
+    Serve a file under UPLOAD_FOLDER with a strong ETag, conditional GET and
+    byte ranges, handing the transfer to the proxy or os.sendfile when possible
+    """
+    path = safe_join(Config.UPLOAD_FOLDER, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag = content_etag(path, stat_result)
+    if immutable is None:
+        immutable = bool(CONTENT_ADDRESSED_NAME.match(os.path.basename(path)))
+
+    response = current_app.response_class(
+        mimetype=mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    )
+    response.set_etag(etag)
+    response.last_modified = int(stat_result.st_mtime)
+    response.accept_ranges = 'bytes'
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.max_age = Config.UPLOAD_IMMUTABLE_MAX_AGE_SECONDS
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True  # Cacheable, but revalidate with the ETag
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=response.last_modified):
+        response.status_code = 304
+        return response
+
+    # A reverse proxy serves the file (and any Range) itself
+    offload = _offload_headers(path, filename)
+    if offload:
+        response.headers.update(offload)
+        return response
+
+    start, length = 0, size
+    requested = _requested_range(etag, stat_result.st_mtime, size)
+    if requested:
+        start, length, response.headers['Content-Range'] = requested
+        response.status_code = 206
+
+    file = open(path, 'rb')
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper and not requested:
+        # Servers with their own wrapper (gunicorn, uWSGI) use sendfile for whole files
+        response.response = file_wrapper(file, SEND_BLOCK_SIZE)
+    else:
+        response.response = SendfileWrapper(file, start, length)
+    response.direct_passthrough = True
+    response.content_length = length
+    return response
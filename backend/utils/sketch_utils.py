@@ -0,0 +1,85 @@
+import bisect
+import math
+
+# DDSketch: every reported quantile is within this relative error of the exact one.
+# Stored sketch keys depend on it; rebuild with `analytics_rollups.py --backfill` after changing.
+SKETCH_RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+_LN_GAMMA = math.log(_GAMMA)
+
+# Durations (minutes) at or below this, negative ones from clock skew and unparseable ones count as zero
+MIN_SKETCH_VALUE = 1e-3
+ZERO_KEY = -(2 ** 31)
+
+# Reported quantiles: the value at rank floor(q * (count - 1))
+SKETCH_QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+# Histogram bucket edges in minutes; the last bucket is open-ended
+DURATION_HISTOGRAM_EDGES = [0, 5, 10, 15, 30, 60, 120, 240, 480, 1440]
+
+def sketch_key(value):
+    """Log-spaced bin of a duration"""
+    if value is None or value <= MIN_SKETCH_VALUE:
+        return ZERO_KEY
+    return math.ceil(math.log(value) / _LN_GAMMA)
+
+def sketch_key_sql(value):
+    """
+    sketch_key() as an SQL expression, for the rollup triggers; the same
+    double arithmetic, so it bins exactly as sketch_key() does
+    """
+    return (f'CASE WHEN ({value}) > {MIN_SKETCH_VALUE!r} '
+            f'THEN CAST(ceil(ln({value}) / {_LN_GAMMA!r}) AS INTEGER) ELSE {ZERO_KEY} END')
+
+def key_value(key):
+    """Representative duration of a bin (within SKETCH_RELATIVE_ACCURACY of any value in it)"""
+    if key == ZERO_KEY:
+        return 0.0
+    return 2 * _GAMMA ** key / (_GAMMA + 1)
+
+def edge_key(edge):
+    """Smallest bin key whose representative value is at least `edge`"""
+    if edge <= 0:
+        return ZERO_KEY
+    key = math.ceil(math.log(edge * (_GAMMA + 1) / 2) / _LN_GAMMA)
+    while key_value(key - 1) >= edge:
+        key -= 1
+    while key_value(key) < edge:
+        key += 1
+    return key
+
+_HISTOGRAM_EDGE_KEYS = [edge_key(edge) for edge in DURATION_HISTOGRAM_EDGES]
+
+class DDSketch:
+    """
+    Quantile sketch over bin counts, built from stored (key, count) rows;
+    merging sketches is adding counts
+    """
+
+    def __init__(self):
+        self.bins = {}
+        self.count = 0
+
+    def add_key(self, key, count):
+        if count:
+            self.bins[key] = self.bins.get(key, 0) + count
+            self.count += count
+
+    def summary(self):
+        """Count, SKETCH_QUANTILES (minutes, rounded) and histogram, in one pass over the bins"""
+        ranks = {name: math.floor(q * (self.count - 1)) for name, q in SKETCH_QUANTILES.items()}
+        quantiles = dict.fromkeys(SKETCH_QUANTILES)
+        counts = [0] * len(DURATION_HISTOGRAM_EDGES)
+        seen = 0
+        for key in sorted(self.bins):
+            count = self.bins[key]
+            seen += count
+            for name, rank in ranks.items():
+                if quantiles[name] is None and seen > rank:
+                    quantiles[name] = round(key_value(key), 2)
+            counts[bisect.bisect_right(_HISTOGRAM_EDGE_KEYS, key) - 1] += count
+        return {
+            'count': self.count,
+            **quantiles,
+            'histogram': {'edges': list(DURATION_HISTOGRAM_EDGES), 'counts': counts}
+        }
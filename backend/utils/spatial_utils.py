@@ -0,0 +1,48 @@
+from config import Config
+from utils.geo_utils import get_bounding_box, get_nearby_items
+
+# Every table listed here has a <table>_rtree R*Tree index kept in sync by
+# triggers (see migrations). Point tables store the point itself, geofence
+# zones store the bounding box of the zone circle.
+SPATIAL_TABLES = ('alerts', 'geofence_zones', 'incidents', 'resources', 'personnel')
+
+def parse_proximity_args(args, default_radius=Config.NEARBY_ALERT_RADIUS_METERS):
+    """
+    Read optional lat/lng/radius query parameters
+    Returns (lat, lng, radius) or None when no location was given
+    """
+    lat = args.get('lat', type=float)
+    lng = args.get('lng', type=float)
+    if lat is None or lng is None:
+        return None
+    return lat, lng, args.get('radius', type=float, default=default_radius)
+
+def within_radius_clause(table, lat, lng, radius_meters, column='id'):
+    """
+    SQL condition (and params) keeping rows whose R*Tree box overlaps the
+    bounding box of the radius. Results still need an exact distance check.
+    """
+    min_lat, max_lat, min_lng, max_lng = get_bounding_box(lat, lng, radius_meters)
+    clause = f'''{column} IN (
+        SELECT id FROM {table}_rtree
+        WHERE max_lat >= ? AND min_lat <= ? AND max_lng >= ? AND min_lng <= ?
+    )'''
+    return clause, [min_lat, max_lat, min_lng, max_lng]
+
+def containing_point_clause(table, lat, lng, column='id'):
+    """
+    SQL condition (and params) keeping rows whose R*Tree box contains the point
+    """
+    clause = f'''{column} IN (
+        SELECT id FROM {table}_rtree
+        WHERE min_lat <= ? AND max_lat >= ? AND min_lng <= ? AND max_lng >= ?
+    )'''
+    return clause, [lat, lat, lng, lng]
+
+def filter_nearby(items, proximity):
+    """
+    Exact distance check for R*Tree candidates
+    Keeps items within the radius, adds 'distance' and sorts nearest first
+    """
+    lat, lng, radius = proximity
+    return get_nearby_items(lat, lng, items, radius)
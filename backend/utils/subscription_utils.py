@@ -0,0 +1,115 @@
+import math
+from config import Config
+
+# Socket.IO rooms clients subscribe to. Events are emitted to the rooms of
+# what they are about, so only interested sids receive them; emitting to a
+# list of rooms reaches each sid once even when it is in several of them.
+WORLD_ROOM = 'map'  # Viewports too large for tiles (e.g. a whole-country dashboard)
+TILE_ROOM_PREFIX = 'tile:'
+ROLE_ROOM_PREFIX = 'role:'
+INCIDENT_ROOM_PREFIX = 'incident_'
+
+def incident_room(incident_id):
+    return f'{INCIDENT_ROOM_PREFIX}{incident_id}'
+
+def role_room(role):
+    return f'{ROLE_ROOM_PREFIX}{role}'
+
+def _tile(level, lat, lng):
+    cells_per_degree = Config.SUBSCRIPTION_TILE_LEVELS[level]
+    return math.floor(lat * cells_per_degree), math.floor(lng * cells_per_degree)
+
+def tile_rooms(lat, lng):
+    """
+    Rooms of every subscription that can see a point: the tile containing it
+    at each level, plus the whole-map room
+    """
+    rooms = [WORLD_ROOM]
+    for level in range(len(Config.SUBSCRIPTION_TILE_LEVELS)):
+        row, col = _tile(level, lat, lng)
+        rooms.append(f'{TILE_ROOM_PREFIX}{level}:{row}:{col}')
+    return rooms
+
+def viewport_rooms(south, west, north, east):
+    """
+    Tile rooms covering a map viewport at the finest level that needs at
+    most SUBSCRIPTION_MAX_TILES tiles, or the whole-map room
+    Raises ValueError for an invalid viewport
+    """
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError('viewport needs south <= north within ±90 and west/east within ±180')
+    # A viewport crossing the antimeridian has west > east
+    spans = [(west, east)] if west <= east else [(west, 180), (-180, east)]
+
+    for level in reversed(range(len(Config.SUBSCRIPTION_TILE_LEVELS))):
+        rows = range(_tile(level, south, 0)[0], _tile(level, north, 0)[0] + 1)
+        cols = [col for span_west, span_east in spans
+                for col in range(_tile(level, 0, span_west)[1], _tile(level, 0, span_east)[1] + 1)]
+        if len(rows) * len(cols) <= Config.SUBSCRIPTION_MAX_TILES:
+            return [f'{TILE_ROOM_PREFIX}{level}:{row}:{col}' for row in rows for col in cols]
+    return [WORLD_ROOM]
+
+def interest_rooms(interests):
+    """
+    Rooms for a `subscribe` request, by kind of interest
+    Only kinds present in the request are returned, so each replaces just
+    that kind of subscription. `viewport` is {south, west, north, east} or
+    'world'; `incidents` and `roles` are lists.
+    Raises ValueError for malformed interests
+    """
+    rooms = {}
+    if 'viewport' in interests:
+        viewport = interests['viewport']
+        if viewport == 'world':
+            rooms['viewport'] = [WORLD_ROOM]
+        elif viewport is None:
+            rooms['viewport'] = []
+        else:
+            try:
+                bounds = [float(viewport[side]) for side in ('south', 'west', 'north', 'east')]
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("viewport must be 'world' or have numeric south, west, north and east")
+            rooms['viewport'] = viewport_rooms(*bounds)
+    if 'incidents' in interests:
+        try:
+            rooms['incidents'] = [incident_room(int(i)) for i in interests['incidents'] or []]
+        except (TypeError, ValueError):
+            raise ValueError('incidents must be a list of incident ids')
+    if 'roles' in interests:
+        roles = interests['roles'] or []
+        if not isinstance(roles, list) or not all(isinstance(role, str) for role in roles):
+            raise ValueError('roles must be a list of role names')
+        rooms['roles'] = [role_room(role) for role in roles]
+    return rooms
+
+def interest_kind(room):
+    """Which kind of interest a room belongs to (None for rooms that are not interests)"""
+    if room == WORLD_ROOM or room.startswith(TILE_ROOM_PREFIX):
+        return 'viewport'
+    if room.startswith(INCIDENT_ROOM_PREFIX):
+        return 'incidents'
+    if room.startswith(ROLE_ROOM_PREFIX):
+        return 'roles'
+    return None
+
+def personnel_rooms(person, lat=None, lng=None, incident_ids=()):
+    """
+    Rooms interested in an event about a person: their position's tiles,
+    their role and their incident (plus any other incidents involved)
+    """
+    lat = person['lat'] if lat is None else lat
+    lng = person['lng'] if lng is None else lng
+    rooms = tile_rooms(lat, lng) if lat is not None and lng is not None else []
+    if person['role']:
+        rooms.append(role_room(person['role']))
+    for incident_id in (person['assigned_incident_id'], *incident_ids):
+        if incident_id and incident_room(incident_id) not in rooms:
+            rooms.append(incident_room(incident_id))
+    return rooms
+
+def incident_rooms(incident):
+    """Rooms interested in an event about an incident: its room and its location's tiles"""
+    rooms = [incident_room(incident['id'])]
+    if incident['lat'] is not None and incident['lng'] is not None:
+        rooms.extend(tile_rooms(incident['lat'], incident['lng']))
+    return rooms
@@ -0,0 +1,178 @@
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from config import Config
+from database import db_session
+from db_writer import db_writer
+from utils.file_utils import upload_abspath
+
+# Attachment types that get thumbnails (videos only when ffmpeg is installed)
+THUMBNAIL_FILE_TYPES = ('image', 'video')
+
+_executor = ThreadPoolExecutor(max_workers=Config.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+
+# One generation per attachment at a time; later callers wait and reuse its rows
+_generation_locks = {}
+_generation_locks_lock = threading.Lock()
+
+def thumbnail_path(filepath, max_side):
+    """Relative path of a thumbnail stored next to the upload"""
+    root, _ = os.path.splitext(filepath)
+    return f'{root}.thumb{max_side}.jpg'
+
+def thumbnail_urls(attachment):
+    """URLs of every thumbnail size for an attachment row, or None if it has none"""
+    if attachment['file_type'] not in THUMBNAIL_FILE_TYPES:
+        return None
+    return {size: f"/uploads/{attachment['id']}/thumb/{size}" for size in Config.THUMBNAIL_SIZES}
+
+def extract_poster_frame(video_path, output_path):
+    """
+    Grab one frame of a video as JPEG with ffmpeg
+    Returns False when ffmpeg is not installed or the frame cannot be read
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return False
+
+    # Very short clips have no frame at the offset, so fall back to the first one
+    for offset in (Config.VIDEO_POSTER_OFFSET_SECONDS, 0):
+        try:
+            subprocess.run([
+                ffmpeg, '-loglevel', 'error', '-y', '-ss', str(offset), '-i', video_path,
+                '-frames:v', '1', '-q:v', '2', output_path
+            ], check=True, timeout=30, capture_output=True)
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"Error extracting poster frame: {e}")
+            return False
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            return True
+    return False
+
+def _existing_derivatives(filepath, sizes):
+    """Derivative dicts read from thumbnails already on disk, or None if any is missing"""
+    derivatives = []
+    for size, max_side in sizes:
+        relative_path = thumbnail_path(filepath, max_side)
+        output_path = upload_abspath(relative_path)
+        if not os.path.exists(output_path):
+            return None
+        with Image.open(output_path) as img:
+            width, height = img.size
+        derivatives.append({
+            'size': size,
+            'filepath': relative_path,
+            'mime_type': 'image/jpeg',
+            'width': width,
+            'height': height,
+            'file_size': os.path.getsize(output_path)
+        })
+    return derivatives
+
+def generate_derivatives(filepath, file_type):
+    """
+    Write every configured thumbnail size for an upload
+    Videos are thumbnailed from a poster frame
+    Returns list of derivative dicts (empty when the file has no thumbnails)
+    """
+    sizes = sorted(Config.THUMBNAIL_SIZES.items(), key=lambda item: item[1], reverse=True)
+
+    # Attachments sharing a blob share its thumbnails
+    existing = _existing_derivatives(filepath, sizes)
+    if existing:
+        return existing
+
+    source_path = upload_abspath(filepath)
+    poster_path = None
+
+    if file_type == 'video':
+        poster_path = f'{source_path}.poster.jpg'
+        if not extract_poster_frame(source_path, poster_path):
+            return []
+        source_path = poster_path
+    elif file_type != 'image':
+        return []
+
+    derivatives = []
+    try:
+        with Image.open(source_path) as img:
+            # Decode at reduced scale for JPEGs; each size is then cut from the previous one
+            img.draft('RGB', (sizes[0][1], sizes[0][1]))
+            img = ImageOps.exif_transpose(img)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+
+            for size, max_side in sizes:
+                img.thumbnail((max_side, max_side), Image.BICUBIC)
+                relative_path = thumbnail_path(filepath, max_side)
+                output_path = upload_abspath(relative_path)
+                # Unique temp name: attachments sharing a blob may be thumbnailed concurrently
+                temp_path = f'{output_path}.{threading.get_ident()}.tmp'
+                img.save(temp_path, 'JPEG', quality=Config.THUMBNAIL_QUALITY, optimize=True, progressive=True)
+                os.replace(temp_path, output_path)
+
+                derivatives.append({
+                    'size': size,
+                    'filepath': relative_path,
+                    'mime_type': 'image/jpeg',
+                    'width': img.width,
+                    'height': img.height,
+                    'file_size': os.path.getsize(output_path)
+                })
+    except Exception as e:
+        print(f"Error generating thumbnails for {filepath}: {e}")
+        return []
+    finally:
+        if poster_path and os.path.exists(poster_path):
+            os.remove(poster_path)
+
+    return derivatives
+
+def store_derivatives(cursor, attachment_id, derivatives):
+    """Insert or replace derivative rows for an attachment"""
+    cursor.executemany('''
+        INSERT OR REPLACE INTO attachment_derivatives
+            (attachment_id, size, filepath, mime_type, width, height, file_size)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(
+        attachment_id, d['size'], d['filepath'], d['mime_type'], d['width'], d['height'], d['file_size']
+    ) for d in derivatives])
+
+def fetch_derivatives(cursor, attachment_id):
+    """Derivative rows of an attachment keyed by size name"""
+    cursor.execute('''
+        SELECT size, filepath, mime_type, width, height, file_size
+        FROM attachment_derivatives WHERE attachment_id = ?
+    ''', (attachment_id,))
+    return {row['size']: dict(row) for row in cursor.fetchall()}
+
+def ensure_derivatives(attachment_id, filepath, file_type):
+    """
+    Generate and record the thumbnails of an attachment unless they exist
+    Returns dict of derivative rows keyed by size name
+    """
+    with _generation_locks_lock:
+        lock = _generation_locks.setdefault(attachment_id, threading.Lock())
+
+    try:
+        with lock:
+            with db_session() as conn:
+                existing = fetch_derivatives(conn.cursor(), attachment_id)
+            if len(existing) == len(Config.THUMBNAIL_SIZES):
+                return existing
+
+            derivatives = generate_derivatives(filepath, file_type)
+            if derivatives:
+                db_writer.execute(lambda cursor: store_derivatives(cursor, attachment_id, derivatives))
+            return {d['size']: d for d in derivatives}
+    finally:
+        with _generation_locks_lock:
+            _generation_locks.pop(attachment_id, None)
+
+def schedule_derivatives(attachment_id, filepath, file_type):
+    """Generate thumbnails in the background after an upload is committed"""
+    if file_type in THUMBNAIL_FILE_TYPES:
+        _executor.submit(ensure_derivatives, attachment_id, filepath, file_type)
@@ -0,0 +1,10 @@
+from datetime import datetime, timezone
+
+# SQLite's CURRENT_TIMESTAMP format. Every timestamp column holds UTC in it,
+# so string comparisons, strftime() buckets and julianday() differences agree
+# between rows written by the app, by column defaults and by triggers.
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def utc_timestamp(moment=None):
+    """`moment` (an aware datetime, default now) as a UTC timestamp string"""
+    return (moment or datetime.now(timezone.utc)).astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT)
@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+from config import Config
+from utils.file_utils import hamming_distance
+
+# In-process hit/miss counters, reported by GET /api/verification/status
+_stats_lock = threading.Lock()
+cache_stats = {'exact_hits': 0, 'near_hits': 0, 'misses': 0, 'stores': 0}
+
+def _count(key):
+    with _stats_lock:
+        cache_stats[key] += 1
+
+def dhash_bands(dhash):
+    """
+    Split a 64-bit dHash into 8 byte-sized band keys (band index * 256 + byte)
+    Hashes within Hamming distance 7 always share at least one band
+    """
+    value = int(dhash, 16)
+    return [band * 256 + ((value >> ((7 - band) * 8)) & 0xFF) for band in range(8)]
+
+def lookup_cached_verification(cursor, sha256, dhash, incident_type,
+                               max_distance=Config.VERIFY_CACHE_MAX_HAMMING):
+    """
+    Find an unexpired cached verification for the same incident type
+    Tries the exact content hash first, then the nearest image by dHash
+    Returns dict with result, match ('exact' or 'near') and hamming_distance, or None
+    """
+    now = time.time()
+
+    if sha256:
+        cursor.execute('''
+            SELECT result FROM verification_cache
+            WHERE sha256 = ? AND incident_type = ? AND expires_at > ?
+        ''', (sha256, incident_type, now))
+        row = cursor.fetchone()
+        if row:
+            _count('exact_hits')
+            return {'result': json.loads(row['result']), 'match': 'exact', 'hamming_distance': 0}
+
+    if dhash:
+        cursor.execute('''
+            SELECT dhash, result FROM verification_cache
+            WHERE id IN (
+                SELECT cache_id FROM verification_cache_bands
+                WHERE band_key IN (SELECT value FROM json_each(?))
+            )
+            AND incident_type = ? AND expires_at > ?
+        ''', (json.dumps(dhash_bands(dhash)), incident_type, now))
+
+        nearest = None
+        for row in cursor.fetchall():
+            distance = hamming_distance(dhash, row['dhash'])
+            if distance <= max_distance and (nearest is None or distance < nearest[0]):
+                nearest = (distance, row['result'])
+
+        if nearest:
+            _count('near_hits')
+            return {'result': json.loads(nearest[1]), 'match': 'near', 'hamming_distance': nearest[0]}
+
+    _count('misses')
+    return None
+
+def store_cached_verification(cursor, sha256, dhash, incident_type, result,
+                              ttl_seconds=Config.VERIFY_CACHE_TTL_SECONDS):
+    """
+    Cache a verification result for an image and incident type
+    Expired entries are purged on the way
+    """
+    if not sha256:
+        return None
+
+    now = time.time()
+    cursor.execute('DELETE FROM verification_cache WHERE expires_at <= ?', (now,))
+
+    cursor.execute('''
+        INSERT INTO verification_cache (sha256, dhash, incident_type, result, created_at, expires_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (sha256, incident_type) DO UPDATE SET
+            result = excluded.result,
+            created_at = excluded.created_at,
+            expires_at = excluded.expires_at
+        RETURNING id
+    ''', (sha256, dhash, incident_type, json.dumps(result), now, now + ttl_seconds))
+    cache_id = cursor.fetchall()[0]['id']
+
+    if dhash:
+        cursor.executemany('''
+            INSERT OR IGNORE INTO verification_cache_bands (band_key, cache_id) VALUES (?, ?)
+        ''', [(band_key, cache_id) for band_key in dhash_bands(dhash)])
+
+    _count('stores')
+    return cache_id
@@ -0,0 +1,359 @@
+"""
+Persistent AI verification queue with a bounded worker pool.
+
+Uploaded photos become rows in verification_jobs instead of one thread per
+upload. A fixed pool of AI_VERIFY_CONCURRENCY worker threads claims pending
+jobs through the single writer and calls the AI handler at most
+AI_VERIFY_RATE_PER_WORKER times per second each. Failed calls are retried
+with exponential backoff up to AI_VERIFY_MAX_ATTEMPTS. Several worker
+processes can share the queue: each claimed job records its WORKER_ID, and
+jobs whose worker died are re-queued when a pool starts (or when the other
+workers reap the dead one, see cluster.py).
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+from config import Config
+from database import db_session
+from db_writer import db_writer
+from cluster import WORKER_ID
+from utils.ai_utils import ai_handler
+from utils.verification_cache_utils import (
+    cache_stats, lookup_cached_verification, store_cached_verification
+)
+
+# Timeline label for each is_verified value
+VERIFICATION_STATUS = {1: "VERIFIED", 0: "UNVERIFIED", -1: "FAKE/FRAUD"}
+
+# Timeline author for results reused from the verification cache
+CACHE_SOURCE_NAME = 'Verification Cache'
+
+# Longest a worker sleeps between checks for jobs it was not woken for
+IDLE_POLL_SECONDS = 5
+
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def _latency_summary(values_ms):
+    values_ms = sorted(values_ms)
+    return {
+        'p50': _percentile(values_ms, 50),
+        'p95': _percentile(values_ms, 95),
+        'p99': _percentile(values_ms, 99),
+        'max': values_ms[-1] if values_ms else None
+    }
+
+
+def record_verification(cursor, incident_id, result, source_name, cached=None):
+    """
+    Store a verification result on the incident and add its timeline event
+    `cached` is the cache lookup when the result was reused
+    """
+    cursor.execute('''
+        UPDATE incidents
+        SET is_verified = ?, verification_score = ?, ai_analysis = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', (
+        result['is_verified'],  # 1, 0, -1 (None when AI is not configured)
+        result['confidence_score'],
+        result['analysis'],
+        incident_id
+    ))
+
+    verification_status = VERIFICATION_STATUS.get(result['is_verified'], "UNKNOWN")
+    description = f"AI Verification Result: {verification_status} (Score: {result['confidence_score']}%)"
+    if cached and cached['match'] == 'exact':
+        description += " - reused result for an identical image"
+    elif cached:
+        description += f" - near-duplicate of an earlier image ({cached['hamming_distance']} bits differ), possible repost"
+
+    cursor.execute('''
+        INSERT INTO incident_timeline (incident_id, event_type, description, user_name, metadata)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (
+        incident_id,
+        'ai_verification',
+        description,
+        source_name,
+        result['analysis']
+    ))
+
+
+class VerificationQueue:
+    """Drains verification_jobs with a fixed number of rate-limited workers"""
+
+    def __init__(self, handler=None, concurrency=None, rate_per_worker=None):
+        self.handler = handler or ai_handler
+        self.concurrency = concurrency or Config.AI_VERIFY_CONCURRENCY
+        self.rate_per_worker = rate_per_worker if rate_per_worker is not None else Config.AI_VERIFY_RATE_PER_WORKER
+        self._workers = []
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._in_flight_lock = threading.Lock()
+        self._in_flight = 0
+        self._max_in_flight = 0
+
+    def enqueue(self, cursor, incident_id, attachment_id, photo_path):
+        """
+        Add a verification job on the caller's cursor so it commits together
+        with the attachment. `photo_path` is relative to BASE_DIR.
+        Call wake() once the transaction is committed.
+        """
+        now = time.time()
+        cursor.execute('''
+            INSERT INTO verification_jobs (incident_id, attachment_id, photo_path, enqueued_at, available_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (incident_id, attachment_id, photo_path, now, now))
+        return cursor.lastrowid
+
+    def wake(self):
+        """Make sure the pool is running and tell idle workers about new jobs"""
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def start(self):
+        """Re-queue jobs interrupted by a previous crash and start the workers"""
+        with self._start_lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            if self._workers:
+                return
+            self._stopping = False
+
+            # Jobs running under a worker that is no longer registered are orphaned
+            recovered = db_writer.execute(lambda cursor: cursor.execute('''
+                UPDATE verification_jobs SET status = 'pending', worker_id = NULL, available_at = ?
+                WHERE status = 'running'
+                  AND (worker_id IS NULL OR worker_id NOT IN (SELECT worker_id FROM worker_processes))
+            ''', (time.time(),)).rowcount)
+            if recovered:
+                print(f"🔁 Re-queued {recovered} interrupted verification job(s)")
+
+            for number in range(self.concurrency):
+                worker = threading.Thread(target=self._run, name=f'ai-verify-{number}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def stop(self, timeout=None):
+        """Stop the workers after their current job"""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def stats(self, sample_size=500):
+        """Queue depth by status, worker state and latency percentiles of recent jobs"""
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status, COUNT(*) AS count FROM verification_jobs GROUP BY status')
+            counts = {row['status']: row['count'] for row in cursor.fetchall()}
+
+            cursor.execute('''
+                SELECT enqueued_at, started_at, finished_at FROM verification_jobs
+                WHERE status = 'done'
+                ORDER BY finished_at DESC
+                LIMIT ?
+            ''', (sample_size,))
+            recent = cursor.fetchall()
+
+        return {
+            'queue_depth': counts.get('pending', 0),
+            'running': counts.get('running', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'workers': sum(1 for worker in self._workers if worker.is_alive()),
+            'concurrency': self.concurrency,
+            'rate_per_worker': self.rate_per_worker,
+            'in_flight': self._in_flight,
+            'max_in_flight': self._max_in_flight,
+            'handler': self.handler.name,
+            'cache': dict(cache_stats),
+            'latency_ms': {
+                'sample_size': len(recent),
+                'queue_wait': _latency_summary([(r['started_at'] - r['enqueued_at']) * 1000 for r in recent]),
+                'processing': _latency_summary([(r['finished_at'] - r['started_at']) * 1000 for r in recent]),
+                'total': _latency_summary([(r['finished_at'] - r['enqueued_at']) * 1000 for r in recent])
+            }
+        }
+
+    def _run(self):
+        interval = 1 / self.rate_per_worker if self.rate_per_worker > 0 else 0
+        last_call = None
+        while not self._stopping:
+            # Per-worker rate limit on model calls
+            if last_call is not None:
+                delay = last_call + interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            try:
+                job = self._claim() if self._has_available_job() else None
+            except Exception as e:
+                print(f"⚠️ Verification queue error: {e}")
+                job = None
+
+            if job is None:
+                self._wait_for_work()
+                continue
+
+            last_call = time.monotonic()
+            try:
+                self._process(job)
+            except Exception as e:
+                # Never lose a claimed job to an unexpected error
+                print(f"⚠️ Verification job {job['id']} crashed: {e}")
+                self._retry_or_fail(job, str(e))
+
+    def _has_available_job(self):
+        """Cheap read so idle workers do not take write transactions"""
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT 1 FROM verification_jobs
+                WHERE status = 'pending' AND available_at <= ?
+                LIMIT 1
+            ''', (time.time(),))
+            return cursor.fetchone() is not None
+
+    def _wait_for_work(self):
+        """Sleep until woken or the next backed-off job becomes available"""
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MIN(available_at) FROM verification_jobs WHERE status = 'pending'")
+            next_available = cursor.fetchone()[0]
+
+        timeout = IDLE_POLL_SECONDS
+        if next_available is not None:
+            timeout = min(timeout, max(next_available - time.time(), 0.05))
+        with self._wakeup:
+            if not self._stopping:
+                self._wakeup.wait(timeout)
+
+    def _claim(self):
+        """Atomically move the next available job to running"""
+        def claim(cursor):
+            now = time.time()
+            cursor.execute('''
+                UPDATE verification_jobs
+                SET status = 'running', attempts = attempts + 1, started_at = ?, worker_id = ?
+                WHERE id = (
+                    SELECT id FROM verification_jobs
+                    WHERE status = 'pending' AND available_at <= ?
+                    ORDER BY available_at, id
+                    LIMIT 1
+                )
+                RETURNING *
+            ''', (now, WORKER_ID, now))
+            rows = cursor.fetchall()
+            return dict(rows[0]) if rows else None
+
+        return db_writer.execute(claim)
+
+    def _process(self, job):
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT i.type, i.description, a.sha256, a.dhash
+                FROM incidents i
+                LEFT JOIN attachments a ON a.id = ?
+                WHERE i.id = ?
+            ''', (job['attachment_id'], job['incident_id']))
+            incident = cursor.fetchone()
+
+            # An identical or near-identical image may have been verified meanwhile
+            cached = None
+            if incident:
+                cached = lookup_cached_verification(cursor, incident['sha256'], incident['dhash'], incident['type'])
+
+        if not incident:
+            self._finish(job, 'failed', error='Incident not found')
+            return
+
+        if cached:
+            self._save(job, cached['result'], cached=cached)
+            return
+
+        photo_path = os.path.join(Config.BASE_DIR, job['photo_path'])
+        print(f"🤖 AI: Starting verification for incident {job['incident_id']} (job {job['id']}, attempt {job['attempts']})...")
+
+        with self._in_flight_lock:
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        try:
+            result = self.handler.verify_incident_photo(
+                photo_path,
+                incident['type'],
+                incident['description'] or "No description provided"
+            )
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+
+        if 'is_verified' not in result:
+            self._retry_or_fail(job, result.get('error') or 'Unknown AI error')
+            return
+
+        self._save(job, result, image=incident)
+
+    def _save(self, job, result, cached=None, image=None):
+        """
+        Store the verification on the incident and complete the job in one write
+        Fresh successful results are cached for the image (`image` has type and hashes)
+        """
+        source_name = CACHE_SOURCE_NAME if cached else self.handler.name
+
+        def save_verification(cursor):
+            record_verification(cursor, job['incident_id'], result, source_name, cached)
+
+            if image and result.get('success'):
+                store_cached_verification(cursor, image['sha256'], image['dhash'], image['type'], result)
+
+            cursor.execute('''
+                UPDATE verification_jobs
+                SET status = 'done', result = ?, last_error = NULL, finished_at = ?
+                WHERE id = ?
+            ''', (json.dumps(result), time.time(), job['id']))
+
+        db_writer.execute(save_verification)
+        print(f"✅ AI Verification saved for incident {job['incident_id']}")
+
+    def _retry_or_fail(self, job, error):
+        if job['attempts'] >= Config.AI_VERIFY_MAX_ATTEMPTS:
+            print(f"🤖 AI verification failed for incident {job['incident_id']} after {job['attempts']} attempts: {error}")
+            self._finish(job, 'failed', error=error)
+            return
+
+        # Exponential backoff with jitter so retries from a burst spread out
+        backoff = min(Config.AI_VERIFY_BACKOFF_SECONDS * 2 ** (job['attempts'] - 1),
+                      Config.AI_VERIFY_BACKOFF_MAX_SECONDS)
+        backoff *= random.uniform(0.5, 1.0)
+        print(f"🤖 AI Error: {error} (job {job['id']}, retrying in {backoff:.1f}s)")
+        db_writer.execute('''
+            UPDATE verification_jobs
+            SET status = 'pending', last_error = ?, available_at = ?
+            WHERE id = ?
+        ''', (error, time.time() + backoff, job['id']))
+
+    def _finish(self, job, status, error=None):
+        db_writer.execute('''
+            UPDATE verification_jobs
+            SET status = ?, last_error = ?, finished_at = ?
+            WHERE id = ?
+        ''', (status, error, time.time(), job['id']))
+
+
+# Singleton instance
+verification_queue = VerificationQueue()
@@ -1,6 +1,6 @@
 "use client"
 
-import { useState, useEffect, useCallback } from "react"
+import { useState, useEffect, useCallback, useRef } from "react"
 import dynamic from "next/dynamic"
 import { AlertTriangle, BarChart3, MessageSquare, Users, Package, RefreshCw, Image as ImageIcon } from "lucide-react"
 import IncidentDetailView from "@/components/incident-detail-view"
@@ -9,8 +9,9 @@ import CommunicationsPanel from "@/components/communications-panel"
 import { PersonnelManagement } from "@/components/personnel-management"
 import { ResourceManagement } from "@/components/resource-management"
 import EvidenceGallery from "@/components/evidence-gallery"
-import { incidentsAPI, personnelAPI, resourcesAPI } from "@/lib/api"
-import { useWebSocket } from "@/hooks/use-websocket"
+import { incidentsAPI } from "@/lib/api"
+import { createSyncedData, pullChanges, syncedIncidents, syncedPersonnel, syncedResources } from "@/lib/sync"
+import { useWebSocket, type Viewport } from "@/hooks/use-websocket"
 
 // Dynamic import for Leaflet map to avoid SSR issues
 const MapComponent = dynamic(() => import("@/components/map-component"), {
@@ -28,6 +29,7 @@ export default function CrisisCommandDashboard() {
   const [incidents, setIncidents] = useState<any[]>([])
   const [allIncidents, setAllIncidents] = useState<any[]>([])
   const [personnel, setPersonnel] = useState<any[]>([])
+  const [mapViewport, setMapViewport] = useState<Viewport | null>(null)
   const [expandedIncident, setExpandedIncident] = useState<number | null>(null)
   const [loading, setLoading] = useState(true)
   const [rightSidebarView, setRightSidebarView] = useState<'stats' | 'comms' | 'team' | 'resources' | 'evidence'>('comms')
@@ -58,135 +60,128 @@ export default function CrisisCommandDashboard() {
   const { isConnected, on, off, joinIncident, leaveIncident } = useWebSocket({
     autoConnect: true,
     onConnect: () => console.log('Dashboard connected to WebSocket'),
+    // Only events inside the visible map (everything until the map reports its bounds)
+    interests: { viewport: mapViewport ?? 'world' },
   })
 
+  // Incidents, personnel, resources and attachments as of the last sync
+  const synced = useRef(createSyncedData())
+
   // Memoized fetch function so it can be used in effects safely
   const fetchData = useCallback(async (silent = false) => {
     try {
       if (!silent) setLoading(true)
-      // Fetch incidents
-      const incidentsResponse = await incidentsAPI.getAll()
-      let currentIncidents: any[] = []
-      let fullIncidents: any[] = []
-
-      if (incidentsResponse.success) {
-        fullIncidents = incidentsResponse.incidents.map((inc: any) => ({
-          ...inc,
-          location: { lat: inc.lat, lng: inc.lng },
-          time: new Date(inc.created_at).toLocaleTimeString('en-US', {
-            hour: '2-digit',
-            minute: '2-digit',
-            timeZone: 'Asia/Kolkata'
-          }),
-          responders: [],
-          resources: []
-        }))
-        setAllIncidents(fullIncidents)
-
-        // Filter out resolved incidents for the main list and map
-        const activeIncidents = fullIncidents.filter((inc: any) => inc.status !== 'resolved')
-
-        currentIncidents = activeIncidents.map((inc: any) => ({
+      // Fetch only what changed since the last sync (everything the first time)
+      await pullChanges(synced.current)
+      const fullIncidents = syncedIncidents(synced.current).map((inc: any) => ({
+        ...inc,
+        location: { lat: inc.lat, lng: inc.lng },
+        time: new Date(inc.created_at).toLocaleTimeString('en-US', {
+          hour: '2-digit',
+          minute: '2-digit',
+          timeZone: 'Asia/Kolkata'
+        }),
+        responders: [],
+        resources: []
+      }))
+      setAllIncidents(fullIncidents)
+
+      // Filter out resolved incidents for the main list and map
+      const activeIncidents = fullIncidents.filter((inc: any) => inc.status !== 'resolved')
+
+      const currentIncidents = activeIncidents.map((inc: any) => ({
+        ...inc,
+        reportSource: inc.report_source || 'web',
+        reporterPhone: inc.reporter_phone,
+        reportCount: inc.report_count || 1,
+        attachments: inc.attachments || [],
+        arrivedUnits: 0,
+        totalUnits: 0,
+        is_verified: inc.is_verified,
+        verification_score: inc.verification_score,
+        ai_analysis: inc.ai_analysis
+      }))
+      setIncidents(currentIncidents)
+
+      // Resources
+      const currentResources = syncedResources(synced.current).map((r: any) => ({
+        ...r,
+        location: r.lat && r.lng ? { lat: r.lat, lng: r.lng } : null
+      }))
+      setResources(currentResources)
+
+      // Personnel
+      const formattedPersonnel = syncedPersonnel(synced.current).map((p: any) => ({
+        id: p.id,
+        name: p.name,
+        location: p.lat && p.lng ? { lat: p.lat, lng: p.lng } : null,
+        status: p.status,
+        assignedIncident: p.assigned_incident_id,
+        role: p.role,
+      }))
+      setPersonnel(formattedPersonnel)
+
+      // Sync active incidents with personnel and resources data
+      setIncidents(prev => prev.map((inc: any) => {
+        const assignedPersonnel = formattedPersonnel.filter((p: any) => p.assignedIncident === inc.id)
+        const assignedResources = currentResources.filter((r: any) => r.assigned_incident_id === inc.id)
+
+        return {
           ...inc,
-          reportSource: inc.report_source || 'web',
-          reporterPhone: inc.reporter_phone,
-          reportCount: inc.report_count || 1,
-          attachments: inc.attachments || [],
-          arrivedUnits: 0,
-          totalUnits: 0,
-          is_verified: inc.is_verified,
-          verification_score: inc.verification_score,
-          ai_analysis: inc.ai_analysis
-        }))
-        setIncidents(currentIncidents)
-      }
-
-      // Fetch resources
-      const resourcesResponse = await resourcesAPI.getAll()
-      let currentResources: any[] = []
-      if (resourcesResponse.success) {
-        currentResources = resourcesResponse.resources.map((r: any) => ({
-          ...r,
-          location: r.lat && r.lng ? { lat: r.lat, lng: r.lng } : null
-        }))
-        setResources(currentResources)
-      }
+          responders: assignedPersonnel.map((p: any) => p.name),
+          resources: assignedResources.map((r: any) => r.name),
+          arrivedUnits: assignedPersonnel.filter((p: any) => p.status === 'on-scene').length,
+          totalUnits: assignedPersonnel.length,
+        }
+      }))
 
-      // Fetch personnel
-      const personnelResponse = await personnelAPI.getAll()
-      if (personnelResponse.success) {
-        const formattedPersonnel = personnelResponse.personnel.map((p: any) => ({
-          id: p.id,
-          name: p.name,
-          location: p.lat && p.lng ? { lat: p.lat, lng: p.lng } : null,
-          status: p.status,
-          assignedIncident: p.assigned_incident_id,
-          role: p.role,
-        }))
-        setPersonnel(formattedPersonnel)
-
-        // Sync active incidents with personnel and resources data
-        setIncidents(prev => prev.map((inc: any) => {
-          const assignedPersonnel = formattedPersonnel.filter((p: any) => p.assignedIncident === inc.id)
-          const assignedResources = currentResources.filter((r: any) => r.assigned_incident_id === inc.id)
+      // Also sync ALL incidents for analytics (to get responder/resource counts if needed)
+      setAllIncidents(prev => prev.map((inc: any) => {
+        const assignedPersonnel = formattedPersonnel.filter((p: any) => p.assignedIncident === inc.id)
+        const assignedResources = currentResources.filter((r: any) => r.assigned_incident_id === inc.id)
 
-          return {
-            ...inc,
-            responders: assignedPersonnel.map((p: any) => p.name),
-            resources: assignedResources.map((r: any) => r.name),
-            arrivedUnits: assignedPersonnel.filter((p: any) => p.status === 'on-scene').length,
-            totalUnits: assignedPersonnel.length,
-          }
-        }))
+        return {
+          ...inc,
+          responders: assignedPersonnel.map((p: any) => p.name),
+          resources: assignedResources.map((r: any) => r.name),
+        }
+      }))
 
-        // Also sync ALL incidents for analytics (to get responder/resource counts if needed)
-        setAllIncidents(prev => prev.map((inc: any) => {
-          const assignedPersonnel = formattedPersonnel.filter((p: any) => p.assignedIncident === inc.id)
-          const assignedResources = currentResources.filter((r: any) => r.assigned_incident_id === inc.id)
+      // Also update selectedIncident if it exists
+      setSelectedIncident((current: any) => {
+        if (!current && currentIncidents.length > 0) {
+          // If no incident is selected, select the first one
+          const firstIncident = currentIncidents[0];
+          const assigned = formattedPersonnel.filter((p: any) => p.assignedIncident === firstIncident.id)
+          const assignedRes = currentResources.filter((r: any) => r.assigned_incident_id === firstIncident.id)
 
+          setExpandedIncident(firstIncident.id) // Also expand the first incident
           return {
-            ...inc,
-            responders: assignedPersonnel.map((p: any) => p.name),
-            resources: assignedResources.map((r: any) => r.name),
+            ...firstIncident,
+            responders: assigned.map((p: any) => p.name),
+            resources: assignedRes.map((r: any) => r.name),
+            arrivedUnits: assigned.filter((p: any) => p.status === 'on-scene').length,
+            totalUnits: assigned.length,
           }
-        }))
+        }
 
-        // Also update selectedIncident if it exists
-        setSelectedIncident((current: any) => {
-          if (!current && currentIncidents.length > 0) {
-            // If no incident is selected, select the first one
-            const firstIncident = currentIncidents[0];
-            const assigned = formattedPersonnel.filter((p: any) => p.assignedIncident === firstIncident.id)
-            const assignedRes = currentResources.filter((r: any) => r.assigned_incident_id === firstIncident.id)
+        if (current) {
+          const updated = currentIncidents.find((inc: any) => inc.id === current.id)
+          if (updated) {
+            const assigned = formattedPersonnel.filter((p: any) => p.assignedIncident === updated.id)
+            const assignedRes = currentResources.filter((r: any) => r.assigned_incident_id === updated.id)
 
-            setExpandedIncident(firstIncident.id) // Also expand the first incident
             return {
-              ...firstIncident,
+              ...updated,
               responders: assigned.map((p: any) => p.name),
               resources: assignedRes.map((r: any) => r.name),
               arrivedUnits: assigned.filter((p: any) => p.status === 'on-scene').length,
               totalUnits: assigned.length,
             }
           }
-
-          if (current) {
-            const updated = currentIncidents.find((inc: any) => inc.id === current.id)
-            if (updated) {
-              const assigned = formattedPersonnel.filter((p: any) => p.assignedIncident === updated.id)
-              const assignedRes = currentResources.filter((r: any) => r.assigned_incident_id === updated.id)
-
-              return {
-                ...updated,
-                responders: assigned.map((p: any) => p.name),
-                resources: assignedRes.map((r: any) => r.name),
-                arrivedUnits: assigned.filter((p: any) => p.status === 'on-scene').length,
-                totalUnits: assigned.length,
-              }
-            }
-          }
-          return current;
-        })
-      }
+        }
+        return current;
+      })
 
       if (!silent) setLoading(false)
     } catch (error) {
@@ -204,33 +199,36 @@ export default function CrisisCommandDashboard() {
   useEffect(() => {
     if (!isConnected) return
 
+    // Catch up on changes missed while disconnected
+    fetchData(true)
+
     // Listen for incident updates
     const handleIncidentUpdate = (data: any) => {
       console.log('Incident updated:', data)
       fetchData(true) // Silent refresh for all counts and lists
     }
 
-    // Listen for personnel location updates (REAL-TIME)
+    // Listen for personnel location updates (REAL-TIME, one batch per server tick)
     const handlePersonnelLocationUpdate = (data: any) => {
       // Keep manual update for locations to ensure highest performance for map movement
       setPersonnel(prev => {
-        const existingIndex = prev.findIndex(p => p.id === data.personnel_id)
-        if (existingIndex >= 0) {
-          return prev.map(p =>
-            p.id === data.personnel_id
-              ? { ...p, location: data.location, status: data.status, name: data.name }
-              : p
-          )
-        } else {
-          return [...prev, {
-            id: data.personnel_id,
-            name: data.name,
-            location: data.location,
-            status: data.status,
-            assignedIncident: data.assigned_incident_id,
+        const updates = new Map<number, any>(data.updates.map((u: any) => [u.personnel_id, u]))
+        const next = prev.map(p => {
+          const update = updates.get(p.id)
+          if (!update) return p
+          updates.delete(p.id)
+          return { ...p, location: update.location, status: update.status, name: update.name }
+        })
+        updates.forEach(update => {
+          next.push({
+            id: update.personnel_id,
+            name: update.name,
+            location: update.location,
+            status: update.status,
             role: 'Responder'
-          }]
-        }
+          })
+        })
+        return next
       })
     }
 
@@ -246,13 +244,13 @@ export default function CrisisCommandDashboard() {
     }
 
     on('incident_updated', handleIncidentUpdate)
-    on('personnel_location_updated', handlePersonnelLocationUpdate)
+    on('personnel_locations_updated', handlePersonnelLocationUpdate)
     on('personnel_status_updated', handlePersonnelStatusUpdate)
     on('personnel_assigned', handlePersonnelAssigned)
 
     return () => {
       off('incident_updated', handleIncidentUpdate)
-      off('personnel_location_updated', handlePersonnelLocationUpdate)
+      off('personnel_locations_updated', handlePersonnelLocationUpdate)
       off('personnel_status_updated', handlePersonnelStatusUpdate)
       off('personnel_assigned', handlePersonnelAssigned)
     }
@@ -433,6 +431,7 @@ export default function CrisisCommandDashboard() {
                 resources={resources}
                 isLocationPickerActive={isLocationPickerActive}
                 onMapClick={handleMapClick}
+                onViewportChange={setMapViewport}
               />
             )}
           </div>
@@ -36,7 +36,12 @@ export default function EvidenceGallery() {
 
     const getImageUrl = (path: string) => {
         const baseUrl = process.env.NEXT_PUBLIC_API_URL?.replace('/api', '') || 'http://localhost:5000'
-        return `${baseUrl}/${path}`
+        return `${baseUrl}/${path.replace(/^\//, '')}`
+    }
+
+    // Thumbnails are small, cacheable derivatives; fall back to the original for older APIs
+    const getThumbnailUrl = (attachment: any, size: "small" | "medium" | "large") => {
+        return getImageUrl(attachment.thumbnails?.[size] ?? attachment.filepath)
     }
 
     if (loading) {
@@ -85,8 +90,10 @@ export default function EvidenceGallery() {
                                 className="group relative aspect-square rounded-xl overflow-hidden border border-border/40 bg-muted cursor-pointer transition-all hover:scale-[1.02] hover:shadow-lg active:scale-95"
                             >
                                 <img 
-                                    src={getImageUrl(attr.filepath)} 
+                                    src={getThumbnailUrl(attr, "medium")} 
                                     alt={attr.filename}
+                                    loading="lazy"
+                                    decoding="async"
                                     className="w-full h-full object-cover transition-transform duration-500 group-hover:scale-110"
                                 />
                                 
@@ -129,7 +136,7 @@ export default function EvidenceGallery() {
                     <div className="max-w-4xl w-full flex flex-col md:flex-row gap-6 bg-card rounded-2xl overflow-hidden border border-border/50 shadow-2xl">
                         <div className="flex-1 bg-black flex items-center justify-center min-h-[300px] md:min-h-[500px]">
                             <img 
-                                src={getImageUrl(selectedImage.filepath)} 
+                                src={getThumbnailUrl(selectedImage, "large")} 
                                 alt={selectedImage.filename}
                                 className="max-w-full max-h-[70vh] object-contain"
                             />
@@ -176,11 +176,12 @@ export default function IncidentDetailView({ incident, onConfirmResolution }: In
               // If filepath already starts with http, use it as is
               const serverUrl = (process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000/api').replace(/\/api$/, '');
               const fileUrl = file.filepath.startsWith('http') ? file.filepath : `${serverUrl}/${file.filepath}`;
+              const thumbnailUrl = file.thumbnails?.medium ? `${serverUrl}${file.thumbnails.medium}` : fileUrl;
 
               return (
                 <a key={idx} href={fileUrl} target="_blank" rel="noopener noreferrer" className="block relative aspect-video bg-muted rounded overflow-hidden border border-border">
                   {file.file_type.startsWith('image') ? (
-                    <img src={fileUrl} alt={file.filename} className="w-full h-full object-cover" />
+                    <img src={thumbnailUrl} alt={file.filename} loading="lazy" className="w-full h-full object-cover" />
                   ) : (
                     <div className="flex items-center justify-center h-full text-xs text-muted-foreground">{file.filename}</div>
                   )}
@@ -33,9 +33,10 @@ interface MapComponentProps {
   }>
   isLocationPickerActive?: boolean
   onMapClick?: (lat: number, lng: number) => void
+  onViewportChange?: (viewport: { south: number; west: number; north: number; east: number }) => void
 }
 
-export default function MapComponent({ incidents, selectedIncident, selectedPersonnel, personnel, resources, isLocationPickerActive, onMapClick }: MapComponentProps) {
+export default function MapComponent({ incidents, selectedIncident, selectedPersonnel, personnel, resources, isLocationPickerActive, onMapClick, onViewportChange }: MapComponentProps) {
   const mapRef = useRef<L.Map | null>(null)
   const markersRef = useRef<Record<number, L.Marker>>({})
   const personnelMarkersRef = useRef<Record<number, L.Marker>>({})
@@ -44,6 +45,8 @@ export default function MapComponent({ incidents, selectedIncident, selectedPers
   const prevSelectedIdRef = useRef<number | null>(null)
   const prevSelectedPersonnelIdRef = useRef<number | null>(null)
   const mapInitializedRef = useRef(false)
+  const onViewportChangeRef = useRef(onViewportChange)
+  onViewportChangeRef.current = onViewportChange
 
   useEffect(() => {
     if (!mapRef.current) {
@@ -58,6 +61,19 @@ export default function MapComponent({ incidents, selectedIncident, selectedPers
         maxZoom: 19,
       }).addTo(mapRef.current)
 
+      // Report the visible area so the dashboard only subscribes to events inside it
+      const reportViewport = () => {
+        const bounds = mapRef.current!.getBounds()
+        onViewportChangeRef.current?.({
+          south: bounds.getSouth(),
+          west: bounds.getWest(),
+          north: bounds.getNorth(),
+          east: bounds.getEast(),
+        })
+      }
+      mapRef.current.on("moveend", reportViewport)
+      reportViewport()
+
       mapInitializedRef.current = true
     }
 
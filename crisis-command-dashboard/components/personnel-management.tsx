@@ -16,6 +16,8 @@ export function PersonnelManagement({ onSelectPersonnel, selectedPersonnelId }:
 
     const { on, isConnected } = useWebSocket({
         onConnect: () => console.log('Team Dashboard connected to WebSocket'),
+        // The roster lists everyone, wherever they are
+        interests: { viewport: 'world' },
     })
 
     // Form state
@@ -59,13 +61,16 @@ export function PersonnelManagement({ onSelectPersonnel, selectedPersonnelId }:
             ))
         }
 
+        // One batch of moved personnel per server tick
         const handleLocationUpdate = (data: any) => {
+            const updates = new Map<number, any>(data.updates.map((u: any) => [u.personnel_id, u]))
             setPersonnel(prev => {
-                const updated = prev.map(p =>
-                    p.id === data.personnel_id
-                        ? { ...p, lat: data.location.lat, lng: data.location.lng, status: data.status }
+                const updated = prev.map(p => {
+                    const update = updates.get(p.id)
+                    return update
+                        ? { ...p, lat: update.location.lat, lng: update.location.lng, status: update.status }
                         : p
-                )
+                })
 
                 // If the personnel wasn't in the list, we might need a fetch or just wait for next poll
                 // But generally they should be here if they were registered
@@ -74,7 +79,7 @@ export function PersonnelManagement({ onSelectPersonnel, selectedPersonnelId }:
         }
 
         on('personnel_status_updated', handleStatusUpdate)
-        on('personnel_location_updated', handleLocationUpdate)
+        on('personnel_locations_updated', handleLocationUpdate)
 
         return () => {
         }
@@ -5,11 +5,38 @@ import { io, Socket } from 'socket.io-client';
 
 const SOCKET_URL = process.env.NEXT_PUBLIC_SOCKET_URL || 'http://localhost:5000';
 
+export interface Viewport {
+    south: number;
+    west: number;
+    north: number;
+    east: number;
+}
+
+// Events the server sends this socket; each key replaces that kind of subscription
+export interface Interests {
+    viewport?: Viewport | 'world' | null;
+    incidents?: number[];
+    roles?: string[];
+}
+
+// Box of roughly `km` kilometres around a point, to subscribe to what happens nearby
+export function nearbyViewport(lat: number, lng: number, km: number): Viewport {
+    const latSpan = km / 111;
+    const lngSpan = km / (111 * Math.cos(lat * Math.PI / 180));
+    return {
+        south: Math.max(lat - latSpan, -90),
+        west: Math.max(lng - lngSpan, -180),
+        north: Math.min(lat + latSpan, 90),
+        east: Math.min(lng + lngSpan, 180),
+    };
+}
+
 interface UseWebSocketOptions {
     autoConnect?: boolean;
     onConnect?: () => void;
     onDisconnect?: () => void;
     onError?: (error: any) => void;
+    interests?: Interests;
 }
 
 export function useWebSocket(options: UseWebSocketOptions = {}) {
@@ -67,6 +94,14 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
         };
     }, [autoConnect]); // Removed callback dependencies
 
+    // Subscriptions belong to a connection, so (re)send them on every connect and change
+    const interestsKey = JSON.stringify(options.interests ?? null);
+    useEffect(() => {
+        if (isConnected && optionsRef.current.interests) {
+            socketRef.current?.emit('subscribe', optionsRef.current.interests);
+        }
+    }, [interestsKey, isConnected]);
+
     const emit = (event: string, data: any) => {
         if (socketRef.current?.connected) {
             socketRef.current.emit(event, data);
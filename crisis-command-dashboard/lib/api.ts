@@ -216,6 +216,31 @@ export const analyticsAPI = {
   getResponseTime: async (incidentId: number) => {
     return fetchAPI(`/analytics/response-time/${incidentId}`);
   },
+
+  // Columnar trend: timestamps (Unix seconds) and one array per group in series
+  getTimeseries: async (options: {
+    bucket?: string;
+    days?: number;
+    start?: string;
+    end?: string;
+    metric?: string;
+    groupBy?: 'type' | 'severity' | 'status';
+    type?: string;
+    severity?: string;
+  } = {}) => {
+    const params = new URLSearchParams();
+    if (options.bucket) params.append('bucket', options.bucket);
+    if (options.days) params.append('days', String(options.days));
+    if (options.start) params.append('start', options.start);
+    if (options.end) params.append('end', options.end);
+    if (options.metric) params.append('metric', options.metric);
+    if (options.groupBy) params.append('group_by', options.groupBy);
+    if (options.type) params.append('type', options.type);
+    if (options.severity) params.append('severity', options.severity);
+
+    const query = params.toString() ? `?${params.toString()}` : '';
+    return fetchAPI(`/analytics/timeseries${query}`);
+  },
 };
 
 // Alerts API
@@ -305,6 +330,13 @@ export const resourcesAPI = {
   },
 };
 
+// Delta sync API: rows changed or deleted since a cursor (0 for everything)
+export const syncAPI = {
+  since: async (cursor = 0) => {
+    return fetchAPI(`/sync?since=${cursor}`);
+  },
+};
+
 export default {
   incidents: incidentsAPI,
   personnel: personnelAPI,
@@ -313,4 +345,5 @@ export default {
   analytics: analyticsAPI,
   alerts: alertsAPI,
   notifications: notificationsAPI,
+  sync: syncAPI,
 };
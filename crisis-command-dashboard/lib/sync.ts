@@ -0,0 +1,69 @@
+import { syncAPI } from '@/lib/api';
+
+// Local copy of the rows GET /api/sync reports, kept current by pulling
+// only what changed since the last cursor
+export const SYNC_ENTITIES = ['incidents', 'personnel', 'resources', 'attachments'] as const;
+export type SyncEntity = (typeof SYNC_ENTITIES)[number];
+
+export interface SyncedData {
+  cursor: number;
+  rows: Record<SyncEntity, Map<number, any>>;
+  queue: Promise<void>;
+}
+
+export function createSyncedData(): SyncedData {
+  return {
+    cursor: 0,
+    rows: { incidents: new Map(), personnel: new Map(), resources: new Map(), attachments: new Map() },
+    queue: Promise.resolve(),
+  };
+}
+
+async function pull(data: SyncedData) {
+  let response;
+  do {
+    response = await syncAPI.since(data.cursor);
+    if (!response.success) return;
+    if (response.reset) {
+      SYNC_ENTITIES.forEach(entity => data.rows[entity].clear());
+    }
+    SYNC_ENTITIES.forEach(entity => {
+      response[entity].forEach((row: any) => data.rows[entity].set(row.id, row));
+      response.deleted[entity].forEach((id: number) => data.rows[entity].delete(id));
+    });
+    data.cursor = response.cursor;
+  } while (response.has_more);
+}
+
+// Pulls run one at a time, so an older response never overwrites a newer one
+export function pullChanges(data: SyncedData): Promise<void> {
+  const run = data.queue.then(() => pull(data));
+  data.queue = run.catch(() => undefined);
+  return run;
+}
+
+// Newest first with their attachments, like GET /api/incidents
+export function syncedIncidents(data: SyncedData): any[] {
+  const attachments = new Map<number, any[]>();
+  data.rows.attachments.forEach(attachment => {
+    const list = attachments.get(attachment.incident_id) ?? [];
+    list.push(attachment);
+    attachments.set(attachment.incident_id, list);
+  });
+  return Array.from(data.rows.incidents.values())
+    .sort((a, b) => (b.created_at ?? '').localeCompare(a.created_at ?? '') || b.id - a.id)
+    .map(incident => {
+      const list = (attachments.get(incident.id) ?? [])
+        .sort((a, b) => (b.created_at ?? '').localeCompare(a.created_at ?? ''));
+      return { ...incident, attachments: list, attachments_count: list.length };
+    });
+}
+
+// By name, like GET /api/personnel
+export function syncedPersonnel(data: SyncedData): any[] {
+  return Array.from(data.rows.personnel.values()).sort((a, b) => a.name.localeCompare(b.name));
+}
+
+export function syncedResources(data: SyncedData): any[] {
+  return Array.from(data.rows.resources.values()).sort((a, b) => a.id - b.id);
+}
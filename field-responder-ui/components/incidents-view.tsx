@@ -4,7 +4,7 @@ import { useState, useEffect } from "react"
 import { Search, Filter, MapPin, Clock, AlertTriangle, Flame, Users as UsersIcon, CheckCircle2, Loader2 } from "lucide-react"
 import { cn, calculateDistance } from "@/lib/utils"
 import { incidentsAPI, personnelAPI } from "@/lib/api"
-import { useWebSocket } from "@/hooks/use-websocket"
+import { useWebSocket, nearbyViewport, NEARBY_SUBSCRIPTION_KM } from "@/hooks/use-websocket"
 
 export default function IncidentsView() {
     const [incidents, setIncidents] = useState<any[]>([])
@@ -16,6 +16,9 @@ export default function IncidentsView() {
     const { on, isConnected } = useWebSocket({
         autoConnect: true,
         onConnect: () => console.log('IncidentsView connected to WebSocket'),
+        interests: userLocation
+            ? { viewport: nearbyViewport(userLocation.lat, userLocation.lng, NEARBY_SUBSCRIPTION_KM) }
+            : undefined,
     })
 
 
@@ -23,10 +23,15 @@ export default function MissionView() {
     const [missionExpanded, setMissionExpanded] = useState(false)
     const [currentUser, setCurrentUser] = useState<any>(null)
     const [personnelId, setPersonnelId] = useState<number | null>(null)
+    const [personnelRole, setPersonnelRole] = useState<string | null>(null)
 
     const { on, isConnected } = useWebSocket({
         autoConnect: true,
         onConnect: () => console.log('MissionView connected to WebSocket'),
+        // Assignments for our role and updates to our incident
+        interests: personnelRole
+            ? { roles: [personnelRole], incidents: activeIncident ? [activeIncident.id] : [] }
+            : undefined,
     })
 
     // Load current user from localStorage
@@ -52,6 +57,7 @@ export default function MissionView() {
             if (pResponse.success) {
                 const person = pResponse.personnel
                 setPersonnelId(person.id)
+                setPersonnelRole(person.role)
 
                 // Map backend status to UI status
                 if (person.status === 'on-scene') setStatus('arrived')
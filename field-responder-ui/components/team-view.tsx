@@ -4,7 +4,7 @@ import { useState, useEffect } from "react"
 import { MapPin, Phone, Radio, Clock, Navigation, CheckCircle2, AlertCircle, Loader2 } from "lucide-react"
 import { cn, calculateDistance } from "@/lib/utils"
 import { personnelAPI } from "@/lib/api"
-import { useWebSocket } from "@/hooks/use-websocket"
+import { useWebSocket, nearbyViewport, NEARBY_SUBSCRIPTION_KM } from "@/hooks/use-websocket"
 
 export default function TeamView() {
     const [teamMembers, setTeamMembers] = useState<any[]>([])
@@ -14,6 +14,9 @@ export default function TeamView() {
     const { on, isConnected } = useWebSocket({
         autoConnect: true,
         onConnect: () => console.log('TeamView connected to WebSocket'),
+        interests: userLocation
+            ? { viewport: nearbyViewport(userLocation.lat, userLocation.lng, NEARBY_SUBSCRIPTION_KM) }
+            : undefined,
     })
 
     const fetchTeam = async () => {
@@ -76,7 +79,7 @@ export default function TeamView() {
 
         const refresh = () => fetchTeam()
         on('personnel_status_updated', refresh)
-        on('personnel_location_updated', refresh)
+        on('personnel_locations_updated', refresh)
 
         return () => { }
     }, [isConnected, on])
@@ -4,7 +4,7 @@ import { useState, useEffect } from "react"
 import { Filter, MapPin, Clock, AlertCircle, Loader2 } from "lucide-react"
 import UserMap from "./user-map"
 import { incidentsAPI, resourcesAPI, alertsAPI } from "@/lib/api"
-import { useWebSocket } from "@/hooks/use-websocket"
+import { useWebSocket, nearbyViewport, NEARBY_SUBSCRIPTION_KM } from "@/hooks/use-websocket"
 
 export default function NearbyAlerts() {
     const [selectedFilter, setSelectedFilter] = useState<string>("all")
@@ -17,6 +17,9 @@ export default function NearbyAlerts() {
     const { on, isConnected } = useWebSocket({
         autoConnect: true,
         onConnect: () => console.log('NearbyAlerts connected to WebSocket'),
+        interests: userLocation
+            ? { viewport: nearbyViewport(userLocation.lat, userLocation.lng, NEARBY_SUBSCRIPTION_KM) }
+            : undefined,
     })
 
     const filters = [
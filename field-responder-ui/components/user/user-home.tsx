@@ -3,7 +3,7 @@
 import { Flame, Heart, Shield, AlertTriangle, MapPin, Clock, CheckCircle, Loader2 } from "lucide-react"
 import { useState, useEffect } from "react"
 import { incidentsAPI } from "@/lib/api"
-import { useWebSocket } from "@/hooks/use-websocket"
+import { useWebSocket, nearbyViewport, NEARBY_SUBSCRIPTION_KM } from "@/hooks/use-websocket"
 import { calculateDistance } from "@/lib/utils"
 
 interface UserHomeProps {
@@ -20,6 +20,9 @@ export default function UserHome({ onNavigateToReport, onNavigateToSafety, activ
     const { on, isConnected } = useWebSocket({
         autoConnect: true,
         onConnect: () => console.log('UserHome connected to WebSocket'),
+        interests: userLocation
+            ? { viewport: nearbyViewport(userLocation.lat, userLocation.lng, NEARBY_SUBSCRIPTION_KM) }
+            : undefined,
     })
 
     const emergencyTypes = [
@@ -62,26 +62,86 @@ export const incidentsAPI = {
         });
     },
 
+    // Resumable: chunks survive dropped connections and page reloads
     uploadFile: async (id: number, file: File) => {
-        const formData = new FormData();
-        formData.append('file', file);
+        const key = `upload:${id}:${file.name}:${file.size}:${file.lastModified}`;
+        let uploadId = localStorage.getItem(key);
+        let offset = 0;
+        let chunkSize = UPLOAD_CHUNK_BYTES;
+
+        if (uploadId) {
+            const response = await fetch(`${API_BASE_URL}/uploads/${uploadId}`, {
+                headers: { 'ngrok-skip-browser-warning': 'true' },
+            });
+            if (response.ok) {
+                const session = await response.json();
+                offset = session.offset;
+                chunkSize = session.chunk_size;
+            } else {
+                uploadId = null;
+            }
+        }
 
-        const response = await fetch(`${API_BASE_URL}/incidents/${id}/upload`, {
-            method: 'POST',
-            headers: {
-                'ngrok-skip-browser-warning': 'true',
-            },
-            body: formData,
-        });
+        if (!uploadId) {
+            const session = await fetchAPI(`/incidents/${id}/uploads`, {
+                method: 'POST',
+                body: JSON.stringify({ filename: file.name, size: file.size }),
+            });
+            uploadId = session.upload_id as string;
+            chunkSize = session.chunk_size;
+            localStorage.setItem(key, uploadId);
+        }
 
-        if (!response.ok) {
-            throw new Error(`Upload failed: ${response.statusText}`);
+        let failures = 0;
+        while (offset < file.size) {
+            const chunk = file.slice(offset, offset + chunkSize);
+            const headers: Record<string, string> = {
+                'ngrok-skip-browser-warning': 'true',
+                'Content-Type': 'application/offset+octet-stream',
+                'Upload-Offset': offset.toString(),
+            };
+            const checksum = await sha256Hex(chunk);
+            if (checksum) headers['X-Chunk-SHA256'] = checksum;
+
+            try {
+                const response = await fetch(`${API_BASE_URL}/uploads/${uploadId}`, {
+                    method: 'PATCH',
+                    headers,
+                    body: chunk,
+                });
+                const result = await response.json();
+                if (response.ok || response.status === 409 || response.status === 400) {
+                    // 409/400: the server reports where to continue from
+                    if (typeof result.offset !== 'number') {
+                        throw new Error(result.error || `Upload failed: ${response.statusText}`);
+                    }
+                    offset = result.offset;
+                    failures = 0;
+                    continue;
+                }
+                throw new Error(result.error || `Upload failed: ${response.statusText}`);
+            } catch (error) {
+                if (++failures > UPLOAD_MAX_RETRIES) throw error;
+                await new Promise((resolve) => setTimeout(resolve, Math.min(1000 * 2 ** failures, 30000)));
+            }
         }
 
-        return await response.json();
+        const result = await fetchAPI(`/uploads/${uploadId}/complete`, { method: 'POST' });
+        localStorage.removeItem(key);
+        return result;
     },
 };
 
+const UPLOAD_CHUNK_BYTES = 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 8;
+
+// Hex SHA-256 of a chunk, or null where Web Crypto is unavailable (plain http)
+async function sha256Hex(blob: Blob): Promise<string | null> {
+    if (typeof crypto === 'undefined' || !crypto.subtle) return null;
+    const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+}
+
 // Alerts API
 export const alertsAPI = {
     getNearby: async (lat: number, lng: number, radius?: number) => {
@@ -0,0 +1,174 @@
+import os
+import re
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from config import Config
+
+TEMP_DIR = tempfile.mkdtemp()
+Config.DATABASE_PATH = os.path.join(TEMP_DIR, 'query_plans.db')
+Config.UPLOAD_FOLDER = os.path.join(TEMP_DIR, 'uploads')
+
+import database
+
+# Route calls to exercise: every statement they run is checked
+ROUTES = [
+    ('GET', '/api/incidents'),
+    ('GET', '/api/incidents?status=active'),
+    ('GET', '/api/incidents?status=active&type=fire'),
+    ('GET', '/api/incidents?lat=19.07&lng=72.87&radius=2000'),
+    ('GET', '/api/incidents/1'),
+    ('GET', '/api/incidents/1/timeline'),
+    ('GET', '/api/verification/status?incident_id=1'),
+    ('GET', '/api/attachments'),
+    ('GET', '/uploads/1/thumb/small'),
+    ('POST', '/api/incidents/1/uploads', {'filename': 'plan-check.jpg', 'size': 1024}),
+    ('POST', '/api/incidents', {'title': 'Plan check fire', 'type': 'fire', 'severity': 'high', 'lat': 19.07, 'lng': 72.87}),
+    ('PUT', '/api/incidents/1', {'status': 'active'}),
+    ('POST', '/api/incidents/1/assign', {'personnel_ids': [1], 'resource_ids': [1]}),
+    ('GET', '/api/personnel?status=available'),
+    ('GET', '/api/personnel?incident_id=1'),
+    ('GET', '/api/personnel/1'),
+    ('GET', '/api/personnel/user/1'),
+    ('GET', '/api/personnel/available'),
+    ('GET', '/api/personnel?lat=19.07&lng=72.87'),
+    ('GET', '/api/personnel/available?lat=19.07&lng=72.87&radius=2000'),
+    ('PUT', '/api/personnel/1/location', {'lat': 19.08, 'lng': 72.88}),
+    ('GET', '/api/resources?status=available'),
+    ('GET', '/api/resources/public'),
+    ('GET', '/api/resources?lat=19.07&lng=72.87'),
+    ('GET', '/api/resources/public?lat=19.07&lng=72.87&radius=2000'),
+    ('GET', '/api/comms/incident/1'),
+    ('GET', '/api/comms/unread?incident_id=1'),
+    ('GET', '/api/comms/broadcast'),
+    ('GET', '/api/notifications?user_id=1'),
+    ('GET', '/api/notifications'),
+    ('GET', '/api/alerts/nearby?lat=19.07&lng=72.87'),
+    ('GET', '/api/alerts/nearby?lat=19.07&lng=72.87&radius=10000'),
+    ('GET', '/api/alerts/geofence'),
+    ('POST', '/api/alerts/geofence/check', {'lat': 19.07, 'lng': 72.87}),
+    ('POST', '/api/sosmesh', {'msg_id': 'plan-check-1', 'name': 'Plan check', 'latitude': 19.07, 'longitude': 72.87, 'emergency': 'Fire', 'timestamp': 1}),
+    ('POST', '/api/sosmesh', {'msg_id': 'plan-check-1', 'name': 'Plan check', 'latitude': 19.07, 'longitude': 72.87, 'emergency': 'Fire', 'timestamp': 1}),
+    ('POST', '/api/sosmesh/batch', [
+        {'msg_id': 'plan-check-1', 'name': 'Plan check', 'latitude': 19.07, 'longitude': 72.87, 'emergency': 'Fire', 'timestamp': 1},
+        {'msg_id': 'plan-check-2', 'name': 'Plan check', 'latitude': 19.071, 'longitude': 72.87, 'emergency': 'Fire', 'timestamp': 2},
+        {'msg_id': 'plan-check-3', 'name': 'Plan check', 'latitude': 21.0, 'longitude': 75.0, 'emergency': 'Accident', 'timestamp': 3}
+    ]),
+    ('GET', '/api/sosmesh/messages'),
+    ('GET', '/api/sosmesh/messages/plan-check-1'),
+    ('GET', '/api/analytics/dashboard'),
+    ('GET', '/api/analytics/incidents?days=7'),
+    ('GET', '/api/analytics/distribution?metric=response&group_by=type'),
+    ('GET', '/api/analytics/timeseries?bucket=1h&days=2&group_by=type'),
+    ('GET', '/api/analytics/response-time/1'),
+    ('GET', '/api/sync'),
+    ('GET', '/api/sync?since=3&limit=10'),
+    ('POST', '/api/incidents/1/resolve', {'confirm': True}),
+]
+
+# Table-valued functions iterate their bound argument (e.g. an id list), not a table
+TABLE_VALUED_FUNCTIONS = {'json_each', 'json_tree'}
+
+captured = []
+
+def seed():
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO incidents (title, type, severity, status, lat, lng)
+        VALUES ('Seed fire', 'fire', 'high', 'active', 19.07, 72.87)
+    ''')
+    cursor.execute('''
+        INSERT INTO personnel (user_id, name, role, status, lat, lng)
+        VALUES (1, 'Seed responder', 'firefighter', 'available', 19.07, 72.87)
+    ''')
+    cursor.execute('''
+        INSERT INTO resources (name, type, status, lat, lng, is_public)
+        VALUES ('Seed engine', 'fire_truck', 'available', 19.07, 72.87, 1)
+    ''')
+    cursor.execute('''
+        INSERT INTO geofence_zones (incident_id, name, lat, lng, radius, zone_type)
+        VALUES (1, 'Seed zone', 19.07, 72.87, 500, 'danger')
+    ''')
+    conn.commit()
+    conn.close()
+
+def full_scans(cursor, statement):
+    """Return tables the statement reads with a full scan (no index)"""
+    cursor.execute(f'EXPLAIN QUERY PLAN {statement}')
+    scans = []
+    plan = cursor.fetchall()
+    # Subqueries and VALUES lists built by the statement itself are not tables
+    built = set(re.findall(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)', '\n'.join(row[3] for row in plan), re.MULTILINE))
+    for row in plan:
+        detail = row[3]
+        match = re.match(r'SCAN (\w+)', detail)
+        # R*Tree lookups show as a virtual table scan with a constraint index
+        rtree_lookup = re.search(r'VIRTUAL TABLE INDEX \d+:\S', detail)
+        if (match and 'USING' not in detail and not rtree_lookup and 'CONSTANT ROWS' not in detail
+                and match.group(1) not in TABLE_VALUED_FUNCTIONS and match.group(1) not in built):
+            scans.append(match.group(1))
+    return scans
+
+def is_filtered(statement):
+    """Unfiltered listings scan by design; only filtered/joined reads must use an index"""
+    normalized = re.sub(r'WHERE 1=1\s*', '', statement, flags=re.IGNORECASE)
+    return re.search(r'\b(WHERE|JOIN)\b', normalized, re.IGNORECASE) is not None
+
+def verify_query_plans():
+    print("🧪 Checking query plans of route queries...")
+
+    database.init_db()
+    seed()
+
+    from app import app
+
+    # Record every statement run on pooled connections
+    pool = database.get_pool()
+    pool.close_all()
+    original_connect = pool._connect
+    def traced_connect():
+        conn = original_connect()
+        conn.set_trace_callback(captured.append)
+        return conn
+    pool._connect = traced_connect
+
+    client = app.test_client()
+    for method, url, *body in ROUTES:
+        response = client.open(url, method=method, json=body[0] if body else None)
+        if response.status_code >= 500:
+            print(f"❌ {method} {url} failed with {response.status_code}")
+            sys.exit(1)
+
+    # Skip SQLite's own reads of its schema tables (e.g. R*Tree loading sqlite_stat1)
+    statements = sorted({
+        s.strip() for s in captured
+        if re.match(r'\s*(SELECT|UPDATE|DELETE)', s, re.IGNORECASE)
+        and not re.search(r"'main'\.sqlite_", s)
+    })
+
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    failures = []
+    for statement in statements:
+        if not is_filtered(statement):
+            continue
+        scans = full_scans(cursor, statement)
+        if scans:
+            failures.append((statement, scans))
+    conn.close()
+
+    print(f"📊 Checked {len(statements)} distinct statements")
+    if failures:
+        for statement, scans in failures:
+            print(f"\n❌ Full table scan on {', '.join(scans)}:")
+            print('   ' + ' '.join(statement.split()))
+        sys.exit(1)
+
+    print("✅ No route query falls back to a full table scan")
+
+if __name__ == "__main__":
+    verify_query_plans()
@@ -0,0 +1,155 @@
+# The sendfile check runs a real gevent server in this process, like production
+from gevent import monkey
+monkey.patch_all()
+
+import http.client
+import io
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from config import Config
+
+TEMP_DIR = tempfile.mkdtemp()
+Config.DATABASE_PATH = os.path.join(TEMP_DIR, 'upload_serving.db')
+Config.UPLOAD_FOLDER = os.path.join(TEMP_DIR, 'uploads')
+
+import database
+
+VIDEO_SIZE = 3 * 1024 * 1024 + 17  # Not a multiple of the send block size
+
+failures = []
+
+def check(label, condition, detail=''):
+    print(f"{'✅' if condition else '❌'} {label}" + (f" ({detail})" if detail and not condition else ''))
+    if not condition:
+        failures.append(label)
+
+def verify_test_client(client, url, data):
+    print("\n1️⃣ Conditional and partial responses (test client)...")
+    response = client.get(url)
+    etag = response.headers.get('ETag', '')
+    last_modified = response.headers.get('Last-Modified')
+    check('Full response is 200 with the whole body', response.status_code == 200 and response.data == data)
+    check('Strong ETag is the content SHA-256', etag.strip('"') in url and not etag.startswith('W/'), etag)
+    check('Advertises byte ranges', response.headers.get('Accept-Ranges') == 'bytes')
+    check('Content-addressed file is cached as immutable', 'immutable' in response.headers.get('Cache-Control', ''))
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    check('If-None-Match with the current ETag gives 304', response.status_code == 304 and not response.data)
+    check('304 repeats the ETag', response.headers.get('ETag') == etag)
+
+    response = client.get(url, headers={'If-Modified-Since': last_modified})
+    check('If-Modified-Since gives 304', response.status_code == 304)
+
+    response = client.get(url, headers={'If-None-Match': '"stale"'})
+    check('A stale ETag gets the full body', response.status_code == 200 and len(response.data) == len(data))
+
+    response = client.get(url, headers={'Range': 'bytes=100-199'})
+    check('Range gives 206 with exactly the requested bytes',
+          response.status_code == 206 and response.data == data[100:200], response.status_code)
+    check('Content-Range describes the slice',
+          response.headers.get('Content-Range') == f'bytes 100-199/{len(data)}', response.headers.get('Content-Range'))
+
+    response = client.get(url, headers={'Range': 'bytes=-500'})
+    check('Suffix range returns the tail', response.status_code == 206 and response.data == data[-500:])
+
+    response = client.get(url, headers={'Range': f'bytes={len(data) - 10}-'})
+    check('Open-ended range returns the rest', response.status_code == 206 and response.data == data[-10:])
+
+    response = client.get(url, headers={'Range': f'bytes={len(data) + 10}-'})
+    check('Unsatisfiable range gives 416', response.status_code == 416, response.status_code)
+
+    response = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    check('Range with a stale If-Range sends the full file', response.status_code == 200 and response.data == data)
+
+    response = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    check('Range with a current If-Range is honoured', response.status_code == 206 and response.data == data[:10])
+
+    response = client.get('/uploads/blobs/tmp/anything.part')
+    check('Blob store temp files are not served', response.status_code == 404)
+
+    response = client.get('/uploads/../upload_serving.db')
+    check('Paths outside the upload folder are rejected', response.status_code == 404)
+
+def verify_offload(client, url):
+    print("\n2️⃣ Reverse proxy offload...")
+    Config.UPLOAD_OFFLOAD = 'x-accel-redirect'
+    response = client.get(url)
+    check('X-Accel-Redirect points at the internal location',
+          response.headers.get('X-Accel-Redirect', '').startswith('/protected-uploads/blobs/') and not response.data,
+          response.headers.get('X-Accel-Redirect'))
+
+    Config.UPLOAD_OFFLOAD = 'x-sendfile'
+    response = client.get(url)
+    check('X-Sendfile carries the absolute path',
+          os.path.isfile(response.headers.get('X-Sendfile', '')) and not response.data)
+
+    response = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    check('Conditional requests are still answered by the app', response.status_code == 304)
+    Config.UPLOAD_OFFLOAD = None
+
+def verify_sendfile_server(app, url, data):
+    print("\n3️⃣ Zero-copy os.sendfile on the gevent server...")
+    from gevent import pywsgi
+    from utils import sendfile_utils
+
+    sent = []
+    original = sendfile_utils.sendfile_to_socket
+    def counting_sendfile(sock, wrapper):
+        count = original(sock, wrapper)
+        sent.append(count)
+        return count
+    sendfile_utils.sendfile_to_socket = counting_sendfile
+
+    server = pywsgi.WSGIServer(('127.0.0.1', 0), app, handler_class=sendfile_utils.sendfile_handler_class(), log=None)
+    server.start()
+
+    def fetch(headers=None):
+        conn = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=10)
+        conn.request('GET', url, headers=headers or {})
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response, body
+
+    try:
+        response, body = fetch()
+        check('Whole file over a socket matches', response.status == 200 and body == data, response.status)
+        response, body = fetch({'Range': 'bytes=1000-2000999'})
+        check('Range over a socket matches', response.status == 206 and body == data[1000:2001000], response.status)
+        check('Bodies went through os.sendfile', sent == [len(data), 2000000], sent)
+    finally:
+        server.stop()
+        sendfile_utils.sendfile_to_socket = original
+
+def verify_upload_serving():
+    print("🧪 Checking /uploads serving...")
+    database.init_db()
+
+    from app import app
+    client = app.test_client()
+    client.post('/api/incidents', json={
+        'title': 'Flooded underpass', 'type': 'flood', 'severity': 'high', 'lat': 19.07, 'lng': 72.87
+    })
+
+    data = os.urandom(VIDEO_SIZE)
+    response = client.post('/api/incidents/1/upload', data={
+        'file': (io.BytesIO(data), 'clip.mp4')
+    }, content_type='multipart/form-data')
+    url = '/' + response.get_json()['file_info']['filepath']
+
+    verify_test_client(client, url, data)
+    verify_offload(client, url)
+    verify_sendfile_server(app, url, data)
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\n✅ Upload serving handles ETags, conditional requests and byte ranges")
+
+if __name__ == "__main__":
+    verify_upload_serving()